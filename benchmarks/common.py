@@ -0,0 +1,95 @@
+""" Shared helpers for the offline benchmarks """
+
+import io
+import time
+import tracemalloc
+import contextlib
+
+
+class NullBatch:
+    """ Stand-in for client.batch that accepts every batch without sending it """
+
+    def __init__(self):
+        self.objects = 0
+        self.references = 0
+
+    def create_objects(self, batch) -> list:
+        """ counts the objects of the batch and reports no errors """
+        self.objects += len(batch)
+        return [{"result": {}} for _ in batch.get_request_body()["objects"]]
+
+    def create_references(self, batch) -> list:
+        """ counts the references of the batch and reports no errors """
+        self.references += len(batch)
+        return [{"result": {}} for _ in batch.get_request_body()]
+
+
+class NullClient:
+    """ Stand-in for weaviate.Client to measure the CPU cost of the importers only """
+
+    def __init__(self):
+        self.batch = NullBatch()
+
+
+@contextlib.contextmanager
+def quiet():
+    """ suppresses the progress output of the importers """
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def measure(function, repeat: int = 3) -> float:
+    """ runs function repeat times and returns the best CPU time in seconds
+
+    :param function: function without arguments to measure
+    :type function: callable
+    :param repeat: number of runs, defaults to 3
+    :type repeat: int, optional
+    :return: the lowest CPU time of all runs
+    :rtype: float
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.process_time()
+        with quiet():
+            function()
+        elapsed = time.process_time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def peak_memory(function) -> int:
+    """ runs function once and returns the peak of the memory it allocated in bytes
+
+    Memory tracing slows everything down, so this is a separate run from measure.
+
+    :param function: function without arguments to measure
+    :type function: callable
+    :return: the highest number of bytes allocated at once during the run
+    :rtype: int
+    """
+    tracemalloc.start()
+    try:
+        with quiet():
+            function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def retained_memory(function) -> tuple:
+    """ runs function once and returns its result and the memory the result still holds
+
+    :param function: function without arguments to measure
+    :type function: callable
+    :return: the result and the number of bytes allocated during the run that are not freed
+    :rtype: tuple
+    """
+    tracemalloc.start()
+    try:
+        with quiet():
+            result = function()
+        return result, tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
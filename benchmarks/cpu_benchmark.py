@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+""" CPU benchmark suite of the parsing and object building stages, without a Weaviate instance
+
+Run from the repository root: python -m benchmarks.cpu_benchmark [--synthetic N] [metadata_file ...]
+
+Every stage runs over the bundled 10, 100 and 1000 paper files and over a synthetic file of
+N papers (100000 by default, 0 to skip it), made of the 1000 papers file with unique ids. The
+throughput is the best CPU time of --repeat runs, the peak memory comes from a separate run
+with tracemalloc and counts what the stage allocates on top of its input.
+"""
+
+import os
+import json
+import argparse
+import tempfile
+
+from benchmarks.common import NullClient
+from benchmarks.common import measure
+from benchmarks.common import peak_memory
+from benchmarks.common import quiet
+from modules.metadata import _read_metadata_file
+from modules.metadata import get_metadata
+from modules.columnar import convert_metadata
+from modules.taxanomy import _parse_taxanomy
+from modules.imports import import_journals
+from modules.imports import import_authors
+from modules.imports import import_papers
+from modules.utilities import format_author_name
+from modules.utilities import format_journal_name
+from modules.utilities import extract_year
+from modules.utilities import generate_uuid
+
+METADATA_FILES = ['./data/metadata/10.json', './data/metadata/100.json', './data/metadata/1000.json']
+TAXANOMY_FILE = './data/taxanomy/taxanomy.html'
+CONFIG = {"weaviate": {"max_batch_size": 100, "batch_workers": 0}}
+MIN_OPS = 5000
+
+
+def write_synthetic_file(source: str, path: str, size: int) -> str:
+    """ writes a metadata file of size papers by repeating the papers of source with new ids
+
+    :param source: the metadata file to repeat
+    :type source: str
+    :param path: the file to write
+    :type path: str
+    :param size: number of papers
+    :type size: int
+    :return: path
+    :rtype: str
+    """
+    with open(source) as file:
+        papers = [json.loads(line) for line in file]
+    with open(path, 'w') as file:
+        for number in range(size):
+            paper = papers[number % len(papers)]
+            # keeps the year prefix of the arxiv id, so extract_year still finds one
+            file.write(json.dumps(dict(paper, id="{}.{:06d}".format(paper["id"][:4], number))) + '\n')
+    return path
+
+
+def _report(label: str, count: int, seconds: float, peak_bytes: int):
+    print("{:<38}: {:>10.0f} ops/s {:>10.2f} us/op {:>8.1f} MB peak".format(
+        label, count / seconds if seconds > 0 else float('inf'), seconds * 1e6 / max(count, 1),
+        peak_bytes / 1024 / 1024))
+
+
+def _run(label: str, count: int, function, repeat: int, loops: int = None):
+    # small inputs are repeated so every measurement covers at least MIN_OPS operations
+    if loops is None:
+        loops = max(1, MIN_OPS // max(count, 1))
+
+    def run():
+        for _ in range(loops):
+            function()
+    _report(label, count, measure(run, repeat) / loops, peak_memory(function))
+
+
+def _benchmark_file(filename: str, repeat: int):
+    """ runs every stage over the papers of one metadata file """
+    with quiet():
+        papers = _read_metadata_file(filename, -1, 0)
+    ids = [paper["id"] for paper in papers]
+    authors = [paper["authors"] for paper in papers if paper["authors"] is not None]
+    journals = [paper["journal-ref"] for paper in papers if paper["journal-ref"] is not None]
+    print("File ----------------------------------:", filename, len(papers), "papers,",
+          round(os.path.getsize(filename) / 1024 / 1024, 1), "MB")
+
+    _run("  _read_metadata_file", len(papers), lambda: _read_metadata_file(filename, -1, 0), repeat)
+    _run("  format_author_name", len(authors), lambda: [format_author_name(names) for names in authors], repeat)
+    _run("  format_journal_name", len(journals), lambda: [format_journal_name(name) for name in journals], repeat)
+    _run("  extract_year", len(ids), lambda: [extract_year(paper_id) for paper_id in ids], repeat)
+    _run("  generate_uuid", len(ids), lambda: [generate_uuid('Paper', paper_id) for paper_id in ids], repeat)
+
+    _run("  import_journals", len(papers), lambda: import_journals(NullClient(), CONFIG, papers), repeat)
+    _run("  import_authors", len(papers), lambda: import_authors(NullClient(), CONFIG, papers), repeat)
+    _run("  import_papers", len(papers), lambda: import_papers(NullClient(), CONFIG, papers, {}), repeat)
+
+    # the records of the JSON file against those of its columnar copy, with precomputed uuids
+    with tempfile.TemporaryDirectory() as directory:
+        config = {"data": {"metadata_file": filename, "columnar": os.path.join(directory, 'columns')}}
+        with quiet():
+            convert_metadata(filename, config["data"]["columnar"])
+            records = get_metadata(config, False)
+        _run("  get_metadata", len(papers), lambda: get_metadata({"data": {"metadata_file": filename}}, False),
+             repeat)
+        _run("  get_metadata columnar", len(papers), lambda: get_metadata(config, False), repeat)
+        _run("  import_papers columnar", len(records),
+             lambda: import_papers(NullClient(), CONFIG, records, {}), repeat)
+
+
+def main():
+    """ main """
+    parser = argparse.ArgumentParser(description="Measure the CPU time of the parsing and object building stages")
+    parser.add_argument('files', nargs='*', default=METADATA_FILES, help="metadata files to run the stages on")
+    parser.add_argument('--synthetic', type=int, default=100000,
+                        help="number of papers of the synthetic file, 0 to skip it")
+    parser.add_argument('--repeat', type=int, default=3, help="number of runs, the best one counts")
+    args = parser.parse_args()
+
+    with open(TAXANOMY_FILE, encoding='utf-8') as file:
+        page = file.read()
+    print("Taxonomy page -------------------------:", TAXANOMY_FILE)
+    _run("  _parse_taxanomy", 1, lambda: _parse_taxanomy(page), args.repeat, loops=1)
+
+    for filename in args.files:
+        _benchmark_file(filename, args.repeat)
+
+    if args.synthetic > 0:
+        with tempfile.TemporaryDirectory() as directory:
+            filename = write_synthetic_file(METADATA_FILES[-1], os.path.join(directory, 'synthetic.json'),
+                                            args.synthetic)
+            _benchmark_file(filename, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
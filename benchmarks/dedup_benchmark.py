@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+""" Memory and time benchmark of the duplicate detection of the loaders, a set of the id
+strings against modules.dedup.IdSet
+
+Run from the repository root: python -m benchmarks.dedup_benchmark [--ids N]
+
+The ids are synthetic and shaped like the full snapshot: about a fifth old-style ids like
+hep-th/9901001 and the rest new-style ids with 4 digits before 2015 and 5 digits after, one
+percent of them repeated. Both structures are filled with the same ids in the same order,
+the results must be the same. Every id is decoded again, like the loaders decode every line,
+so the set keeps a string per paper alive that the loaders would otherwise drop.
+"""
+
+import time
+import random
+import argparse
+
+from benchmarks.common import retained_memory
+from modules.dedup import IdSet
+
+_ARCHIVES = ('hep-th', 'hep-ph', 'astro-ph', 'cond-mat', 'math', 'quant-ph', 'gr-qc', 'physics', 'nucl-th', 'cs')
+
+
+def synthetic_ids(count: int, seed: int = 1) -> list:
+    """ ids shaped like the arxiv snapshot, in file order with repeated ones
+
+    :param count: number of ids
+    :type count: int
+    :param seed: seed of the random ids
+    :type seed: int, optional
+    :return: the ids
+    :rtype: list
+    """
+    generator = random.Random(seed)
+    ids = []
+    for _ in range(count):
+        share = generator.random()
+        if share < 0.2:
+            ids.append("{}/{:02d}{:02d}{:03d}".format(generator.choice(_ARCHIVES), generator.choice((92, 96, 99, 3, 6)),
+                                                      generator.randint(1, 12), generator.randint(0, 999)))
+        elif share < 0.5:
+            ids.append("{:02d}{:02d}.{:04d}".format(generator.randint(7, 14), generator.randint(1, 12),
+                                                    generator.randint(0, 9999)))
+        else:
+            ids.append("{:02d}{:02d}.{:05d}".format(generator.randint(15, 24), generator.randint(1, 12),
+                                                    generator.randint(0, 24999)))
+    for position in generator.sample(range(count), count // 100):
+        ids[position] = ids[generator.randrange(count)]
+    return ids
+
+
+def _fill(structure, ids: list):
+    """ what the loaders do per paper, with the insert of the structure """
+    loaded = 0
+    if isinstance(structure, set):
+        for encoded in ids:
+            arxiv_id = encoded.decode('utf-8')
+            if arxiv_id in structure:
+                continue
+            structure.add(arxiv_id)
+            loaded += 1
+    else:
+        for encoded in ids:
+            if structure.insert(encoded.decode('utf-8')):
+                loaded += 1
+    return structure, loaded
+
+
+def main():
+    """ main """
+    parser = argparse.ArgumentParser(description="Measure the memory and time of the duplicate detection")
+    parser.add_argument('--ids', type=int, default=1000000, help="number of ids")
+    args = parser.parse_args()
+
+    ids = [arxiv_id.encode('utf-8') for arxiv_id in synthetic_ids(args.ids)]
+    results = {}
+    print("Synthetic arxiv ids -------------------:", len(ids))
+    for label, create in (("set of strings", set), ("IdSet", IdSet)):
+        (structure, loaded), size = retained_memory(lambda: _fill(create(), ids))
+        del structure
+        start = time.process_time()
+        _fill(create(), ids)
+        seconds = time.process_time() - start
+        results[label] = (loaded, size)
+        print("{:<38}: {:>9} unique {:>8.1f} MB {:>6.1f} bytes/id {:>6.2f} us/id".format(
+            "  " + label, loaded, size / 1024 / 1024, size / max(loaded, 1), seconds * 1e6 / max(len(ids), 1)))
+    if results["IdSet"][0] != results["set of strings"][0]:
+        print("Different number of unique ids --------:", results["IdSet"][0], results["set of strings"][0])
+    print("{:<38}: {:>8.1f} %".format("  saved", 100 * (1 - results["IdSet"][1] / results["set of strings"][1])))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+""" Runs import.py against the local stand-in Weaviate and reports the throughput per stage
+
+Run from the repository root: python -m benchmarks.end_to_end_benchmark [--latency SECONDS] [metadata_file]
+
+import.py runs unchanged in a fresh interpreter with the config.yml of the repository,
+pointed at a benchmarks.fake_weaviate server, which also serves the taxonomy page, so no
+network and no Weaviate are needed. The latency, throughput limit and injected errors of
+the server are set on the command line, like the import modes of the config.
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+import yaml
+
+from benchmarks.fake_weaviate import FakeWeaviate
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+
+def _write_config(directory: str, url: str, args) -> str:
+    """ the config of the repository with the server, the data and the import mode of the run """
+    with open(os.path.join(ROOT, 'config.yml')) as file:
+        config = yaml.load(file, Loader=yaml.FullLoader)
+    config['weaviate'].update(url=url, schema=os.path.join(ROOT, 'schema', 'schema.json'),
+                              dead_letter_file=os.path.join(directory, 'dead-letters.ndjson'),
+                              adaptive_batch_size=args.adaptive, batch_retry_seconds=0.1)
+    config['data'].update(taxanomy=os.path.join(directory, 'taxanomy.html'),
+                          taxanomy_url=url + '/category_taxonomy',
+                          metadata_file=os.path.abspath(args.metadata_file),
+                          stream=args.stream, single_pass=args.single_pass)
+    path = os.path.join(directory, 'config.yml')
+    with open(path, 'w') as file:
+        yaml.dump(config, file)
+    return path
+
+
+def main():
+    """ main """
+    parser = argparse.ArgumentParser(description="Measure import.py end to end against a stand-in Weaviate")
+    parser.add_argument('metadata_file', nargs='?', default='./data/metadata/1000.json')
+    parser.add_argument('--latency', type=float, default=0.02, help="seconds every batch request takes at least")
+    parser.add_argument('--latency-per-object', type=float, default=0.0, help="seconds added per batch item")
+    parser.add_argument('--max-objects-per-second', type=float, default=0, help="throughput limit, 0 for none")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="share of batch requests failing with 503")
+    parser.add_argument('--object-error-rate', type=float, default=0.0, help="share of batch items timing out")
+    parser.add_argument('--invalid-object-rate', type=float, default=0.0, help="share of objects rejected as invalid")
+    parser.add_argument('--single-pass', action='store_true', help="import with single_pass: true")
+    parser.add_argument('--stream', action='store_true', help="import with stream: true")
+    parser.add_argument('--adaptive', action='store_true', help="import with adaptive_batch_size: true")
+    parser.add_argument('--shards', type=int, default=1, help="run this many import.py shards at once")
+    args = parser.parse_args()
+
+    with open(os.path.join(ROOT, 'data', 'taxanomy', 'taxanomy.html'), 'rb') as file:
+        files = {'/category_taxonomy': file.read()}
+    server = FakeWeaviate(latency=args.latency, latency_per_object=args.latency_per_object,
+                          max_objects_per_second=args.max_objects_per_second, error_rate=args.error_rate,
+                          object_error_rate=args.object_error_rate, invalid_object_rate=args.invalid_object_rate,
+                          files=files).start()
+
+    with tempfile.TemporaryDirectory() as directory:
+        _write_config(directory, server.url, args)
+        command = [sys.executable, os.path.join(ROOT, 'import.py')]
+        start = time.perf_counter()
+        if args.shards > 1:
+            shards = [subprocess.Popen(command + ['--num-shards', str(args.shards), '--shard-id', str(shard_id)],
+                                       cwd=directory, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                       universal_newlines=True) for shard_id in range(args.shards)]
+            results = [(shard.wait(), shard.stdout.read()) for shard in shards]
+        else:
+            result = subprocess.run(command, cwd=directory, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                    universal_newlines=True)
+            results = [(result.returncode, result.stdout)]
+        seconds = time.perf_counter() - start
+        if args.shards > 1:
+            merged = subprocess.run(command + ['--num-shards', str(args.shards), '--merge-shards'], cwd=directory,
+                                    stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
+            results.append((merged.returncode, merged.stdout))
+        dead_letters = 0
+        for name in os.listdir(directory):
+            if name.startswith('dead-letters'):
+                with open(os.path.join(directory, name)) as file:
+                    dead_letters += sum(1 for _ in file)
+    server.stop()
+
+    for returncode, output in results:
+        if returncode != 0:
+            print(output)
+            print("import.py failed ----------------------:", returncode)
+            sys.exit(1)
+    if args.shards > 1:
+        print(results[-1][1], end='')
+
+    received = sum(server.counts.values())
+    failed_requests = sum(1 for batch in server.batches if batch[4] != 200)
+    print("Metadata file -------------------------:", args.metadata_file)
+    print("Import time ---------------------------:", round(seconds, 2), "seconds")
+    print("Objects and references stored ---------:", received, "({:.0f}/s)".format(received / seconds))
+    print("Distinct objects ----------------------:", len(server.objects))
+    print("Batch requests ------------------------:", len(server.batches), "of which failed", failed_requests)
+    print("Dead letters --------------------------:", dead_letters)
+    for stage, stats in server.stage_stats().items():
+        print("{:<38}: {:>8} objects {:>8.2f} s {:>10.0f} objects/s".format(
+            "  " + stage, stats["objects"], stats["seconds"], stats["per_second"]))
+
+
+if __name__ == "__main__":
+    main()
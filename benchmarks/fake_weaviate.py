@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+""" A local stand-in for the parts of the Weaviate REST API the importer uses
+
+Run from the repository root: python -m benchmarks.fake_weaviate [--port 8080] [--latency SECONDS] ...
+
+It answers the readiness, meta and schema endpoints, and accepts object and reference
+batches and object and reference deletions without storing anything but the ids, so the importer can run
+end to end without Weaviate. Batch requests can be slowed down by a fixed and a per-object
+latency, capped to a number of objects per second, and fail on purpose, either as a whole
+with a 503 or for single objects in the batch result. Like Weaviate, an object created again
+with the uuid of an existing one replaces it, without the references the old one had, and a
+reference is only added to an object that exists.
+"""
+
+import re
+import json
+import time
+import random
+import argparse
+import threading
+import collections
+import http.server
+
+_OBJECT_PATH = re.compile(r'/v1/objects/([0-9a-f-]+)$')
+_REFERENCE_PATH = re.compile(r'/v1/objects/([0-9a-f-]+)/references/(\w+)$')
+_SCHEMA_CLASS_PATH = re.compile(r'/v1/schema/(\w+)$')
+_PROPERTIES_PATH = re.compile(r'/v1/schema/(\w+)/properties$')
+
+
+class FakeWeaviate(http.server.ThreadingHTTPServer):
+    """ The server, every request is handled by its own thread
+
+    What it received is recorded: the classes of the schema, the id and class of every
+    object, the from and to beacons of every reference, and for every batch request the
+    stage (the class of its first object, or 'references'), the number of items, the time
+    it arrived and was answered, and the status code.
+    """
+    daemon_threads = True
+
+    def __init__(self, address: tuple = ('127.0.0.1', 0), latency: float = 0.0, latency_per_object: float = 0.0,
+                 max_objects_per_second: float = 0, error_rate: float = 0.0, object_error_rate: float = 0.0,
+                 files: dict = None, seed: int = 0, invalid_object_rate: float = 0.0):
+        """
+        :param address: host and port to listen on, port 0 picks a free one
+        :type address: tuple, optional
+        :param latency: seconds every batch request takes at least
+        :type latency: float, optional
+        :param latency_per_object: seconds added for every item of a batch
+        :type latency_per_object: float, optional
+        :param max_objects_per_second: items all batch requests together may process per
+            second, requests wait for their turn, 0 for no limit
+        :type max_objects_per_second: float, optional
+        :param error_rate: share of batch requests answered with 503 Service Unavailable
+        :type error_rate: float, optional
+        :param object_error_rate: share of the items of a batch reported as failed with a
+            timeout, which goes away when they are sent again
+        :type object_error_rate: float, optional
+        :param files: static files to serve on GET, by path, e.g. the taxonomy page
+        :type files: dict, optional
+        :param seed: seed of the random errors
+        :type seed: int, optional
+        :param invalid_object_rate: share of the objects rejected as invalid, always the same
+            objects, chosen by their uuid
+        :type invalid_object_rate: float, optional
+        """
+        super().__init__(address, _Handler)
+        self.latency = latency
+        self.latency_per_object = latency_per_object
+        self.max_objects_per_second = max_objects_per_second
+        self.error_rate = error_rate
+        self.object_error_rate = object_error_rate
+        self.invalid_object_rate = invalid_object_rate
+        self.files = files or {}
+        self.classes = {}
+        self.objects = {}
+        self.references = set()
+        self.batches = []
+        self.counts = collections.Counter()
+        self.lock = threading.Lock()
+        self._random = random.Random(seed)
+        self._busy_until = 0.0
+
+    @property
+    def url(self) -> str:
+        """ the url to give to weaviate.Client """
+        return 'http://{}:{}'.format(*self.server_address[:2])
+
+    def start(self) -> 'FakeWeaviate':
+        """ serves requests in a background thread
+
+        :return: the server itself
+        :rtype: FakeWeaviate
+        """
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        """ stops serving and closes the socket """
+        self.shutdown()
+        self.server_close()
+
+    def stage_stats(self) -> dict:
+        """ The throughput of every stage, from its first batch request to its last answer
+
+        :return: per stage the number of items, the seconds and the items per second
+        :rtype: dict
+        """
+        stages = {}
+        with self.lock:
+            for stage, count, started, finished, status in self.batches:
+                if status != 200:
+                    continue
+                first, last, total = stages.get(stage, (started, finished, 0))
+                stages[stage] = (min(first, started), max(last, finished), total + count)
+        return {stage: {"objects": total, "seconds": last - first,
+                        "per_second": total / (last - first) if last > first else float('inf')}
+                for stage, (first, last, total) in stages.items()}
+
+    def _wait(self, count: int):
+        """ holds a batch request for the latency and its turn under the throughput limit """
+        seconds = self.latency + self.latency_per_object * count
+        if self.max_objects_per_second > 0:
+            with self.lock:
+                now = time.monotonic()
+                self._busy_until = max(now, self._busy_until) + count / self.max_objects_per_second
+                seconds = max(seconds, self._busy_until - now)
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def _fails(self, rate: float) -> bool:
+        if rate <= 0:
+            return False
+        with self.lock:
+            return self._random.random() < rate
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    """ answers the requests of one connection """
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """ readiness, meta, schema and static files """
+        if self.path in self.server.files:
+            self._send(200, self.server.files[self.path], 'text/html')
+        elif self.path in ('/v1/.well-known/ready', '/v1/.well-known/live'):
+            self._send_json(200, {})
+        elif self.path == '/v1/meta':
+            self._send_json(200, {"hostname": self.server.url, "version": "1.7.2", "modules": {}})
+        elif self.path == '/v1/schema':
+            with self.server.lock:
+                self._send_json(200, {"classes": list(self.server.classes.values())})
+        else:
+            self._send_json(404, {"error": [{"message": "not found: " + self.path}]})
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """ schema changes and batches """
+        body = self._read_json()
+        properties = _PROPERTIES_PATH.match(self.path)
+        if self.path == '/v1/schema':
+            with self.server.lock:
+                self.server.classes[body["class"]] = body
+            self._send_json(200, body)
+        elif properties is not None:
+            with self.server.lock:
+                self.server.classes[properties.group(1)].setdefault("properties", []).append(body)
+            self._send_json(200, body)
+        elif self.path == '/v1/batch/objects':
+            items = body["objects"]
+            self._batch(items[0]["class"] if items else "", items, self._add_object)
+        elif self.path == '/v1/batch/references':
+            self._batch('references', body, self._add_reference)
+        else:
+            self._send_json(404, {"error": [{"message": "not found: " + self.path}]})
+
+    def do_DELETE(self):  # pylint: disable=invalid-name
+        """ classes, single objects and single references """
+        body = self._read_json()
+        schema_class = _SCHEMA_CLASS_PATH.match(self.path)
+        data_object = _OBJECT_PATH.match(self.path)
+        reference = _REFERENCE_PATH.match(self.path)
+        if schema_class is not None:
+            with self.server.lock:
+                self.server.classes.pop(schema_class.group(1), None)
+                for object_uuid in [key for key, value in self.server.objects.items()
+                                    if value == schema_class.group(1)]:
+                    del self.server.objects[object_uuid]
+            self._send_json(200, {})
+        elif data_object is not None:
+            with self.server.lock:
+                found = self.server.objects.pop(data_object.group(1), None) is not None
+            self._send(204 if found else 404, b'')
+        elif reference is not None:
+            from_uuid, property_name = reference.groups()
+            with self.server.lock:
+                class_name = self.server.objects.get(from_uuid)
+                if class_name is not None:
+                    self.server.references.discard(("weaviate://localhost/{}/{}/{}".format(
+                        class_name, from_uuid, property_name), body["beacon"]))
+            self._send(204 if class_name is not None else 404, b'')
+        else:
+            self._send_json(404, {"error": [{"message": "not found: " + self.path}]})
+
+    def _batch(self, stage: str, items: list, add):
+        started = time.monotonic()
+        self.server._wait(len(items))  # pylint: disable=protected-access
+        if self.server._fails(self.server.error_rate):  # pylint: disable=protected-access
+            status, results = 503, {"error": [{"message": "injected error"}]}
+        else:
+            status, results = 200, [add(item) for item in items]
+        with self.server.lock:
+            self.server.batches.append((stage, len(items), started, time.monotonic(), status))
+        self._send_json(status, results)
+
+    def _add_object(self, item: dict) -> dict:
+        if int(item["id"].replace('-', ''), 16) % 10000 < self.server.invalid_object_rate * 10000:
+            return dict(item, result={"errors": {"error": [{"message": "invalid object: injected validation error"}]}})
+        if self.server._fails(self.server.object_error_rate):  # pylint: disable=protected-access
+            return dict(item, result={"errors": {"error": [{"message": "injected object timeout"}]}})
+        with self.server.lock:
+            if item["id"] in self.server.objects:
+                replaced = "weaviate://localhost/{}/{}/".format(self.server.objects[item["id"]], item["id"])
+                self.server.references = {reference for reference in self.server.references
+                                           if not reference[0].startswith(replaced)}
+            self.server.objects[item["id"]] = item["class"]
+            self.server.counts[item["class"]] += 1
+        return dict(item, result={})
+
+    def _add_reference(self, item: dict) -> dict:
+        if self.server._fails(self.server.object_error_rate):  # pylint: disable=protected-access
+            return dict(item, result={"status": "FAILED",
+                                      "errors": {"error": [{"message": "injected reference timeout"}]}})
+        with self.server.lock:
+            # weaviate://localhost/<class>/<uuid>/<property>
+            from_uuid = item["from"].split('/')[4]
+            if from_uuid not in self.server.objects:
+                return dict(item, result={"status": "FAILED", "errors": {"error": [
+                    {"message": "source object {} not found".format(from_uuid)}]}})
+            self.server.references.add((item["from"], item["to"]))
+            self.server.counts["references"] += 1
+        return dict(item, result={"status": "SUCCESS"})
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length', 0))
+        return json.loads(self.rfile.read(length)) if length > 0 else None
+
+    def _send_json(self, status: int, body):
+        self._send(status, json.dumps(body).encode('utf-8'), 'application/json')
+
+    def _send(self, status: int, body: bytes, content_type: str = 'application/json'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+
+def main():
+    """ main """
+    parser = argparse.ArgumentParser(description="Serve a stand-in for the Weaviate batch API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds every batch request takes at least")
+    parser.add_argument('--latency-per-object', type=float, default=0.0, help="seconds added per batch item")
+    parser.add_argument('--max-objects-per-second', type=float, default=0, help="throughput limit, 0 for none")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="share of batch requests failing with 503")
+    parser.add_argument('--object-error-rate', type=float, default=0.0, help="share of batch items timing out")
+    parser.add_argument('--invalid-object-rate', type=float, default=0.0, help="share of objects rejected as invalid")
+    args = parser.parse_args()
+
+    server = FakeWeaviate((args.host, args.port), args.latency, args.latency_per_object,
+                          args.max_objects_per_second, args.error_rate, args.object_error_rate,
+                          invalid_object_rate=args.invalid_object_rate)
+    print("Stand-in Weaviate listening on --------:", server.url)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+    print("Received objects ----------------------:", dict(server.counts))
+    for stage, stats in server.stage_stats().items():
+        print("{:<38}: {:>8} objects {:>8.1f} objects/s".format("  " + stage, stats["objects"], stats["per_second"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+""" Compares the installed JSON decoder backends on the bundled metadata files
+
+Run from the repository root: python -m benchmarks.json_decoder_benchmark [metadata_file ...]
+"""
+
+import sys
+import glob
+import time
+
+from modules.decoders import available_json_decoders
+from modules.decoders import get_json_decoder
+
+
+def _decode_all(loads, lines: list) -> float:
+    start = time.perf_counter()
+    for line in lines:
+        loads(line)
+    return time.perf_counter() - start
+
+
+def main():
+    """ main """
+    filenames = sys.argv[1:] or sorted(glob.glob('./data/metadata/*.json'))
+    backends = available_json_decoders()
+
+    print("Backends ------------------------------:", ', '.join(backends))
+    for filename in filenames:
+        with open(filename, 'rb') as file:
+            lines = file.readlines()
+        megabytes = sum(len(line) for line in lines) / 1024 / 1024
+        # repeat small files so every measurement decodes at least 5000 lines
+        repeat = max(1, 5000 // len(lines))
+        timings = {}
+        for backend in backends:
+            loads = get_json_decoder(backend)
+            timings[backend] = min(_decode_all(loads, lines * repeat) for _ in range(3)) / repeat
+        for backend, elapsed in timings.items():
+            print("{:<38}: {:>10.0f} lines/s {:>8.1f} MB/s {:>6.2f}x json".format(
+                filename + " " + backend, len(lines) / elapsed, megabytes / elapsed,
+                timings['json'] / elapsed))
+
+
+if __name__ == "__main__":
+    main()
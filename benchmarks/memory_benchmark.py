@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+""" Memory benchmark of the papers kept in memory, raw dicts against PaperRecord objects
+
+Run from the repository root:
+python -m benchmarks.memory_benchmark [--synthetic N] [--authors N] [metadata_file ...]
+
+Loads every file once as the list of raw json dicts that get_metadata returned before, and
+once as the list of records it returns now, and reports the memory the list holds per paper.
+The synthetic file of N papers (100000 by default, 0 to skip it) repeats the 1000 papers file
+with new ids, so its author and journal names repeat more often than in the real data set and
+the records share more of them through the normalizer cache.
+
+The author stage is measured on a stream of synthetic papers with four authors each, drawn
+from N distinct names (1000000 by default, 0 to skip it) with a few frequent ones, once with
+the names it sent kept in memory and once with an id registry that tracks them. It reports
+the peak Python memory of the stage, the time per author and how many lookups went to
+SQLite. The SQLite page cache, at most DEFAULT_REGISTRY_CACHE_KB, is not part of the peak.
+"""
+
+import io
+import os
+import gc
+import contextlib
+import time
+import random
+import argparse
+import tempfile
+
+from benchmarks.common import peak_memory
+from benchmarks.common import retained_memory
+from benchmarks.cpu_benchmark import write_synthetic_file
+from benchmarks.cpu_benchmark import METADATA_FILES
+from modules.metadata import _read_metadata_file
+from modules.metadata import get_metadata
+from modules.imports import import_authors
+from modules.batching import BatchSender
+from modules.records import PaperRecord
+from modules.registry import IdRegistry
+
+
+class _AcknowledgingBatch:
+    """ stand-in for client.batch that acknowledges every object without sending it """
+
+    def create_objects(self, batch) -> list:
+        """ reports every object as created """
+        return [dict(item, result={}) for item in batch.get_request_body()["objects"]]
+
+
+class _AcknowledgingClient:
+    """ stand-in for weaviate.Client for the author stage """
+
+    def __init__(self):
+        self.batch = _AcknowledgingBatch()
+
+
+def _synthetic_papers(papers: int, authors: int):
+    """ records of papers with four authors each, every author appears about once every
+    authors / papers / 4 papers and a few of them far more often
+    """
+    generator = random.Random(1)
+    for number in range(papers):
+        names = ["Author {}".format(number * 4 % authors), "Author {}".format((number * 4 + 1) % authors),
+                 "Author {}".format(int(authors * generator.random() ** 3)),
+                 "Author {}".format(int(authors * generator.random() ** 3))]
+        yield PaperRecord.from_values((str(number), None, None, None, None, tuple(names)) + (None,) * 10)
+
+
+def _benchmark_authors(authors: int):
+    """ measures the author stage with the names in memory and with an id registry """
+    papers = authors // 2
+    config = {"weaviate": {"batch_workers": 0, "max_batch_size": 1000}}
+    for label in ("names in memory", "id registry"):
+        with tempfile.TemporaryDirectory() as directory:
+            registry = None
+            if label == "id registry":
+                registry = IdRegistry(os.path.join(directory, 'registry.sqlite'))
+
+            def run():
+                with BatchSender(_AcknowledgingClient(), config, registry) as sender:
+                    return import_authors(None, config, _synthetic_papers(papers, authors), sender=sender)
+            gc.collect()
+            peak = peak_memory(run)
+            if registry is not None:
+                registry.clear()
+                registry.lookups = 0
+            start = time.process_time()
+            with contextlib.redirect_stdout(io.StringIO()):
+                sent = run()
+            seconds = time.process_time() - start
+            lookups = registry.lookups if registry is not None else 0
+            print("{:<38}: {:>8} authors {:>8.1f} MB peak {:>6.2f} us/author {:>9} SQLite lookups".format(
+                "  " + label, sent, peak / 1024 / 1024, seconds * 1e6 / (papers * 4), lookups))
+            if registry is not None:
+                registry.close()
+
+
+def _benchmark_file(filename: str):
+    """ measures both representations of the papers of one metadata file """
+    sizes = {}
+    for label, load in (("raw dicts", lambda: _read_metadata_file(filename, -1, 0)),
+                        ("records", lambda: get_metadata({"data": {"metadata_file": filename}}, False))):
+        gc.collect()
+        papers, size = retained_memory(load)
+        sizes[label] = size / max(len(papers), 1)
+        print("{:<38}: {:>8} papers {:>8.1f} MB {:>8.0f} bytes/paper".format(
+            "  " + label, len(papers), size / 1024 / 1024, sizes[label]))
+        del papers
+    print("{:<38}: {:>8.1f} %".format("  saved per paper", 100 * (1 - sizes["records"] / sizes["raw dicts"])))
+
+
+def main():
+    """ main """
+    parser = argparse.ArgumentParser(description="Measure the memory per paper of raw dicts and records")
+    parser.add_argument('metadata_files', nargs='*', default=METADATA_FILES)
+    parser.add_argument('--synthetic', type=int, default=100000, help="papers in the synthetic file, 0 to skip it")
+    parser.add_argument('--authors', type=int, default=1000000,
+                        help="distinct authors of the author stage, 0 to skip it")
+    args = parser.parse_args()
+
+    # the first load compiles patterns and fills caches, which would count for the first file
+    retained_memory(lambda: get_metadata({"data": {"metadata_file": METADATA_FILES[0]}}, False))
+    for filename in args.metadata_files:
+        print("Metadata file -------------------------:", filename)
+        _benchmark_file(filename)
+
+    if args.synthetic > 0:
+        with tempfile.TemporaryDirectory() as directory:
+            filename = write_synthetic_file(METADATA_FILES[-1], os.path.join(directory, 'synthetic.json'),
+                                            args.synthetic)
+            print("Synthetic metadata file ---------------:", args.synthetic, "papers")
+            _benchmark_file(filename)
+
+    if args.authors > 0:
+        print("Author stage of synthetic papers ------:", args.authors, "distinct authors")
+        _benchmark_authors(args.authors)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+""" Compares the cached NameNormalizer with format_author_name and format_journal_name
+
+Run from the repository root: python -m benchmarks.name_normalization_benchmark [metadata_file]
+
+The raw strings of the file are repeated, like prolific authors and journals repeat in the
+full snapshot, and also normalized as unique strings to show the cost of cache misses.
+"""
+
+import sys
+import json
+import time
+
+from modules.utilities import format_author_name
+from modules.utilities import format_journal_name
+from modules.normalization import NameNormalizer
+
+REPEAT = 20
+CHUNK = 1000
+
+
+def _best(function, values: list) -> float:
+    timings = []
+    for _ in range(3):
+        start = time.perf_counter()
+        function(values)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def _report(label: str, count: int, elapsed: float, baseline: float):
+    print("{:<38}: {:>10.0f} strings/s {:>6.2f}x".format(label, count / elapsed, baseline / elapsed))
+
+
+def _compare(kind: str, values: list, reference, normalize, normalize_batch=None):
+    """ times the current function against a fresh NameNormalizer per run """
+    baseline = _best(lambda values: [reference(value) for value in values], values)
+    _report(kind + " current function", len(values), baseline, baseline)
+
+    def run(values):
+        normalizer = NameNormalizer()
+        for value in values:
+            normalize(normalizer, value)
+    _report(kind + " normalizer", len(values), _best(run, values), baseline)
+
+    if normalize_batch is not None:
+        def run_batch(values):
+            normalizer = NameNormalizer()
+            for start in range(0, len(values), CHUNK):
+                normalize_batch(normalizer, values[start:start + CHUNK])
+        _report(kind + " normalizer batch", len(values), _best(run_batch, values), baseline)
+
+
+def main():
+    """ main """
+    filename = sys.argv[1] if len(sys.argv) > 1 else './data/metadata/1000.json'
+    with open(filename, 'rb') as file:
+        papers = [json.loads(line) for line in file]
+    authors = [paper["authors"] for paper in papers if paper["authors"] is not None]
+    journals = [paper["journal-ref"] for paper in papers if paper["journal-ref"] is not None]
+
+    normalize_authors = lambda normalizer, value: normalizer.authors(value)
+    normalize_authors_batch = lambda normalizer, values: normalizer.authors_batch(values)
+    normalize_journal = lambda normalizer, value: normalizer.journal(value)
+
+    print("Unique strings, every lookup is a miss")
+    _compare("authors", authors, format_author_name, normalize_authors, normalize_authors_batch)
+    _compare("journals", journals, format_journal_name, normalize_journal)
+
+    print("Strings repeated", REPEAT, "times")
+    _compare("authors", authors * REPEAT, format_author_name, normalize_authors, normalize_authors_batch)
+    _compare("journals", journals * REPEAT, format_journal_name, normalize_journal)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+""" Compares the CPU time of the staged import with the single-pass import
+
+Run from the repository root: python -m benchmarks.single_pass_benchmark [metadata_file]
+"""
+
+import sys
+
+from benchmarks.common import NullClient
+from benchmarks.common import measure
+from benchmarks.common import quiet
+from modules.metadata import get_metadata
+from modules.imports import import_journals
+from modules.imports import import_authors
+from modules.imports import import_papers
+from modules.imports import import_single_pass
+from modules.imports import cross_reference
+
+
+def _staged(config, data):
+    client = NullClient()
+    import_journals(client, config, data)
+    import_authors(client, config, data)
+    papers = import_papers(client, config, data, {})
+    cross_reference(client, config, papers)
+    return client
+
+
+def _single_pass(config, data):
+    client = NullClient()
+    import_single_pass(client, config, data, {})
+    return client
+
+
+def main():
+    """ main """
+    filename = sys.argv[1] if len(sys.argv) > 1 else './data/metadata/1000.json'
+    config = {"weaviate": {"max_batch_size": 100, "batch_workers": 0}, "data": {"metadata_file": filename}}
+    with quiet():
+        data = get_metadata(config)
+
+    staged = measure(lambda: _staged(config, data), repeat=5)
+    single_pass = measure(lambda: _single_pass(config, data), repeat=5)
+
+    print("Papers --------------------------------:", len(data))
+    print("Staged import CPU time ----------------:", round(staged, 3), "seconds")
+    print("Single-pass import CPU time -----------:", round(single_pass, 3), "seconds")
+    print("CPU time saved ------------------------:", round(100 * (1 - single_pass / staged), 1), "%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+""" Measures how long import.py takes from the start of the interpreter to its first batch
+
+Run from the repository root: python -m benchmarks.startup_benchmark [--max-first-batch SECONDS]
+
+import.py runs in a fresh interpreter against a client that accepts every batch, with the
+taxonomy page of the repository and the 10 papers file, so neither the network nor Weaviate
+are part of the measurement. The time to the first batch is the best of several runs, a run
+with python -X importtime lists the modules that take longest to import. The benchmark exits
+with status 1 if a time is over its budget, to catch startup regressions in CI.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+# import.py with the client, the schema and the download of the taxonomy replaced, it prints
+# the time of the first batch and exits
+_CHILD = """
+import os, sys, time, runpy
+sys.path.insert(0, {root!r})
+import modules.utilities
+import modules.download
+
+class FirstBatch:
+    def create_objects(self, batch):
+        print(time.time(), flush=True)
+        os._exit(0)
+
+class Client:
+    batch = FirstBatch()
+
+modules.utilities.get_weaviate_client = lambda instance: Client()
+modules.utilities.load_schema = lambda client, config: True
+modules.download.download = lambda url, path, *args, **kwargs: path
+sys.argv = ['import.py']
+runpy.run_path(os.path.join({root!r}, 'import.py'), run_name='__main__')
+"""
+
+
+def _run(directory: str, importtime: bool = False) -> tuple:
+    """ runs import.py once, returns the seconds to the first batch and the stderr output """
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', _CHILD.format(root=ROOT)]
+    start = time.time()
+    result = subprocess.run(command, cwd=directory, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            universal_newlines=True, check=True)
+    return float(result.stdout.split()[-1]) - start, result.stderr
+
+
+def _slowest_imports(stderr: str, count: int) -> tuple:
+    """ the total import time and the slowest top level imports, in seconds """
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # nested imports are indented, their time is part of the import that caused them
+        if not name[1:].startswith(' '):
+            imports.append((int(cumulative) / 1e6, name.strip()))
+    return sum(seconds for seconds, _ in imports), sorted(imports, reverse=True)[:count]
+
+
+def main():
+    """ main """
+    parser = argparse.ArgumentParser(description="Measure the startup time of import.py")
+    parser.add_argument('--max-first-batch', type=float, default=1.0,
+                        help="budget in seconds from the start of the interpreter to the first batch")
+    parser.add_argument('--max-imports', type=float, default=0.5,
+                        help="budget in seconds for importing modules")
+    parser.add_argument('--repeat', type=int, default=5, help="number of runs, the best one counts")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        taxanomy = os.path.join(directory, 'taxanomy.html')
+        shutil.copy(os.path.join(ROOT, 'data', 'taxanomy', 'taxanomy.html'), taxanomy)
+        config = {"weaviate": {"url": "http://localhost:8080", "batch_retries": 0},
+                  "data": {"taxanomy": taxanomy, "metadata_file": os.path.join(ROOT, 'data', 'metadata', '10.json')}}
+        with open(os.path.join(directory, 'config.yml'), 'w') as file:
+            json.dump(config, file)
+
+        # the first run parses the taxonomy page and caches it, like the first run of a job
+        first_run, _ = _run(directory)
+        first_batch = min(_run(directory)[0] for _ in range(args.repeat))
+        import_seconds, slowest = _slowest_imports(_run(directory, importtime=True)[1], 10)
+
+    print("First batch after a cold cache --------:", round(first_run, 3), "seconds")
+    print("First batch ---------------------------:", round(first_batch, 3), "seconds")
+    print("Importing modules ---------------------:", round(import_seconds, 3), "seconds")
+    for seconds, name in slowest:
+        print("{:<38}: {:>6.3f} seconds".format("  " + name, seconds))
+
+    over_budget = []
+    if first_batch > args.max_first_batch:
+        over_budget.append("first batch {:.3f}s > {}s".format(first_batch, args.max_first_batch))
+    if import_seconds > args.max_imports:
+        over_budget.append("imports {:.3f}s > {}s".format(import_seconds, args.max_imports))
+    if over_budget:
+        print("Startup over budget -------------------:", ', '.join(over_budget))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+""" Compares parse_version_date with dateutil on the version dates of a 100k-paper run
+
+Run from the repository root: python -m benchmarks.version_date_benchmark [n_papers]
+"""
+
+import sys
+import time
+import random
+import datetime
+
+from dateutil import parser
+from modules.utilities import parse_version_date
+
+
+def _version_dates(n_papers: int) -> list:
+    """ creates arxiv style version dates, one to three versions per paper """
+    random.seed(0)
+    first = datetime.datetime(1991, 8, 1, tzinfo=datetime.timezone.utc).timestamp()
+    last = datetime.datetime(2021, 1, 1, tzinfo=datetime.timezone.utc).timestamp()
+    dates = []
+    for _ in range(n_papers):
+        for _ in range(random.randint(1, 3)):
+            created = datetime.datetime.fromtimestamp(random.uniform(first, last), datetime.timezone.utc)
+            dates.append(created.strftime('%a, %-d %b %Y %H:%M:%S GMT'))
+    return dates
+
+
+def _dateutil(created: str) -> str:
+    try:
+        return parser.parse(created).isoformat()
+    except Exception:  # pylint: disable=broad-except
+        return None
+
+
+def _run(function, dates: list) -> float:
+    start = time.perf_counter()
+    for created in dates:
+        function(created)
+    return time.perf_counter() - start
+
+
+def main():
+    """ main """
+    n_papers = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    dates = _version_dates(n_papers)
+
+    reference = _run(_dateutil, dates)
+    parse_version_date.cache_clear()
+    fast = _run(parse_version_date, dates)
+    parse_version_date.cache_clear()
+    repeated = _run(parse_version_date, dates[:len(dates) // 10] * 10)
+
+    print("Papers / version dates ----------------:", n_papers, "/", len(dates))
+    print("dateutil.parser.parse -----------------:", round(reference, 2), "seconds")
+    print("parse_version_date --------------------:", round(fast, 2), "seconds,",
+          round(reference / fast, 1), "x faster")
+    print("parse_version_date, dates repeated 10x :", round(repeated, 2), "seconds,",
+          round(reference / repeated, 1), "x faster")
+    print("Same results --------------------------:",
+          all(_dateutil(created) == parse_version_date(created) for created in dates[:10000]))
+
+
+if __name__ == "__main__":
+    main()
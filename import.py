@@ -1,41 +1,244 @@
 #!/usr/bin/env python3
 """ Load the data into Weaviate """
 
+import os
 import time
+import argparse
 import yaml
 
-from modules.taxanomy import load_taxanomy
-from modules.taxanomy import add_groups
-from modules.taxanomy import add_archives
-from modules.taxanomy import add_categories
-from modules.metadata import get_metadata
-from modules.imports import import_journals
-from modules.imports import import_authors
-from modules.imports import import_papers
-from modules.imports import cross_reference
-from modules.utilities import load_schema
+# only modules without heavy dependencies are loaded up front, weaviate, requests and the
+# parsers are loaded by the functions below once a run gets to use them
 from modules.utilities import get_weaviate_client
+from modules.utilities import load_schema
+from modules.registry import get_id_registry
+from modules.checkpoint import get_checkpoint
+from modules.delta import get_paper_index
+from modules.deadletter import start_replay
+from modules.metrics import get_metrics
+from modules.profiling import get_profiler
+from modules.profiling import DEFAULT_PROFILE_TOP
+from modules.sharding import get_shard
+from modules.sharding import SHARED_CLASSES
+from modules.sharding import wait_for_schema
+from modules.sharding import merge_shard_metrics
+from modules.sharding import DEFAULT_SCHEMA_WAIT_SECONDS
+
+
+def _replay_dead_letters(client, config):
+    """ Sends only the items of the dead-letter file again, the ones that fail again are
+    written to a new dead-letter file
+    """
+    # pylint: disable=import-outside-toplevel
+    from modules.batching import BatchSender
+    from modules.imports import replay_dead_letters
+
+    if not config['weaviate'].get('dead_letter_file'):
+        print("Replay needs a dead-letter file -------: set dead_letter_file in config.yml")
+        return
+    path = start_replay(config['weaviate']['dead_letter_file'])
+    if path is None:
+        print("No dead-letter file to replay ---------:", config['weaviate']['dead_letter_file'])
+        return
+
+    registry = get_id_registry(config)
+    with BatchSender(client, config, registry) as sender:
+        replay_dead_letters(client, config, path, sender)
+    os.remove(path)
+    if registry is not None:
+        registry.close()
+
+
+def _convert_metadata(config):
+    """ Writes the columnar copy of the metadata file that later imports read instead """
+    # pylint: disable=import-outside-toplevel
+    from modules.metadata import get_metadata_file
+    from modules.columnar import convert_metadata
+    from modules.decoders import get_json_decoder_name
+
+    if not config['data'].get('columnar'):
+        print("Conversion needs a columnar directory -: set columnar in config.yml")
+        return
+    convert_metadata(get_metadata_file(config), config['data']['columnar'], get_json_decoder_name(config))
 
 
-def _load_arxiv_demo():
+def _load_metadata(metrics, config: dict, stream: bool, categories: dict, state: dict):
+    """ Loads the metadata as the load stage, a stream is only read by the stages that use it
+    """
+    # pylint: disable=import-outside-toplevel
+    from modules.metadata import get_metadata
 
+    if stream:
+        return get_metadata(config, True, categories, state)
+    with metrics.stage('load'):
+        data = get_metadata(config, False, categories, state)
+    metrics.count('load', len(data))
+    return data
+
+
+def _load_arxiv_demo(resume: bool = False, delta: bool = False, replay: bool = False, profiler=None,
+                     convert: bool = False, shard_id: int = None, num_shards: int = None, merge: list = None):
+    # pylint: disable=import-outside-toplevel
     with open('./config.yml') as file:
         config = yaml.load(file, Loader=yaml.FullLoader)
 
     if config is not None and 'weaviate' in config and 'data' in config:
+        if shard_id is not None:
+            config['data']['shard_id'] = shard_id
+        if num_shards is not None:
+            config['data']['num_shards'] = num_shards
+        if merge is not None:
+            merge_shard_metrics(config, merge)
+            return
+        if convert:
+            _convert_metadata(config)
+            return
+
+        # every shard keeps its own checkpoint, id registry, dead letters and metrics
+        shard = get_shard(config)
+        if shard is not None:
+            if delta or config['data'].get('paper_index'):
+                print("Sharded import keeps no paper index ---: unset paper_index, a delta import runs unsharded")
+                return
+            shard.apply(config)
+        if replay:
+            _replay_dead_letters(get_weaviate_client(config['weaviate']), config)
+            return
+
+        # a checkpoint needs to know the position in the metadata file, so it is read as a stream
+        checkpoint = get_checkpoint(config)
+        state = None
+        if checkpoint is not None:
+            config['data']['stream'] = True
+            if not config['weaviate'].get('id_registry'):
+                # a resume skips what the interrupted run sent by the registry of the checkpoint
+                config['weaviate']['id_registry'] = checkpoint.registry_path
+            if resume:
+                state = checkpoint.load()
+        if resume:
+            config['weaviate']['overwrite_schema'] = False
+        if state is not None:
+            if state['stage'] == 'done':
+                print("Import already completed --------------:", state['counts'])
+                return
+            print("Resuming import from checkpoint -------:", state['stage'], "at byte", state['offset'])
+            if shard is not None:
+                shard.shared_sent = state['stage'] in ('papers', 'single_pass')
+
+        # nothing is left to skip, load what the import needs
+        from modules.taxanomy import load_taxanomy
+        from modules.taxanomy import add_groups
+        from modules.taxanomy import add_archives
+        from modules.taxanomy import add_categories
+        from modules.metadata import get_metadata
+        from modules.imports import import_journals
+        from modules.imports import import_authors
+        from modules.imports import import_papers
+        from modules.imports import import_prepared_papers
+        from modules.imports import cross_reference
+        from modules.imports import import_shard_references
+        from modules.imports import import_delta
+        from modules.batching import BatchSender
         client = get_weaviate_client(config['weaviate'])
-        load_schema(client, config)
 
-        taxanomy = load_taxanomy(config)
-        groups = add_groups(client, taxanomy["groups"])
-        archives = add_archives(client, taxanomy["archives"], groups)
-        categories = add_categories(client, taxanomy["categories"], archives)
+        # with a paper index every import records the content hash of the papers, and a delta
+        # import keeps the data and only sends what changed since
+        index = get_paper_index(config)
+        if delta:
+            if index is None:
+                print("Delta import needs a paper index ------: set paper_index in config.yml")
+                return
+            config['weaviate']['overwrite_schema'] = False
 
-        data = get_metadata(config)
-        journals = import_journals(client, config, data)
-        authors = import_authors(client, config, data)
-        papers = import_papers(client, config, data, categories, journals, authors)
-        cross_reference(client, config, papers)
+        # the registry remembers what Weaviate acknowledged, so a rerun skips those objects.
+        # Changed papers keep their uuid, so with a paper index it only skips the journals and
+        # authors, sending one again would replace it without the references of unchanged papers
+        if index is not None and not config['weaviate'].get('id_registry'):
+            config['weaviate']['id_registry'] = index.registry_path
+        registry = get_id_registry(config, None if index is None else SHARED_CLASSES)
+        if shard is not None and not shard.loads_schema:
+            # only shard 0 loads the schema, if it recreates it the data the registry recorded is gone
+            if not wait_for_schema(client, config['data'].get('schema_wait_seconds', DEFAULT_SCHEMA_WAIT_SECONDS)):
+                print("\nNo schema of shard 0 found ------------: start shard 0 first")
+                return
+            created = config['weaviate'].get('overwrite_schema', True)
+        else:
+            created = load_schema(client, config)
+        if created:
+            for store in (registry, index):
+                if store is not None:
+                    store.clear()
+
+        metrics = get_metrics(config, profiler)
+        with BatchSender(client, config, registry, metrics, shard) as sender:
+            with metrics.stage('taxonomy'):
+                taxanomy = load_taxanomy(config)
+                groups = add_groups(client, taxanomy["groups"], sender)
+                archives = add_archives(client, taxanomy["archives"], groups, sender)
+                categories = add_categories(client, taxanomy["categories"], archives, sender)
+
+            # in stream mode every stage reads the metadata file again instead of keeping all
+            # papers in memory, and the author references are added along with the papers
+            stream = config['data'].get('stream', False)
+            if index is not None:
+                papers = get_metadata(config, True, categories)
+                with metrics.stage('papers'):
+                    import_delta(client, config, papers, index, sender)
+            elif config['data'].get('single_pass', False):
+                if shard is not None and not shard.shared_sent:
+                    # the shard sends the shared objects it owns and their references first, the
+                    # single pass then only sends its papers
+                    shared = get_metadata(config, True, whole_file=True)
+                    with metrics.stage('journals'):
+                        import_journals(client, config, shared, sender=sender)
+                    with metrics.stage('authors'):
+                        import_authors(client, config, shared, sender=sender)
+                    with metrics.stage('references'):
+                        import_shard_references(client, config, shared, sender)
+                    shard.shared_sent = True
+                # the papers are prepared while loading, by the worker processes if
+                # parse_processes is set
+                papers = _load_metadata(metrics, config, stream, categories, state)
+                with metrics.stage('papers'):
+                    import_prepared_papers(client, config, papers, sender, checkpoint)
+            else:
+                # after a resume the registry skips the journals and authors that were sent,
+                # sending one again would replace it without the references it has
+                data = _load_metadata(metrics, config, stream, None, state)
+                # a shard needs the uuids of the journals and authors of the whole file, and
+                # sends the ones it owns and their references
+                shared = data if shard is None else get_metadata(config, True, whole_file=True)
+                with metrics.stage('journals'):
+                    journals = import_journals(client, config, shared, sender=sender)
+                if checkpoint is not None:
+                    checkpoint.update('authors', counts={"Journal": journals})
+                with metrics.stage('authors'):
+                    authors = import_authors(client, config, shared, sender=sender)
+                if shard is not None and not shard.shared_sent:
+                    with metrics.stage('references'):
+                        import_shard_references(client, config, shared, sender)
+                if checkpoint is not None:
+                    checkpoint.update('papers', counts={"Author": authors})
+                with metrics.stage('papers'):
+                    papers = import_papers(client, config, data, categories, stream_references=stream,
+                                           sender=sender, checkpoint=checkpoint)
+                if not stream:
+                    with metrics.stage('references'):
+                        cross_reference(client, config, papers, sender=sender)
+        metrics.report()
+        if profiler is not None:
+            profiler.report(metrics.summary())
+        if shard is not None:
+            print("Metrics of the shard written to -------:", config['data']['metrics_json'],
+                  "- combine the shards with import.py --merge-shards")
+
+        if checkpoint is not None:
+            checkpoint.update('done')
+            print("Checkpoint of the completed import ----:", checkpoint.state['counts'])
+        if registry is not None:
+            print("Skipped acknowledged objects ----------:", dict(registry.skipped))
+            registry.close()
+        if index is not None:
+            index.close()
 
 
 ###############################################################################################
@@ -45,13 +248,40 @@ def _load_arxiv_demo():
 
 def main():
     """ main """
+    parser = argparse.ArgumentParser(description="Load the arxiv data set into Weaviate")
+    parser.add_argument('--resume', action='store_true',
+                        help="keep the existing data and continue from the checkpoint set in config.yml")
+    parser.add_argument('--delta', action='store_true',
+                        help="keep the existing data and only import the papers that are new, changed or "
+                             "withdrawn since the last import, needs paper_index in config.yml")
+    parser.add_argument('--replay', action='store_true',
+                        help="keep the existing data and only send the items of the dead-letter file again")
+    parser.add_argument('--convert', action='store_true',
+                        help="only convert the metadata file into the columnar copy set by columnar in config.yml, "
+                             "which later imports read instead")
+    parser.add_argument('--profile', nargs='?', const='profile', metavar='DIRECTORY',
+                        help="run every stage under cProfile and write a profile per stage and a summary of "
+                             "the top functions to DIRECTORY (default: profile)")
+    parser.add_argument('--profile-top', type=int, default=DEFAULT_PROFILE_TOP, metavar='N',
+                        help="number of functions per stage in the profile summary")
+    parser.add_argument('--shard-id', type=int, metavar='ID',
+                        help="import only the part ID (from 0) of the metadata file, overrides shard_id in config.yml")
+    parser.add_argument('--num-shards', type=int, metavar='N',
+                        help="split the import into N shards, overrides num_shards in config.yml")
+    parser.add_argument('--merge-shards', nargs='*', metavar='METRICS_JSON',
+                        help="only combine the metrics of the shards, read from the given files or the metrics_json "
+                             "files of all shards")
+    args = parser.parse_args()
+
     start = time.time()
 
-    _load_arxiv_demo()
+    _load_arxiv_demo(args.resume, args.delta, args.replay, get_profiler(args.profile, args.profile_top), args.convert,
+                     args.shard_id, args.num_shards, args.merge_shards)
 
     end = time.time()
     minutes = round((end-start)/60)
     print("Total time required:", minutes, "minutes", round((end-start)%60, 1), "seconds")
 
 
-main()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+""" Concurrent submission of batch requests to Weaviate """
+
+import re
+import json
+import time
+import random
+import collections
+from concurrent import futures
+import requests
+import weaviate
+from weaviate.exceptions import UnexpectedStatusCodeException
+from modules.utilities import check_batch_result
+from modules.sizing import get_batch_sizer
+from modules.deadletter import get_dead_letter_file
+from modules.deadletter import parse_reference
+from modules.metrics import Metrics
+
+
+DEFAULT_BATCH_WORKERS = 4
+DEFAULT_BATCH_QUEUE_SIZE = 8
+DEFAULT_BATCH_RETRIES = 3
+DEFAULT_BATCH_RETRY_SECONDS = 1.0
+MAX_BATCH_RETRY_SECONDS = 60.0
+
+# errors of a whole request that are worth another try, anything else is a bug
+_TRANSIENT_ERRORS = (requests.exceptions.RequestException, UnexpectedStatusCodeException)
+# status codes of a whole request that are sent again, other 4xx answers are final
+_TRANSIENT_STATUS_CODES = (408, 429)
+# errors of single items that are worth another try, e.g. validation errors are final
+_TRANSIENT_ITEM_ERROR = re.compile(r'time(d)? ?out|deadline exceeded|context canceled|overload|unavailable|'
+                                   r'too many requests|temporar|try again|connection (refused|reset)', re.IGNORECASE)
+# the error of items the answer of a batch request has no result for
+_MISSING_RESULT = "no result for the item in the answer of the batch request"
+
+# the outcome of sending a batch, see BatchSender._send
+_Sent = collections.namedtuple('_Sent', ['results', 'started', 'seconds', 'payload_bytes', 'failed', 'first_failed',
+                                         'timeout'])
+
+
+class BatchSender:
+    """ Sends object and reference batches to Weaviate from a pool of worker threads
+
+    At most queue_size batches are queued or in flight at the same time, submitting another one
+    blocks until the oldest batch is done. The results are checked with check_batch_result in
+    the order the batches were submitted. With 0 workers every batch is sent right away in the
+    calling thread, like a plain client.batch call. If a registry is given, the objects and
+    references Weaviate acknowledged are recorded in it, and the importers skip ids it knows.
+    The round trip of every batch is reported to the batch sizer, which the importers ask for
+    the size of their batches, and together with the payload size and errors to the metrics,
+    as is the time the calling thread waits for batches.
+
+    Failed requests and single items that failed with a transient error, like a timeout or an
+    overloaded node, are sent again up to batch_retries times, after an exponential backoff
+    with jitter. So are items the answer has no result for. Other errors, e.g. of invalid
+    objects, are final. Items that still fail are written to the dead-letter file, if one is
+    set, otherwise a request that keeps failing, or keeps leaving items without a result,
+    raises its error like before and the errors of single items are printed.
+    """
+
+    def __init__(self, client, config: dict = None, registry=None, metrics: Metrics = None, shard=None):
+        """
+        :param client: python client connection
+        :type client: weaviate.client.Client
+        :param config: the config file with parameters, reads batch_workers, batch_queue_size,
+            batch_retries, batch_retry_seconds, dead_letter_file and the batch sizes, see
+            modules.sizing.get_batch_sizer, from the weaviate section
+        :type config: dict, optional
+        :param registry: records the acknowledged ids
+        :type registry: modules.registry.IdRegistry, optional
+        :param metrics: records every batch, defaults to new metrics
+        :type metrics: modules.metrics.Metrics, optional
+        :param shard: the shard of a sharded import, the importers skip the shared objects
+            other shards send
+        :type shard: modules.sharding.Shard, optional
+        """
+        self.client = client
+        self.registry = registry
+        self.shard = shard
+        self.workers = DEFAULT_BATCH_WORKERS
+        self.queue_size = DEFAULT_BATCH_QUEUE_SIZE
+        self.retries = DEFAULT_BATCH_RETRIES
+        self.retry_seconds = DEFAULT_BATCH_RETRY_SECONDS
+        if config is not None and 'weaviate' in config:
+            self.workers = config['weaviate'].get('batch_workers', self.workers)
+            self.queue_size = config['weaviate'].get('batch_queue_size', self.queue_size)
+            self.retries = config['weaviate'].get('batch_retries', self.retries)
+            self.retry_seconds = config['weaviate'].get('batch_retry_seconds', self.retry_seconds)
+        self.queue_size = max(self.queue_size, self.workers, 1)
+        self.sizer = get_batch_sizer(config)
+        self.dead_letters = get_dead_letter_file(config)
+        self.metrics = Metrics() if metrics is None else metrics
+
+        self._pending = collections.deque()
+        self._executor = None
+        if self.workers > 0:
+            self._executor = futures.ThreadPoolExecutor(max_workers=self.workers)
+
+    def batch_size(self, class_name: str) -> int:
+        """ The number of objects for the next batch of a class
+
+        :param class_name: the class, 'references' for reference batches
+        :type class_name: str
+        :return: the batch size
+        :rtype: int
+        """
+        return self.sizer.get(class_name)
+
+    def create_objects(self, batch, after_previous: bool = False):
+        """ Submits an objects batch
+
+        :param batch: the objects to create
+        :type batch: weaviate.ObjectsBatchRequest
+        :param after_previous: only send the batch once all previously submitted batches are
+            done, for objects that reference objects of earlier batches
+        :type after_previous: bool, optional
+        """
+        self._submit(self.client.batch.create_objects, batch, after_previous,
+                     None if self.registry is None else self.registry.acknowledge_objects, 'object')
+
+    def create_references(self, batch):
+        """ Submits a references batch, it is sent once all previously submitted batches are done
+        so the objects it links exist
+
+        :param batch: the references to create
+        :type batch: weaviate.ReferenceBatchRequest
+        """
+        self._submit(self.client.batch.create_references, batch, True,
+                     None if self.registry is None else self.registry.acknowledge_references, 'reference')
+
+    def delete_objects(self, uuids: list):
+        """ Submits the deletion of objects, one request per object as there is no batch delete
+
+        :param uuids: uuids of the objects to delete
+        :type uuids: list
+        """
+        self._submit(self._delete, uuids, False, None, 'delete')
+
+    def delete_references(self, batch):
+        """ Submits the deletion of references, one request per reference as there is no batch
+        delete, it is sent once all previously submitted batches are done
+
+        :param batch: the references to delete
+        :type batch: weaviate.ReferenceBatchRequest
+        """
+        self._submit(self._delete_references, batch, True, None, 'delete_reference')
+
+    def when_done(self, callback):
+        """ Calls callback once all batches submitted so far are acknowledged, right away if
+        none are pending
+
+        :param callback: function without arguments
+        :type callback: callable
+        """
+        if len(self._pending) == 0:
+            callback()
+        else:
+            self._pending.append((None, lambda _: callback(), None, None))
+
+    def flush(self):
+        """ Waits until all submitted batches are done and checks their results """
+        while len(self._pending) > 0:
+            self._check(*self._pending.popleft())
+
+    def close(self):
+        """ Flushes the pending batches and stops the workers """
+        try:
+            self.flush()
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+        if self.sizer.adapt:
+            print("Adapted batch sizes -------------------:", self.sizer.sizes())
+        if self.dead_letters is not None:
+            if self.dead_letters.count > 0:
+                print("Items written to dead-letter file -----:", self.dead_letters.count, self.dead_letters.path)
+            self.dead_letters.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            # after a failure nothing pending is acknowledged, the registry and checkpoints
+            # only ever record batches that are known to be done
+            self._pending.clear()
+        self.close()
+
+    def _submit(self, send, batch, after_previous: bool, acknowledge, kind: str):
+        if len(batch) == 0:
+            return
+        if kind == 'object':
+            class_name = batch.get_request_body()["objects"][0]["class"]
+        else:
+            class_name = 'references' if kind == 'reference' else None
+        measure = class_name is not None and (self.sizer.adapt or self.metrics.measure_bytes)
+        if self._executor is None:
+            waited = time.monotonic()
+            sent = self._send(send, batch, kind, [], measure)
+            self.metrics.observe_wait(time.monotonic() - waited)
+            self._check(sent, acknowledge, class_name, kind)
+            return
+
+        previous = [entry[0] for entry in self._pending if entry[0] is not None] if after_previous else []
+        future = self._executor.submit(self._send, send, batch, kind, previous, measure)
+        self._pending.append((future, acknowledge, class_name, kind))
+        while sum(entry[0] is not None for entry in self._pending) > self.queue_size:
+            self._check(*self._pending.popleft())
+
+    def _send(self, send, batch, kind: str, previous: list, measure: bool) -> _Sent:
+        """ sends a batch once the previous ones are done, and the items that failed again
+        """
+        # earlier batches were submitted first and are already running or done, so this cannot
+        # block on a batch that waits for a free worker
+        futures.wait(previous)
+        items = _items(batch, kind)
+        payload_bytes = len(json.dumps(items)) if measure else 0
+        results = [None] * len(items)
+        errors = {}
+        first_failed = None
+        timeout = False
+        last_error = None
+        pending = list(range(len(items)))
+        final = []
+        start = time.monotonic()
+
+        for attempt in range(self.retries + 1):
+            if attempt > 0:
+                delay = min(self.retry_seconds * 2 ** (attempt - 1), MAX_BATCH_RETRY_SECONDS)
+                time.sleep(delay * random.uniform(0.5, 1.0))
+                batch = _rebuild([items[index] for index in pending], kind)
+            try:
+                answer = send(batch)
+            except _TRANSIENT_ERRORS as error:
+                last_error = error
+                errors.update((index, str(error)) for index in pending)
+                if not _is_transient_request_error(error):
+                    break
+                timeout = True
+                continue
+
+            last_error = None
+            failed = []
+            answer = answer if answer is not None else []
+            for index, result in zip(pending, answer):
+                results[index] = result
+                message = _error_message(result)
+                if message is None:
+                    errors.pop(index, None)
+                elif _TRANSIENT_ITEM_ERROR.search(message):
+                    errors[index] = message
+                    failed.append(index)
+                else:
+                    errors[index] = message
+                    final.append(index)
+            # items the answer has no result for were not acknowledged, they are sent again
+            missing = pending[len(answer):]
+            if len(missing) > 0:
+                errors.update((index, _MISSING_RESULT) for index in missing)
+                failed.extend(missing)
+                last_error = RuntimeError("the answer to a batch of {} items had {} results".format(
+                    len(pending), len(answer)))
+            if first_failed is None:
+                first_failed = len(failed) + len(final)
+            pending = failed
+            if len(pending) == 0:
+                break
+
+        if last_error is not None and self.dead_letters is None:
+            raise last_error
+        return _Sent([result for result in results if result is not None], start, time.monotonic() - start,
+                     payload_bytes, [(items[index], errors[index]) for index in final + pending],
+                     len(items) if first_failed is None else first_failed, timeout)
+
+    def _delete(self, uuids: list) -> list:
+        results = []
+        for object_uuid in uuids:
+            try:
+                self.client.data_object.delete(object_uuid)
+                results.append({"id": object_uuid})
+            except UnexpectedStatusCodeException as error:
+                if error.status_code == 404:
+                    results.append({"id": object_uuid})
+                else:
+                    results.append({"id": object_uuid, "result": {"errors": {"error": [{"message": str(error)}]}}})
+        return results
+
+    def _delete_references(self, batch) -> list:
+        results = []
+        for item in batch.get_request_body():
+            from_uuid, _, property_name, to_uuid = parse_reference(item)
+            try:
+                self.client.data_object.reference.delete(from_uuid, property_name, to_uuid)
+                results.append(dict(item))
+            except UnexpectedStatusCodeException as error:
+                if error.status_code == 404:
+                    results.append(dict(item))
+                else:
+                    results.append(dict(item, result={"errors": {"error": [{"message": str(error)}]}}))
+        return results
+
+    def _check(self, sent, acknowledge, class_name: str, kind: str):
+        if sent is None:
+            # a callback queued by when_done
+            acknowledge(None)
+            return
+        try:
+            if isinstance(sent, futures.Future):
+                waited = time.monotonic()
+                sent = sent.result()
+                self.metrics.observe_wait(time.monotonic() - waited)
+        except Exception:
+            if class_name is not None:
+                self.sizer.observe(class_name, 1, 0, timeout=True)
+            raise
+        check_batch_result(sent.results)
+        if class_name is not None:
+            self.sizer.observe(class_name, len(sent.results) + len(sent.failed), sent.seconds, sent.payload_bytes,
+                               sent.first_failed, sent.timeout)
+        self.metrics.observe_batch(class_name or 'deletes', len(sent.results) + len(sent.failed), sent.started,
+                                   sent.seconds, sent.payload_bytes, sent.first_failed, len(sent.failed))
+        if self.dead_letters is not None:
+            self.dead_letters.write(kind, sent.failed)
+        if acknowledge is not None:
+            acknowledge(sent.results)
+
+
+def _items(batch, kind: str) -> list:
+    """ the items of a batch as they are sent
+    """
+    if kind == 'object':
+        return batch.get_request_body()["objects"]
+    if kind in ('reference', 'delete_reference'):
+        return batch.get_request_body()
+    return list(batch)
+
+
+def _rebuild(items: list, kind: str):
+    """ a new batch of the items that are sent again
+    """
+    if kind == 'object':
+        batch = weaviate.ObjectsBatchRequest()
+        for item in items:
+            batch.add(item["properties"], item["class"], item.get("id"), item.get("vector"))
+        return batch
+    if kind in ('reference', 'delete_reference'):
+        batch = weaviate.ReferenceBatchRequest()
+        for item in items:
+            batch.add(*parse_reference(item))
+        return batch
+    return items
+
+
+def _is_transient_request_error(error: Exception) -> bool:
+    """ True if a failed request is worth another try, network errors, 5xx answers and the
+    status codes in _TRANSIENT_STATUS_CODES are
+    """
+    if isinstance(error, UnexpectedStatusCodeException):
+        status_code = getattr(error, 'status_code', None)
+        return status_code is None or status_code >= 500 or status_code in _TRANSIENT_STATUS_CODES
+    return True
+
+
+def _error_message(result: dict) -> str:
+    """ the first error message of a batch item, None if it has no errors
+    """
+    if 'result' not in result or result['result'] is None or 'errors' not in result['result']:
+        return None
+    errors = result['result']['errors']
+    if 'error' in errors and len(errors['error']) > 0:
+        return errors['error'][0].get('message', str(errors))
+    return str(errors)
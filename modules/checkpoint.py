@@ -0,0 +1,127 @@
+""" Checkpoints to resume an interrupted import """
+
+import os
+import json
+import time
+
+
+DEFAULT_CHECKPOINT_INTERVAL = 30
+
+
+class Checkpoint:
+    """ Records how far an import got in a small JSON file
+
+    The state holds the stage of the import, the byte offset in the metadata file up to which
+    all papers, their journals, authors and references were acknowledged by Weaviate, the
+    number of papers loaded up to that offset and the number of objects sent per class. The
+    file is replaced atomically, so it is always the last complete state.
+
+    A resume must not send the journals and authors the interrupted run sent again, Weaviate
+    would replace them and drop the references the run added. Which ones Weaviate has is kept
+    in an id registry, see modules.registry, by default next to the checkpoint in
+    registry_path.
+    """
+
+    def __init__(self, path: str, metadata_file: str = None, interval: float = DEFAULT_CHECKPOINT_INTERVAL):
+        """
+        :param path: the JSON file
+        :type path: str
+        :param metadata_file: the metadata file the offsets belong to
+        :type metadata_file: str, optional
+        :param interval: minimum number of seconds between two writes during a stage
+        :type interval: float, optional
+        """
+        self.path = path
+        self.metadata_file = metadata_file
+        self.interval = interval
+        self.registry_path = os.path.splitext(path)[0] + '.ids.sqlite'
+        self.state = {"stage": None, "offset": 0, "papers": 0, "counts": {}}
+        self._base = self.state
+        self._written = time.monotonic()
+
+    def load(self) -> dict:
+        """ Reads the last checkpoint, later updates count on top of it
+
+        :return: the state, None if there is no checkpoint for the metadata file
+        :rtype: dict
+        """
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path) as file:
+            state = json.load(file)
+        if self.metadata_file is not None and state.get('metadata_file') != self.metadata_file:
+            print("Checkpoint of another metadata file ---:", state.get('metadata_file'))
+            return None
+        self.state = self._base = state
+        return state
+
+    def due(self) -> bool:
+        """ Checks if the interval since the last write has passed
+
+        :return: True if the next update should be written
+        :rtype: bool
+        """
+        return time.monotonic() - self._written >= self.interval
+
+    def update(self, stage: str, offset: int = None, papers: int = None, counts: dict = None):
+        """ Writes the state, offset, papers and counts are relative to the checkpoint that
+        was loaded and keep their values if not given
+
+        :param stage: the stage of the import
+        :type stage: str
+        :param offset: byte offset in the metadata file up to which everything was acknowledged
+        :type offset: int, optional
+        :param papers: number of papers loaded from the offset of the loaded checkpoint on
+        :type papers: int, optional
+        :param counts: number of objects sent per class in this run
+        :type counts: dict, optional
+        """
+        state = dict(self.state, stage=stage, metadata_file=self.metadata_file, time=time.time())
+        if offset is not None:
+            state["offset"] = offset
+        if papers is not None:
+            state["papers"] = self._base["papers"] + papers
+        if counts is not None:
+            state["counts"] = dict(self.state["counts"])
+            for class_name, count in counts.items():
+                state["counts"][class_name] = self._base["counts"].get(class_name, 0) + count
+
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w') as file:
+            json.dump(state, file)
+        os.replace(temporary, self.path)
+        self.state = state
+        self._written = time.monotonic()
+
+    def track(self, sender, stage: str, data, counts: dict):
+        """ Updates the checkpoint with the current position of the data once every batch
+        submitted so far is acknowledged
+
+        :param sender: the batch sender the batches were submitted to
+        :type sender: modules.batching.BatchSender
+        :param stage: the stage of the import
+        :type stage: str
+        :param data: the papers being imported, only a MetadataStream knows its position
+        :type data: MetadataStream
+        :param counts: number of objects sent per class in this run
+        :type counts: dict
+        """
+        if not hasattr(data, 'offset'):
+            return
+        position = (data.offset, data.loaded, dict(counts))
+        self._written = time.monotonic()
+        sender.when_done(lambda: self.update(stage, *position))
+
+
+def get_checkpoint(config: dict) -> Checkpoint:
+    """ Creates the checkpoint set by checkpoint in the data section of the config
+
+    :param config: the config file with parameters
+    :type config: dict
+    :return: the checkpoint, None if no checkpoint file is set
+    :rtype: Checkpoint
+    """
+    if config is None or 'data' not in config or not config['data'].get('checkpoint'):
+        return None
+    return Checkpoint(config['data']['checkpoint'], config['data'].get('metadata_file'),
+                      config['data'].get('checkpoint_interval', DEFAULT_CHECKPOINT_INTERVAL))
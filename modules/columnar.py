@@ -0,0 +1,316 @@
+""" Columnar copy of the metadata file for fast repeated imports """
+
+import os
+import sys
+import json
+import mmap
+import array
+import shutil
+import bisect
+from modules.download import open_metadata
+from modules.decoders import get_json_decoder
+from modules.decoders import DEFAULT_JSON_DECODER
+from modules.records import PaperRecord
+from modules.records import journal_uuid
+from modules.metrics import Progress
+from modules.dedup import IdSet
+from modules.lineindex import map_file
+from modules.lineindex import file_version
+
+
+COLUMNAR_VERSION = 1
+DEFAULT_CHUNK_ROWS = 4096
+
+# the string columns, the fields of a PaperRecord in the order of its __slots__
+COLUMNS = PaperRecord.__slots__
+# separates the author names of a paper, the normalized names contain no newlines
+_AUTHOR_SEPARATOR = '\n'
+
+
+class _ColumnWriter:
+    """ appends the values of one string column to its files
+
+    The UTF-8 values are concatenated in <name>.data, <name>.offsets holds the start of every
+    value and the end of the last one as native unsigned 64 bit integers, and <name>.nulls one
+    byte per row that is 1 for None.
+    """
+
+    def __init__(self, directory: str, name: str):
+        self.data = open(os.path.join(directory, name + '.data'), 'wb')
+        self.offsets = open(os.path.join(directory, name + '.offsets'), 'wb')
+        self.nulls = open(os.path.join(directory, name + '.nulls'), 'wb')
+        self._size = 0
+        self._offsets = array.array('Q', [0])
+        self._nulls = bytearray()
+
+    def append(self, value: str):
+        if value is not None:
+            encoded = value.encode('utf-8')
+            self.data.write(encoded)
+            self._size += len(encoded)
+        self._offsets.append(self._size)
+        self._nulls.append(value is None)
+
+    def flush(self):
+        self._offsets.tofile(self.offsets)
+        self.nulls.write(self._nulls)
+        self._offsets = array.array('Q')
+        self._nulls = bytearray()
+
+    def close(self):
+        self.flush()
+        for file in (self.data, self.offsets, self.nulls):
+            file.close()
+
+
+def convert_metadata(filename: str, directory: str, json_decoder: str = DEFAULT_JSON_DECODER,
+                     chunk_rows: int = DEFAULT_CHUNK_ROWS) -> int:
+    """ Converts the metadata file into a columnar copy of its papers
+
+    Every line of the file becomes a row with the fields of its PaperRecord, the uuids of the
+    paper and its journal and the byte offset of the line end, so reading the copy needs no
+    JSON decoding, name normalization, date parsing or uuid generation. Duplicate papers are
+    kept, they are skipped when reading like in the metadata file. The copy is written next to
+    the directory and moved into place when it is complete.
+
+    :param filename: the metadata file, a zip archive is decompressed on the fly
+    :type filename: str
+    :param directory: the directory of the copy, replaced if it exists
+    :type directory: str
+    :param json_decoder: name of the JSON decoder backend, see modules.decoders
+    :type json_decoder: str, optional
+    :param chunk_rows: number of rows buffered before they are written
+    :type chunk_rows: int, optional
+    :return: the number of rows
+    :rtype: int
+    """
+    loads = get_json_decoder(json_decoder)
+    partial = directory.rstrip(os.sep) + '.part'
+    if os.path.exists(partial):
+        shutil.rmtree(partial)
+    os.makedirs(partial)
+
+    writers = [_ColumnWriter(partial, name) for name in COLUMNS]
+    line_ends = open(os.path.join(partial, 'line_end.offsets'), 'wb')
+    ends = array.array('Q')
+    rows = offset = 0
+    progress = Progress("Converting papers to columns ----------:")
+
+    print("Start converting ArXiv dataset --------:", filename, "to", directory)
+    try:
+        with open_metadata(filename) as file:
+            for line in file:
+                offset += len(line)
+                record = PaperRecord(loads(line))
+                record.paper_uuid = record.uuid()
+                if record.journal is not None:
+                    record.journal_uuid = journal_uuid(record, record.journal)
+                for writer, name in zip(writers, COLUMNS):
+                    value = getattr(record, name)
+                    writer.append(_AUTHOR_SEPARATOR.join(value) if name == 'authors' and value is not None
+                                  else value)
+                ends.append(offset)
+                rows += 1
+                if rows % chunk_rows == 0:
+                    for writer in writers:
+                        writer.flush()
+                    ends.tofile(line_ends)
+                    ends = array.array('Q')
+                    progress.update(rows)
+    finally:
+        for writer in writers:
+            writer.close()
+        ends.tofile(line_ends)
+        line_ends.close()
+
+    with open(os.path.join(partial, 'meta.json'), 'w') as file:
+        json.dump({"version": COLUMNAR_VERSION, "byteorder": sys.byteorder, "rows": rows,
+                   "columns": list(COLUMNS), "source": file_version(filename)}, file, indent=2)
+    if os.path.exists(directory):
+        shutil.rmtree(directory)
+    os.rename(partial, directory)
+    print('\nDone converting ArXiv dataset ---------:', rows, "papers")
+    return rows
+
+
+class ColumnarMetadata:
+    """ A memory-mapped columnar copy of the metadata file, see convert_metadata
+
+    The papers are read in chunks of rows: the offsets and nulls of a chunk are read for every
+    column at once and the values are sliced from the mapped data files, so only the records
+    of one chunk are created at a time.
+    """
+
+    def __init__(self, directory: str):
+        """
+        :param directory: the directory of the copy
+        :type directory: str
+        """
+        self.directory = directory
+        with open(os.path.join(directory, 'meta.json')) as file:
+            self.meta = json.load(file)
+        self.rows = self.meta["rows"]
+        self._data = {}
+        self._offsets = {}
+        self._nulls = {}
+        self._maps = []
+        for name in COLUMNS:
+            self._data[name] = self._open(name + '.data')
+            self._offsets[name] = memoryview(self._open(name + '.offsets')).cast('Q')
+            self._nulls[name] = self._open(name + '.nulls')
+        self.line_ends = memoryview(self._open('line_end.offsets')).cast('Q')
+
+    def _open(self, name: str):
+        mapped = map_file(os.path.join(self.directory, name))
+        self._maps.append(mapped)
+        return mapped
+
+    def is_copy_of(self, filename: str) -> bool:
+        """ Checks if the copy was converted from the current version of the metadata file
+
+        :param filename: the metadata file
+        :type filename: str
+        :return: True if the copy can be read instead of the file
+        :rtype: bool
+        """
+        return (self.meta.get("version") == COLUMNAR_VERSION and self.meta.get("byteorder") == sys.byteorder
+                and self.meta.get("columns") == list(COLUMNS) and self.meta.get("source") == file_version(filename))
+
+    def row_at(self, offset: int) -> int:
+        """ The first row of the line starting at a byte offset of the metadata file
+
+        :param offset: the byte offset, e.g. of a checkpoint
+        :type offset: int
+        :return: the row
+        :rtype: int
+        """
+        return bisect.bisect_right(self.line_ends, offset)
+
+    def _column(self, name: str, start: int, end: int) -> list:
+        """ the values of a column in a range of rows """
+        offsets = self._offsets[name][start:end + 1].tolist()
+        nulls = self._nulls[name][start:end]
+        encoded = self._data[name][offsets[0]:offsets[-1]]
+        text = str(encoded, 'utf-8')
+        if len(text) == len(encoded):
+            # only ASCII, the byte offsets are character offsets, so the chunk is decoded at once
+            base = offsets[0]
+            values = [None if null else text[first - base:last - base]
+                      for null, first, last in zip(nulls, offsets, offsets[1:])]
+        else:
+            values = [None if null else str(encoded[first - offsets[0]:last - offsets[0]], 'utf-8')
+                      for null, first, last in zip(nulls, offsets, offsets[1:])]
+        if name == 'authors':
+            values = [None if value is None else tuple(value.split(_AUTHOR_SEPARATOR)) for value in values]
+        elif name == 'journal':
+            values = [None if value is None else sys.intern(value) for value in values]
+        return values
+
+    def iter_chunks(self, start: int = 0, chunk_rows: int = DEFAULT_CHUNK_ROWS, stop: int = None):
+        """ Yields the rows from start on, chunk by chunk
+
+        :param start: the first row
+        :type start: int, optional
+        :param chunk_rows: number of rows per chunk
+        :type chunk_rows: int, optional
+        :param stop: the row after the last one, defaults to the end of the copy
+        :type stop: int, optional
+        :return: per chunk the byte offsets of the line ends and the records
+        :rtype: generator
+        """
+        stop = self.rows if stop is None else min(stop, self.rows)
+        for first in range(start, stop, chunk_rows):
+            last = min(first + chunk_rows, stop)
+            columns = [self._column(name, first, last) for name in COLUMNS]
+            yield self.line_ends[first:last].tolist(), [PaperRecord.from_values(row) for row in zip(*columns)]
+
+    def iter_ids(self, start: int, stop: int):
+        """ Yields the arxiv ids of a range of rows, without creating their records
+
+        :param start: the first row
+        :type start: int
+        :param stop: the row after the last one
+        :type stop: int
+        :return: the ids
+        :rtype: generator
+        """
+        stop = min(stop, self.rows)
+        for first in range(start, stop, DEFAULT_CHUNK_ROWS):
+            yield from self._column('id', first, min(first + DEFAULT_CHUNK_ROWS, stop))
+
+    def iter_lines(self, max_size: int, skip_n_papers: int, start_offset: int = 0, end_offset: int = None,
+                   ids: IdSet = None):
+        """ yields the papers like modules.metadata reads the metadata file, as records together
+        with the byte offset of the line after the paper
+
+        :param max_size: maximum number of papers, no limit if not positive
+        :type max_size: int
+        :param skip_n_papers: number of lines to skip from start_offset on
+        :type skip_n_papers: int
+        :param start_offset: byte offset of the line to start reading at, defaults to 0
+        :type start_offset: int, optional
+        :param end_offset: byte offset of the line to stop reading at, defaults to the end of the file
+        :type end_offset: int, optional
+        :param ids: the ids already loaded, which are skipped as duplicates, it is extended
+        :type ids: IdSet, optional
+        """
+        ids = IdSet() if ids is None else ids
+        count = loaded = 0
+        progress = Progress("Number of papers loaded ---------------:")
+
+        print("Start loading ArXiv dataset -----------:", self.directory, "(columnar)")
+        stop = self.row_at(end_offset) if end_offset is not None else None
+        for offsets, records in self.iter_chunks(self.row_at(start_offset) + skip_n_papers, stop=stop):
+            for offset, record in zip(offsets, records):
+                if 0 < max_size <= loaded:
+                    break
+                count += 1
+                if not ids.insert(record.id):
+                    continue
+                loaded += 1
+                yield offset, record
+            else:
+                progress.update(count)
+                continue
+            break
+        print('\nDone loading ArXiv dataset ------------: load {}, skip {}'.format(
+            loaded, count + skip_n_papers - loaded))
+
+    def close(self):
+        """ Releases the mapped files """
+        for view in list(self._offsets.values()) + [self.line_ends]:
+            view.release()
+        for mapped in self._maps:
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+        self._maps = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def get_columnar_metadata(config: dict, filename: str) -> ColumnarMetadata:
+    """ Opens the columnar copy set by columnar in the data section of the config
+
+    :param config: the config file with parameters
+    :type config: dict
+    :param filename: the metadata file the copy must have been converted from
+    :type filename: str
+    :return: the copy, None if none is set, it does not exist yet or is outdated
+    :rtype: ColumnarMetadata
+    """
+    if config is None or 'data' not in config or not config['data'].get('columnar'):
+        return None
+    directory = config['data']['columnar']
+    if not os.path.exists(os.path.join(directory, 'meta.json')):
+        print("No columnar copy, reading JSON --------: run import.py --convert to create", directory)
+        return None
+    columns = ColumnarMetadata(directory)
+    if not columns.is_copy_of(filename):
+        columns.close()
+        print("Columnar copy is outdated, reading JSON: run import.py --convert to update", directory)
+        return None
+    return columns
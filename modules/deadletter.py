@@ -0,0 +1,115 @@
+""" Dead-letter file of the objects and references Weaviate did not take """
+
+import os
+import json
+
+
+class DeadLetterFile:
+    """ Appends failed batch items to an NDJSON file, one record per line
+
+    A record is the item as it was sent, with the kind of item and the last error added:
+    objects keep their class, id and properties, references and deleted references their from
+    and to beacons, and deletions the id of the object.
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: the NDJSON file, it is only created once something failed
+        :type path: str
+        """
+        self.path = path
+        self.count = 0
+        self._file = None
+
+    def write(self, kind: str, failed: list):
+        """ Appends failed items
+
+        :param kind: 'object', 'reference', 'delete' or 'delete_reference'
+        :type kind: str
+        :param failed: tuples of the item as it was sent and the error message
+        :type failed: list
+        """
+        if len(failed) == 0:
+            return
+        if self._file is None:
+            self._file = open(self.path, 'a')
+        for item, error in failed:
+            record = dict(item) if isinstance(item, dict) else {"id": item}
+            record["kind"] = kind
+            record["error"] = error
+            self._file.write(json.dumps(record) + '\n')
+        self._file.flush()
+        self.count += len(failed)
+
+    def close(self):
+        """ Closes the file """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def parse_reference(item: dict) -> tuple:
+    """ Splits the beacons of a reference item into the arguments of ReferenceBatchRequest.add
+
+    :param item: the reference with the from and to beacons
+    :type item: dict
+    :return: uuid and class of the object, the property and the uuid of the referenced object
+    :rtype: tuple
+    """
+    # weaviate://localhost/<class>/<uuid>/<property> and weaviate://localhost/<uuid>
+    _, _, _, class_name, from_uuid, property_name = item["from"].split('/')
+    return from_uuid, class_name, property_name, item["to"].split('/')[-1]
+
+
+def read_dead_letters(path: str, kinds: tuple = ('object', 'reference', 'delete', 'delete_reference')):
+    """ Yields the records of a dead-letter file
+
+    :param path: the NDJSON file
+    :type path: str
+    :param kinds: only yield records of these kinds
+    :type kinds: tuple, optional
+    :return: the records
+    :rtype: generator
+    """
+    with open(path) as file:
+        for line in file:
+            if line.strip():
+                record = json.loads(line)
+                if record["kind"] in kinds:
+                    yield record
+
+
+def start_replay(path: str) -> str:
+    """ Moves a dead-letter file aside, so the items that fail again during the replay are
+    written to a new one. The file of an interrupted replay is picked up again.
+
+    :param path: the dead-letter file
+    :type path: str
+    :return: the file to replay, None if there is nothing to replay
+    :rtype: str
+    """
+    replay = path + '.replay'
+    if os.path.exists(replay):
+        print("Continuing interrupted replay ---------:", replay)
+        if os.path.exists(path):
+            with open(path) as source, open(replay, 'a') as target:
+                target.write(source.read())
+            os.remove(path)
+        return replay
+    if not os.path.exists(path):
+        return None
+    os.replace(path, replay)
+    return replay
+
+
+def get_dead_letter_file(config: dict) -> DeadLetterFile:
+    """ Creates the dead-letter file set by dead_letter_file in the weaviate section of the config
+
+    :param config: the config file with parameters
+    :type config: dict
+    :return: the dead-letter file, None if none is set
+    :rtype: DeadLetterFile
+    """
+    if config is None or 'weaviate' not in config or not config['weaviate'].get('dead_letter_file'):
+        return None
+    return DeadLetterFile(config['weaviate']['dead_letter_file'])
@@ -0,0 +1,83 @@
+""" Pluggable JSON decoders for loading the metadata file """
+
+import json
+
+
+DEFAULT_JSON_DECODER = 'auto'
+
+# backends in order of preference for 'auto'
+JSON_DECODERS = ('orjson', 'simdjson', 'json')
+
+
+def _load_backend(name: str):
+    """ returns the loads function of a backend, None if it is not installed
+    """
+    try:
+        if name == 'orjson':
+            import orjson  # pylint: disable=import-outside-toplevel
+            return orjson.loads
+        if name == 'simdjson':
+            import simdjson  # pylint: disable=import-outside-toplevel
+            return simdjson.loads
+    except ImportError:
+        return None
+    if name == 'json':
+        return json.loads
+    raise ValueError("Unknown json decoder '{}', use one of: auto, {}".format(name, ', '.join(JSON_DECODERS)))
+
+
+def _with_fallback(loads):
+    """ wraps a fast backend so lines it rejects, e.g. with lone surrogate escapes, are decoded
+    by the stdlib json module
+    """
+    def decode(line):
+        try:
+            return loads(line)
+        except ValueError:
+            return json.loads(line)
+    return decode
+
+
+def available_json_decoders() -> list:
+    """ Lists the installed JSON decoder backends
+
+    :return: names of the installed backends, in order of preference
+    :rtype: list
+    """
+    return [name for name in JSON_DECODERS if _load_backend(name) is not None]
+
+
+def get_json_decoder(name: str = DEFAULT_JSON_DECODER):
+    """ Gets the function that decodes one line of the metadata file
+
+    'auto' picks the fastest installed backend. A named backend that is not installed falls
+    back to the stdlib json module, and so do single lines a fast backend cannot decode.
+
+    :param name: one of 'auto', 'orjson', 'simdjson' or 'json', defaults to 'auto'
+    :type name: str, optional
+    :return: a function that decodes bytes or str into python objects
+    :rtype: callable
+    """
+    if name is None or name == 'auto':
+        name = available_json_decoders()[0]
+
+    loads = _load_backend(name)
+    if loads is None:
+        print("JSON decoder not installed ------------:", name, "- using json")
+        return json.loads
+    if loads is json.loads:
+        return loads
+    return _with_fallback(loads)
+
+
+def get_json_decoder_name(config: dict) -> str:
+    """ Reads the json_decoder setting from the data section of the config
+
+    :param config: the config file with parameters
+    :type config: dict
+    :return: name of the backend
+    :rtype: str
+    """
+    if config is not None and 'data' in config and 'json_decoder' in config['data']:
+        return config['data']['json_decoder']
+    return DEFAULT_JSON_DECODER
@@ -0,0 +1,73 @@
+""" Compact set of the arxiv ids seen while loading, to skip duplicate papers """
+
+
+# the last digits of an id select a bit in the bitmap of the rest of the id
+_BLOCK_DIGITS = 3
+_BLOCK_BYTES = 10 ** _BLOCK_DIGITS // 8
+
+
+class IdSet:
+    """ The arxiv ids of the papers loaded so far, in a fraction of the memory of a set of strings
+
+    Arxiv ids end in a running number, 0704.0001 or 2101.00001 for new-style ids and
+    hep-th/9901001 for old-style ones. An id is split into its last three digits and the rest,
+    and every rest has a bitmap of 1000 bits in which the digits select the bit of the id.
+    The ids of a month share a few bitmaps, so a paper costs about one bit plus its share of
+    the bitmaps instead of a string, and a lookup is one dict lookup and a bit test. The split
+    is exact, so the set answers like a set of strings. Ids that do not end in three digits,
+    which the data set does not contain, are kept as they are in a set.
+    """
+
+    def __init__(self):
+        self._blocks = {}
+        self._other = set()
+        self._count = 0
+
+    def insert(self, arxiv_id: str) -> bool:
+        """ Adds an id
+
+        :param arxiv_id: the arxiv id of a paper
+        :type arxiv_id: str
+        :return: True if the id is new, False if it was added before
+        :rtype: bool
+        """
+        digits = arxiv_id[-_BLOCK_DIGITS:]
+        if len(digits) < _BLOCK_DIGITS or not (digits.isascii() and digits.isdigit()):
+            if arxiv_id in self._other:
+                return False
+            self._other.add(arxiv_id)
+            return True
+        prefix = arxiv_id[:-_BLOCK_DIGITS]
+        block = self._blocks.get(prefix)
+        if block is None:
+            block = self._blocks[prefix] = bytearray(_BLOCK_BYTES)
+        number = int(digits)
+        mask = 1 << (number & 7)
+        if block[number >> 3] & mask:
+            return False
+        block[number >> 3] |= mask
+        self._count += 1
+        return True
+
+    def copy(self) -> 'IdSet':
+        """ An independent copy of the set
+
+        :return: the copy
+        :rtype: IdSet
+        """
+        other = IdSet()
+        other._blocks = {prefix: bytearray(block) for prefix, block in self._blocks.items()}
+        other._other = set(self._other)
+        other._count = self._count
+        return other
+
+    def __contains__(self, arxiv_id: str) -> bool:
+        digits = arxiv_id[-_BLOCK_DIGITS:]
+        if len(digits) < _BLOCK_DIGITS or not (digits.isascii() and digits.isdigit()):
+            return arxiv_id in self._other
+        block = self._blocks.get(arxiv_id[:-_BLOCK_DIGITS])
+        number = int(digits)
+        return block is not None and bool(block[number >> 3] & 1 << (number & 7))
+
+    def __len__(self) -> int:
+        return self._count + len(self._other)
@@ -0,0 +1,165 @@
+""" Content-hash index of the imported papers for delta imports """
+
+import os
+import json
+import uuid
+import sqlite3
+import hashlib
+import collections
+from modules.registry import DEFAULT_REGISTRY_CACHE_KB
+
+
+def content_hash(data_object) -> bytes:
+    """ A 16 byte hash of a JSON serializable object that does not depend on the key order
+
+    :param data_object: the object to hash, e.g. a Paper object
+    :type data_object: dict or list
+    :return: the hash
+    :rtype: bytes
+    """
+    serialized = json.dumps(data_object, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.blake2b(serialized.encode('utf-8'), digest_size=16).digest()
+
+
+class PaperIndex:
+    """ An SQLite backed index of the content hash of every imported Paper object
+
+    The index is keyed on the deterministic paper uuid built by build_paper_object. Next to
+    the hash of the paper object it keeps the author uuids, so the author references of a
+    changed paper are only sent again if its authors changed and the references of authors it
+    lost or of a withdrawn paper can be deleted, and the generation, the number of the delta
+    import that last saw the paper. Papers of older generations were withdrawn from the
+    snapshot. All changes of one delta import are committed at once, after Weaviate
+    acknowledged the objects.
+
+    The uuid of a paper is derived from its title, doi, id and latest version, see
+    modules.records.PaperRecord.uuid, so a new version or a corrected title is a new paper
+    and the old one is withdrawn. Only changes of the other fields change a paper in place.
+
+    The journals and authors are shared by the papers and sent once, a delta import sends
+    only the ones that are not in the id registry next to the index, registry_path.
+    """
+
+    def __init__(self, path: str, weaviate_url: str = None, cache_kb: int = DEFAULT_REGISTRY_CACHE_KB):
+        """
+        :param path: the SQLite file
+        :type path: str
+        :param weaviate_url: the Weaviate instance the papers were imported into
+        :type weaviate_url: str, optional
+        :param cache_kb: size of the SQLite page cache in KiB
+        :type cache_kb: int, optional
+        """
+        self.path = path
+        self.registry_path = os.path.splitext(path)[0] + '.ids.sqlite'
+        self.counts = collections.Counter()
+        # pairs of author and paper uuid of the authors that changed papers lost
+        self.stale_references = []
+        self._connection = sqlite3.connect(path)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA cache_size=-{}".format(int(cache_kb)))
+        self._connection.execute("CREATE TABLE IF NOT EXISTS papers "
+                                 "(id BLOB PRIMARY KEY, content BLOB, authors BLOB, generation INTEGER) WITHOUT ROWID")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+        row = self._connection.execute("SELECT value FROM meta WHERE key = 'weaviate'").fetchone()
+        if weaviate_url is not None and (row is None or row[0] != weaviate_url):
+            self.clear()
+            self._connection.execute("INSERT OR REPLACE INTO meta VALUES ('weaviate', ?)", (weaviate_url,))
+        row = self._connection.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        self.generation = 1 if row is None else int(row[0]) + 1
+        self._connection.commit()
+
+    def __len__(self) -> int:
+        return self._connection.execute("SELECT COUNT(*) FROM papers").fetchone()[0]
+
+    def diff(self, papers):
+        """ Compares prepared papers with the index and yields only the new and changed ones
+
+        Unchanged papers are counted and skipped. A changed paper keeps its uuid, it is sent
+        again and replaces the object in Weaviate, with the authors it gained, whose references
+        are added. The references of the authors it lost are added to stale_references.
+
+        :param papers: the papers as returned by modules.imports.prepare_papers
+        :type papers: iterable
+        :return: the new and changed papers, in the same form
+        :rtype: generator
+        """
+        for journal, authors, paper_uuid, paper_object in papers:
+            key = uuid.UUID(paper_uuid).bytes
+            content = content_hash(paper_object)
+            author_keys = b''.join(uuid.UUID(author_uuid).bytes for _, author_uuid in authors)
+
+            row = self._connection.execute("SELECT content, authors FROM papers WHERE id = ?", (key,)).fetchone()
+            if row is not None and row[0] == content and row[1] == author_keys:
+                self.counts["unchanged"] += 1
+                self._connection.execute("UPDATE papers SET generation = ? WHERE id = ?", (self.generation, key))
+                continue
+
+            if row is None:
+                self.counts["new"] += 1
+            else:
+                self.counts["changed"] += 1
+                previous = set(_author_uuids(row[1]))
+                lost = previous - {author_uuid for _, author_uuid in authors}
+                self.stale_references.extend((author_uuid, paper_uuid) for author_uuid in sorted(lost))
+                authors = [author for author in authors if author[1] not in previous]
+            self._connection.execute("INSERT OR REPLACE INTO papers VALUES (?, ?, ?, ?)",
+                                     (key, content, author_keys, self.generation))
+            yield journal, authors, paper_uuid, paper_object
+
+    def withdrawn(self) -> list:
+        """ Lists the papers the current delta import has not seen
+
+        :return: uuids of the withdrawn papers
+        :rtype: list
+        """
+        rows = self._connection.execute("SELECT id FROM papers WHERE generation < ?", (self.generation,))
+        return [str(uuid.UUID(bytes=row[0])) for row in rows]
+
+    def withdrawn_references(self) -> list:
+        """ Lists the author references of the papers the current delta import has not seen
+
+        :return: pairs of author and paper uuid
+        :rtype: list
+        """
+        rows = self._connection.execute("SELECT id, authors FROM papers WHERE generation < ?", (self.generation,))
+        return [(author_uuid, str(uuid.UUID(bytes=row[0]))) for row in rows for author_uuid in _author_uuids(row[1])]
+
+    def commit(self, removed: list = ()):
+        """ Stores the changes of the current delta import
+
+        :param removed: uuids of the withdrawn papers that were deleted from Weaviate
+        :type removed: list, optional
+        """
+        self._connection.executemany("DELETE FROM papers WHERE id = ?",
+                                     [(uuid.UUID(paper_uuid).bytes,) for paper_uuid in removed])
+        self.counts["withdrawn"] += len(removed)
+        self._connection.execute("INSERT OR REPLACE INTO meta VALUES ('generation', ?)", (str(self.generation),))
+        self._connection.commit()
+
+    def clear(self):
+        """ Forgets all papers, e.g. after the schema was recreated """
+        self._connection.execute("DELETE FROM papers")
+        self._connection.commit()
+
+    def close(self):
+        """ Closes the SQLite file, uncommitted changes are rolled back """
+        self._connection.close()
+
+
+def _author_uuids(author_keys: bytes) -> list:
+    """ the author uuids of a paper as the index stores them, 16 bytes each """
+    return [str(uuid.UUID(bytes=author_keys[start:start + 16])) for start in range(0, len(author_keys), 16)]
+
+
+def get_paper_index(config: dict) -> PaperIndex:
+    """ Opens the index set by paper_index in the data section of the config
+
+    :param config: the config file with parameters
+    :type config: dict
+    :return: the index, None if no paper_index is set
+    :rtype: PaperIndex
+    """
+    if config is None or 'data' not in config or not config['data'].get('paper_index'):
+        return None
+    return PaperIndex(config['data']['paper_index'], config['weaviate'].get('url', config['weaviate'].get('wcs')))
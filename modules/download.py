@@ -0,0 +1,209 @@
+""" Streaming downloads of the remote data files """
+
+import os
+import json
+import time
+import random
+import hashlib
+import zipfile
+import requests
+from modules.metrics import Progress
+
+
+DEFAULT_DOWNLOAD_CHUNK_BYTES = 1024 * 1024
+DEFAULT_DOWNLOAD_TIMEOUT = 200
+DEFAULT_DOWNLOAD_RETRIES = 3
+DEFAULT_DOWNLOAD_RETRY_SECONDS = 2.0
+MAX_DOWNLOAD_RETRY_SECONDS = 60.0
+
+
+def download(url: str, path: str, timeout: float = DEFAULT_DOWNLOAD_TIMEOUT,
+             retries: int = DEFAULT_DOWNLOAD_RETRIES, chunk_bytes: int = DEFAULT_DOWNLOAD_CHUNK_BYTES,
+             retry_seconds: float = DEFAULT_DOWNLOAD_RETRY_SECONDS) -> str:
+    """ Downloads a file in chunks, so it never has to fit into memory, and keeps it as a cache
+
+    The data goes to path + '.part' first, which is renamed once the download is complete. If
+    the connection breaks, or a previous run was interrupted, the download continues where the
+    partial file ends with an HTTP Range request. Servers that ignore the range, or whose file
+    changed in between, send the whole file again. The retries wait twice as long each time,
+    starting at retry_seconds.
+
+    The ETag, Last-Modified date, size and SHA-256 checksum of a complete download are stored in
+    path + '.download.json'. The next download of the same url is a conditional request, if the
+    server answers 304 Not Modified, the cached file is used. If the server cannot be reached,
+    the cached file is used right away without retrying. A file found at path without a cache
+    entry is only used if the server still cannot be reached after the retries.
+
+    :param url: the remote file
+    :type url: str
+    :param path: where to store the file
+    :type path: str
+    :param timeout: seconds to wait for the server to connect or send data
+    :type timeout: float, optional
+    :param retries: number of times a broken download is continued
+    :type retries: int, optional
+    :param chunk_bytes: size of the chunks written to disk
+    :type chunk_bytes: int, optional
+    :param retry_seconds: seconds to wait before the first retry
+    :type retry_seconds: float, optional
+    :return: the path of the downloaded file
+    :rtype: str
+    """
+    cached = _cached_entry(url, path)
+    partial = path + '.part'
+    for attempt in range(retries + 1):
+        if attempt > 0:
+            delay = min(retry_seconds * 2 ** (attempt - 1), MAX_DOWNLOAD_RETRY_SECONDS)
+            time.sleep(delay * random.uniform(0.5, 1.0))
+        received = _file_size(partial)
+        try:
+            if not _download_part(url, partial, timeout, chunk_bytes, cached):
+                print("Using cached download -----------------:", path, "not modified")
+                return path
+            break
+        except requests.exceptions.RequestException as error:
+            # only a transfer that got some data is worth continuing if there is a valid cache
+            unreachable = isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)) \
+                and _file_size(partial) == received
+            if cached is not None and unreachable:
+                print("Using cached download -----------------:", path, "offline:", error)
+                return path
+            if attempt == retries:
+                # a file without a cache entry was put there by hand or an older version
+                if cached is None and (not os.path.exists(path) or _read_entry(path)):
+                    raise
+                print("Using cached download -----------------:", path, "offline:", error)
+                return path
+            print("\nDownload interrupted, continuing ------:", error)
+
+    entry = _read_entry(partial)
+    entry.update(url=url, size=os.path.getsize(partial), sha256=_checksum(partial))
+    os.replace(partial, path)
+    entry["mtime"] = os.stat(path).st_mtime_ns
+    _write_entry(path, entry)
+    if os.path.exists(_entry_path(partial)):
+        os.remove(_entry_path(partial))
+    return path
+
+
+def _download_part(url: str, partial: str, timeout: float, chunk_bytes: int, cached: dict) -> bool:
+    """ appends the rest of the remote file to the partial file, returns False if the cached
+    file is still up to date
+    """
+    offset = _file_size(partial)
+    headers = {}
+    if offset > 0:
+        headers['Range'] = 'bytes={}-'.format(offset)
+        # the rest is only sent if it belongs to the same version of the file
+        entry = _read_entry(partial)
+        validator = entry.get('etag') or entry.get('last_modified')
+        if validator:
+            headers['If-Range'] = validator
+    elif cached is not None:
+        if cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        if cached.get('last_modified'):
+            headers['If-Modified-Since'] = cached['last_modified']
+
+    with requests.get(url, headers=headers, stream=True, timeout=timeout) as response:
+        if response.status_code == 304:
+            return False
+        if response.status_code == 416:
+            # the partial file already is the whole file
+            return True
+        response.raise_for_status()
+        if response.status_code != 206:
+            offset = 0
+            _write_entry(partial, {"etag": response.headers.get('ETag'),
+                                   "last_modified": response.headers.get('Last-Modified')})
+        total = offset + int(response.headers.get('Content-Length', 0))
+
+        print("Downloading ArXiv dataset from --------:", url, "from byte", offset)
+        progress = Progress("Downloaded megabytes ------------------:")
+        with open(partial, 'ab' if offset > 0 else 'wb') as file:
+            for chunk in response.iter_content(chunk_bytes):
+                file.write(chunk)
+                offset += len(chunk)
+                progress.update(offset // 2 ** 20, "of", total // 2 ** 20)
+        print()
+    return True
+
+
+def _file_size(path: str) -> int:
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def _entry_path(path: str) -> str:
+    return path + '.download.json'
+
+
+def _read_entry(path: str) -> dict:
+    """ the stored cache entry of a file, empty if there is none """
+    if not os.path.exists(_entry_path(path)):
+        return {}
+    with open(_entry_path(path)) as file:
+        return json.load(file)
+
+
+def _write_entry(path: str, entry: dict):
+    temporary = _entry_path(path) + '.tmp'
+    with open(temporary, 'w') as file:
+        json.dump(entry, file)
+    os.replace(temporary, _entry_path(path))
+
+
+def _checksum(path: str) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(DEFAULT_DOWNLOAD_CHUNK_BYTES), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def _cached_entry(url: str, path: str) -> dict:
+    """ the cache entry of a complete download of the url, None if the file is missing, belongs to
+    another url or was changed since, the checksum is only computed again if its size or
+    modification time differ from the download
+    """
+    entry = _read_entry(path)
+    if not os.path.exists(path) or entry.get('url') != url:
+        return None
+    status = os.stat(path)
+    if status.st_size != entry['size']:
+        return None
+    if status.st_mtime_ns != entry['mtime']:
+        if _checksum(path) != entry['sha256']:
+            return None
+        entry['mtime'] = status.st_mtime_ns
+        _write_entry(path, entry)
+    return entry
+
+
+def open_metadata(filename: str):
+    """ Opens the metadata file for reading bytes, a zip archive is read from its first member
+    on the fly, without extracting it to disk
+
+    :param filename: a JSON lines file or a zip archive holding one
+    :type filename: str
+    :return: the binary file object, seekable in both cases
+    :rtype: io.BufferedIOBase
+    """
+    if not zipfile.is_zipfile(filename):
+        return open(filename, 'rb')
+    # the member keeps the archive file open until it is closed itself
+    with zipfile.ZipFile(filename) as archive:
+        return archive.open(archive.namelist()[0])
+
+
+def metadata_size(filename: str) -> int:
+    """ The size of the metadata in bytes, uncompressed for a zip archive
+
+    :param filename: a JSON lines file or a zip archive holding one
+    :type filename: str
+    :return: the size in bytes
+    :rtype: int
+    """
+    if not zipfile.is_zipfile(filename):
+        return os.path.getsize(filename)
+    with zipfile.ZipFile(filename) as archive:
+        return archive.infolist()[0].file_size
@@ -1,279 +1,734 @@
 """ Import routines """
 
+import collections
 import weaviate
-from dateutil import parser
-from modules.utilities import format_journal_name
-from modules.utilities import format_author_name
-from modules.utilities import generate_uuid
-from modules.utilities import check_batch_result
 from modules.utilities import extract_year
-from modules.utilities import DEFAULT_MAX_BATCH
+from modules.batching import BatchSender
+from modules.records import paper_record
+from modules.records import journal_name
+from modules.records import journal_uuid as get_journal_uuid
+from modules.records import author_names
+from modules.records import author_uuid as get_author_uuid
+from modules.metrics import Progress
+from modules.registry import references_id
+from modules.deadletter import read_dead_letters
+from modules.deadletter import parse_reference
 
 
-def import_journals(client, config, data) -> dict:
+# journals and authors an importer collects before it asks the id registry about them at once
+_REGISTRY_CHUNK = 4096
+
+
+def import_journals(client, config, data, *, sender: BatchSender = None) -> int:
     """ Adds journals of the papers to weaviate
 
+    The uuids of the journals are derived from their names, see modules.records.journal_uuid,
+    so the papers do not need a dict of all journals. With an id registry the registry tracks
+    which journals were sent, otherwise a set of the names of this import does.
+
     :param client: python client connection
     :type client: weaviate.client.Client
     :param config: the config file with parameters
     :type data: dict
-    :param data: the metadata of all papers to add
-    :type data: list
-    :return: journals with uuids
-    :rtype: dict
+    :param data: the metadata of all papers to add, raw or as records
+    :type data: list or MetadataStream
+    :param sender: the batch sender shared by all importers, defaults to a new one
+    :type sender: BatchSender, optional
+    :return: number of journals sent
+    :rtype: int
     """
     # add groups to weaviate
 
-    journals = {}
+    def found():
+        for paper in data:
+            name = journal_name(paper)
+            if name is not None:
+                yield name, get_journal_uuid(paper, name)
+
     batch = weaviate.ObjectsBatchRequest()
     batchcount = totalcount = 0
-    maxbatch = DEFAULT_MAX_BATCH
-    if config is not None and 'weaviate' in config and 'max_batch_size' in config['weaviate']:
-        maxbatch = config['weaviate']['max_batch_size']
+    if sender is None:
+        sender = BatchSender(client, config)
 
-    for paper in data:
-        if 'journal-ref' in paper and paper['journal-ref'] is not None:
-            journal_name = format_journal_name(paper['journal-ref'])
-            journal_uuid = generate_uuid('Journal', journal_name)
-
-            if journal_name not in journals:
-                batch.add({"name": journal_name}, "Journal", journal_uuid)
-                batchcount += 1
-                totalcount += 1
-                journals[journal_name] = journal_uuid
-
-            if batchcount >= maxbatch:
-                result = client.batch.create_objects(batch)
-                check_batch_result(result)
-                batch = weaviate.ObjectsBatchRequest()
-                print("Importing journals to Weaviate --------:", totalcount, end="\r")
-                batchcount = 0
+    progress = Progress("Importing journals to Weaviate --------:")
+    for name, journal_uuid in _new_objects(sender, found(), "Journal", set()):
+        batch.add({"name": name}, "Journal", journal_uuid)
+        batchcount += 1
+        totalcount += 1
+
+        if batchcount >= sender.batch_size("Journal"):
+            sender.create_objects(batch)
+            batch = weaviate.ObjectsBatchRequest()
+            progress.update(totalcount)
+            batchcount = 0
 
     if batchcount > 0:
-        result = client.batch.create_objects(batch)
-        check_batch_result(result)
+        sender.create_objects(batch)
+    sender.flush()
     print("Done importing journals to Weaviate ---:", totalcount)
 
-    return journals
+    return totalcount
 
 
-def import_authors(client, config, data) -> dict:
-    """[summary]
+def import_authors(client, config, data, *, sender: BatchSender = None) -> int:
+    """ Adds the authors of the papers to weaviate
+
+    The uuids of the authors are derived from their names, see modules.records.author_uuid,
+    so the papers do not need a dict of all authors. With an id registry the registry tracks
+    which authors were sent, otherwise a set of the names of this import does.
 
     :param client: python client connection
     :type client: weaviate.client.Client
-    :param data: the metadata of all papers to add
-    :type data: list
+    :param data: the metadata of all papers to add, raw or as records
+    :type data: list or MetadataStream
     :param batch_size: number of items in a batch, defaults to 512
     :type batch_size: int, optional
     :param n_papers: number of papers to import in total, defaults to 1000000000
     :type n_papers: float, optional
-    :return: authods with uuids
-    :rtype: dict
+    :param sender: the batch sender shared by all importers, defaults to a new one
+    :type sender: BatchSender, optional
+    :return: number of authors sent
+    :rtype: int
     """
 
-    authors_uuid = {}
+    def found():
+        for paper in data:
+            authors = author_names(paper)
+            if authors is not None:
+                for author in authors:
+                    yield author, get_author_uuid(author)
+
     batch = weaviate.ObjectsBatchRequest()
     batchcount = totalcount = 0
-    maxbatch = DEFAULT_MAX_BATCH
-    if config is not None and 'weaviate' in config and 'max_batch_size' in config['weaviate']:
-        maxbatch = config['weaviate']['max_batch_size']
+    if sender is None:
+        sender = BatchSender(client, config)
 
-    for paper in data:
-        if paper["authors"] is not None:
-            authors = format_author_name(paper["authors"])
-
-            for author in authors:
-                if author not in authors_uuid:
-                    author_uuid = generate_uuid('Author', author)
-                    batch.add({"name": author}, "Author", author_uuid)
-                    batchcount += 1
-                    totalcount += 1
-                    authors_uuid[author] = author_uuid
-
-                if batchcount >= maxbatch:
-                    result = client.batch.create_objects(batch)
-                    check_batch_result(result)
-                    batch = weaviate.ObjectsBatchRequest()
-                    print("Importing authors to Weaviate ---------:", totalcount, end="\r")
-                    batchcount = 0
+    progress = Progress("Importing authors to Weaviate ---------:")
+    for author, author_uuid in _new_objects(sender, found(), "Author", set()):
+        batch.add({"name": author}, "Author", author_uuid)
+        batchcount += 1
+        totalcount += 1
+
+        if batchcount >= sender.batch_size("Author"):
+            sender.create_objects(batch)
+            batch = weaviate.ObjectsBatchRequest()
+            progress.update(totalcount)
+            batchcount = 0
 
     if batchcount > 0:
-        result = client.batch.create_objects(batch)
-        check_batch_result(result)
+        sender.create_objects(batch)
+    sender.flush()
     print("Done importing authors to Weaviate ----:", totalcount)
-    return authors_uuid
+    return totalcount
+
+
+def import_shard_references(client, config, data, sender: BatchSender = None) -> int:
+    """ Adds the author to paper references of the authors a shard owns, for the papers of all
+    shards
+
+    The references are added to the authors, so a reference fails if its author does not
+    exist yet. In a sharded import the shard that sent an author adds its references after it,
+    the papers they point to may be created later by other shards. The references of a paper
+    are split between the shards that own its authors, with an id registry every shard records
+    its part of them.
+
+    :param client: python client connection
+    :type client: weaviate.client.Client
+    :param config: the config file with parameters
+    :type config: dict
+    :param data: the metadata of the papers of all shards, raw or as records
+    :type data: list or MetadataStream
+    :param sender: the batch sender of the shard that sent its authors, defaults to a new one
+    :type sender: BatchSender, optional
+    :return: number of references added
+    :rtype: int
+    """
+    papers = {}
+    pending = totalcount = 0
+    if sender is None:
+        sender = BatchSender(client, config)
+
+    progress = Progress("Cross referenced paper to author ------:")
+    for paper in data:
+        paper = paper_record(paper)
+        if paper.authors is None:
+            continue
+        author_uuids = [author_uuid for author_uuid in map(get_author_uuid, paper.authors)
+                        if sender.shard is None or sender.shard.owns(author_uuid)]
+        if len(author_uuids) == 0:
+            continue
+        paper_uuid = paper.uuid()
+        if sender.registry is not None and sender.registry.is_acknowledged(references_id(paper_uuid), "References"):
+            continue
+        papers[paper_uuid] = author_uuids
+        pending += len(author_uuids)
+
+        if pending >= sender.batch_size("references"):
+            totalcount += _add_references(sender, papers)
+            papers = {}
+            pending = 0
+            progress.update(totalcount)
+
+    totalcount += _add_references(sender, papers)
+    sender.flush()
+    print("Cross referenced paper to author ------:", totalcount)
+    return totalcount
+
+
+def build_paper_object(paper, categories: dict, journal_uuid: str, authors_uuid_list: list) -> tuple:
+    """ Builds the Weaviate Paper object and its uuid from the metadata of one paper
+
+    :param paper: the metadata of the paper, raw or as a record
+    :type paper: dict or modules.records.PaperRecord
+    :param categories: categories with uuids
+    :type categories: dict
+    :param journal_uuid: uuid of the journal of the paper, None if there is no journal
+    :type journal_uuid: str
+    :param authors_uuid_list: uuids of the authors of the paper
+    :type authors_uuid_list: list
+    :return: the uuid of the paper and the paper object
+    :rtype: tuple
+    """
 
+    paper = paper_record(paper)
+    paper_object = {}
+
+    if paper.title is not None:
+        paper_object["title"] = paper.title
+    if paper.doi is not None:
+        paper_object["doi"] = paper.doi
+    if paper.journal_ref is not None:
+        paper_object["journalReference"] = paper.journal_ref
+    if paper.id is not None:
+        paper_object["arxivId"] = paper.id
+    if paper.submitter is not None:
+        paper_object["submitter"] = paper.submitter
+    if paper.abstract is not None:
+        paper_object["abstract"] = paper.abstract
+    if paper.comments is not None:
+        paper_object["comments"] = paper.comments
+    if paper.report_no is not None:
+        paper_object["reportNumber"] = paper.report_no
+    if paper.latest_version is not None:
+        paper_object["latestVersion"] = paper.latest_version
+        if paper.latest_version_created is not None:
+            paper_object["latestVersionCreated"] = paper.latest_version_created
+        paper_object["versionHistory"] = paper.version_history
+
+    paper_uuid = paper.uuid()
+
+    # try to extract year
+    if paper.id is not None:
+        year = extract_year(paper.id)
+        paper_object["year"] = year
+
+    if len(paper.categories.split(' ')) >= 1:
+        categories_object = []
+        for category in paper.categories.split(' '):  # id of category
+            # create beacon
+            if category not in categories:
+                break
+            beacon_url = "weaviate://localhost/" + categories[category]
+            beacon = {"beacon": beacon_url}
+            categories_object.append(beacon)
+
+        if len(categories_object) > 0:
+            paper_object["hasCategories"] = categories_object
+
+    if journal_uuid is not None:
+        beacon_url = "weaviate://localhost/" + journal_uuid
+        beacon = {"beacon": beacon_url}
+        paper_object['inJournal'] = [beacon]
+
+    authors_object = []
+    for author_uuid in authors_uuid_list:
+        beacon_url = "weaviate://localhost/" + author_uuid
+        beacon = {"beacon": beacon_url}
+        authors_object.append(beacon)
 
-def import_papers(client, config, data, categories, journals, authors_uuid) -> dict:
+    if len(authors_object) > 0:
+        paper_object['hasAuthors'] = authors_object
+
+    return paper_uuid, paper_object
+
+
+def import_papers(client, config, data, categories, *, stream_references: bool = False,
+                  sender: BatchSender = None, checkpoint=None) -> dict:
     """[summary]
 
+    The papers link the journals and authors by their uuids, which are derived from the names
+    like import_journals and import_authors do.
+
     :param client: python client connection
     :type client: weaviate.client.Client
-    :param data: the metadata of all papers to add
-    :type data: list
+    :param data: the metadata of all papers to add, raw or as records
+    :type data: list or MetadataStream
     :param categories: categories with uuids
     :type categories: dict
-    :param journals: journals with uuids
-    :type journals: dict
-    :param authors: authors with uuids
-    :type authors: dict
+    :param stream_references: add the author references of every paper batch right after the
+        batch instead of returning them, keeps memory flat for large data sets
+    :type stream_references: bool, optional
     :param batch_size: number of items in a batch, defaults to 512
     :type batch_size: int, optional
     :param n_papers: number of papers to import in total, defaults to 1000000000
     :type n_papers: float, optional
-    :return: uuids of all papers with uuids the authors
+    :param sender: the batch sender shared by all importers, defaults to a new one
+    :type sender: BatchSender, optional
+    :param checkpoint: records the position in the data after acknowledged batches, only
+        together with stream_references, when the references are sent along with the papers
+    :type checkpoint: modules.checkpoint.Checkpoint, optional
+    :return: uuids of all papers with uuids the authors, empty if stream_references is set
     :rtype: dict
     """
 
     paper_authors_uuids_dict = {}
     batch = weaviate.ObjectsBatchRequest()
-    batchcount = totalcount = 0
-    maxbatch = DEFAULT_MAX_BATCH
-    if config is not None and 'weaviate' in config and 'max_batch_size' in config['weaviate']:
-        maxbatch = config['weaviate']['max_batch_size']
+    batchcount = totalcount = referencecount = 0
+    if sender is None:
+        sender = BatchSender(client, config)
 
+    progress = Progress("Importing papers to Weaviate ----------:")
     for paper in data:
-        paper_object = {}
-
-        uuid_base = ""
-        if paper["title"] is not None:
-            paper_object["title"] = paper["title"].replace('\n', ' ')
-            uuid_base += paper_object["title"]
-        if paper["doi"] is not None:
-            paper_object["doi"] = paper["doi"]
-            uuid_base += paper["doi"]
-        if paper["journal-ref"] is not None:
-            paper_object["journalReference"] = paper["journal-ref"]
-        if paper["id"] is not None:
-            paper_object["arxivId"] = paper["id"]
-            uuid_base += paper["id"]
-        if paper["submitter"] is not None:
-            paper_object["submitter"] = paper["submitter"]
-        if paper["abstract"] is not None:
-            paper_object["abstract"] = paper["abstract"].replace('\n', ' ')
-        if paper["comments"] is not None:
-            paper_object["comments"] = paper["comments"]
-        if paper["report-no"] is not None:
-            paper_object["reportNumber"] = paper["report-no"]
-        if paper["versions"] is not None:
-
-            # older arxiv datadump files use versions in a string in one list item
-            if isinstance(paper["versions"][0], str):
-                paper_object["versionHistory"] = str(paper["versions"]).strip('[]')
-                paper_object["latestVersion"] = paper["versions"][-1]
-                uuid_base += paper_object["latestVersion"]
-
-            # lastest arxiv datadump file uses different version datatypes
-            elif isinstance(paper["versions"][0], dict):
-                latest_version_number = 0
-                version_history = []
-                for version in paper["versions"]:
-                    version_number = int(version["version"].split('v')[1])
-                    if version_number >= latest_version_number:
-                        paper_object["latestVersion"] = version["version"]
-                        try:
-                            paper_object["latestVersionCreated"] = parser.parse(version["created"]).isoformat()
-                        except Exception:
-                            pass
-                    version_history.append(version["version"])
-                paper_object["versionHistory"] = ','.join(map(str, version_history))
-                uuid_base += paper_object["latestVersion"]
-
-        paper_uuid = generate_uuid('Paper', uuid_base)
-
-        # try to extract year
-        if paper["id"] is not None:
-            year = extract_year(paper["id"])
-            paper_object["year"] = year
-
-        if len(paper["categories"].split(' ')) >= 1:
-            categories_object = []
-            for category in paper["categories"].split(' '):  # id of category
-                # create beacon
-                if category not in categories:
-                    break
-                beacon_url = "weaviate://localhost/" + categories[category]
-                beacon = {"beacon": beacon_url}
-                categories_object.append(beacon)
-
-            if len(categories_object) > 0:
-                paper_object["hasCategories"] = categories_object
-
-        if paper["journal-ref"] is not None:
-            journal_name = format_journal_name(paper["journal-ref"])
-            # create beacon
-            if journal_name in journals:
-                beacon_url = "weaviate://localhost/" + journals[journal_name]
-                beacon = {"beacon": beacon_url}
-                paper_object['inJournal'] = [beacon]
-
-        if paper["authors"] is not None:
-            authors = format_author_name(paper["authors"])
-            authors_object = []
-            authors_uuid_list = []
+        paper = paper_record(paper)
+        journal_uuid = None
+        if paper.journal is not None:
+            journal_uuid = get_journal_uuid(paper, paper.journal)
 
-            for author in authors:
-                if author not in authors_uuid:
-                    break
+        authors_uuid_list = []
+        if paper.authors is not None:
+            authors_uuid_list = [get_author_uuid(author) for author in paper.authors]
 
-                beacon_url = "weaviate://localhost/" + authors_uuid[author]
-                beacon = {"beacon": beacon_url}
-                authors_object.append(beacon)
-                authors_uuid_list.append(authors_uuid[author])
-
-            if len(authors_object) > 0:
-                paper_object['hasAuthors'] = authors_object
-                paper_authors_uuids_dict[paper_uuid] = authors_uuid_list
+        paper_uuid, paper_object = build_paper_object(paper, categories, journal_uuid, authors_uuid_list)
+        if len(authors_uuid_list) > 0 and not _is_acknowledged(sender, references_id(paper_uuid), "References"):
+            paper_authors_uuids_dict[paper_uuid] = authors_uuid_list
 
+        if _is_acknowledged(sender, paper_uuid, "Paper"):
+            continue
         batch.add(paper_object, "Paper", paper_uuid)
         batchcount += 1
         totalcount += 1
 
-        if batchcount >= maxbatch:
-            result = client.batch.create_objects(batch)
-            check_batch_result(result)
+        if batchcount >= sender.batch_size("Paper"):
+            sender.create_objects(batch)
+            if stream_references:
+                referencecount += _add_references(sender, paper_authors_uuids_dict)
+                paper_authors_uuids_dict = {}
+                if checkpoint is not None and checkpoint.due():
+                    checkpoint.track(sender, "papers", data, {"Paper": totalcount, "references": referencecount})
             batch = weaviate.ObjectsBatchRequest()
-            print("Importing papers to Weaviate ----------:", totalcount, end="\r")
+            progress.update(totalcount)
             batchcount = 0
 
     if batchcount > 0:
-        result = client.batch.create_objects(batch)
-        check_batch_result(result)
+        sender.create_objects(batch)
+        if stream_references:
+            referencecount += _add_references(sender, paper_authors_uuids_dict)
+            paper_authors_uuids_dict = {}
+    sender.flush()
+    if checkpoint is not None and stream_references:
+        checkpoint.track(sender, "papers", data, {"Paper": totalcount, "references": referencecount})
     print("Done importating papers to Weaviate ---:", totalcount)
 
     return paper_authors_uuids_dict
 
 
-def cross_reference(client, config, papers: dict):
+def prepare_papers(data, categories):
+    """ Normalizes the papers into ready to send objects
+
+    Journal and author names are normalized and their deterministic uuids generated, so the
+    result can be imported without looking at the raw metadata again.
+
+    :param data: the metadata of the papers, raw or as records
+    :type data: list or MetadataStream
+    :param categories: categories with uuids
+    :type categories: dict
+    :return: per paper a tuple of the journal as (name, uuid) or None, the authors as a list of
+        (name, uuid), the uuid of the paper and the paper object
+    :rtype: generator
+    """
+
+    for paper in data:
+        paper = paper_record(paper)
+        journal = None
+        if paper.journal is not None:
+            journal = (paper.journal, get_journal_uuid(paper, paper.journal))
+
+        authors = []
+        if paper.authors is not None:
+            authors = [(author, get_author_uuid(author)) for author in paper.authors]
+
+        paper_uuid, paper_object = build_paper_object(
+            paper, categories, journal[1] if journal is not None else None,
+            [author_uuid for _, author_uuid in authors])
+        yield journal, authors, paper_uuid, paper_object
+
+
+def import_single_pass(client, config, data, categories, sender: BatchSender = None) -> dict:
+    """ Adds journals, authors, papers and the author references in one pass over the data
+
+    :param client: python client connection
+    :type client: weaviate.client.Client
+    :param config: the config file with parameters
+    :type config: dict
+    :param data: the metadata of all papers to add
+    :type data: list or MetadataStream
+    :param categories: categories with uuids
+    :type categories: dict
+    :param sender: the batch sender shared by all importers, defaults to a new one
+    :type sender: BatchSender, optional
+    :return: number of imported objects per class and of references
+    :rtype: dict
+    """
+    return import_prepared_papers(client, config, prepare_papers(data, categories), sender)
+
+
+def import_prepared_papers(client, config, papers, sender: BatchSender = None, checkpoint=None) -> dict:
+    """ Adds the journals, authors, papers and author references of prepared papers
+
+    The uuids of all objects are deterministic, so the journal, authors, the paper itself and
+    the references of every prepared paper are emitted into their own batches right away.
+    Whenever a paper batch is full, the pending journal and author batches are submitted before
+    it and the paper batch waits for them, and only the references of papers that were already
+    submitted are added afterwards.
+
+    :param client: python client connection
+    :type client: weaviate.client.Client
+    :param config: the config file with parameters
+    :type config: dict
+    :param papers: the papers as returned by prepare_papers
+    :type papers: iterable
+    :param sender: the batch sender shared by all importers, defaults to a new one
+    :type sender: BatchSender, optional
+    :param checkpoint: records the position in the papers after acknowledged batches, if they
+        are a MetadataStream
+    :type checkpoint: modules.checkpoint.Checkpoint, optional
+    :return: number of imported objects per class and of references
+    :rtype: dict
+    """
+
+    sent = {"Journal": set(), "Author": set()}
+    found = {"Journal": [], "Author": []}
+    references = collections.deque()
+    counts = {"Journal": 0, "Author": 0, "Paper": 0, "references": 0}
+    batches = {"Journal": weaviate.ObjectsBatchRequest(),
+               "Author": weaviate.ObjectsBatchRequest(),
+               "Paper": weaviate.ObjectsBatchRequest()}
+    if sender is None:
+        sender = BatchSender(client, config)
+
+    def send_objects(*class_names):
+        for class_name in class_names:
+            if len(batches[class_name]) > 0:
+                sender.create_objects(batches[class_name], after_previous=class_name == "Paper")
+                batches[class_name] = weaviate.ObjectsBatchRequest()
+
+    def send_references(min_size):
+        # the references of one paper always go into the same batch
+        while len(references) >= max(min_size, 1):
+            batch = weaviate.ReferenceBatchRequest()
+            while len(references) > 0 and len(batch) < sender.batch_size("references"):
+                paper_uuid, author_uuids = references.popleft()
+                for author_uuid in author_uuids:
+                    batch.add(author_uuid, "Author", "wrotePapers", paper_uuid)
+            sender.create_references(batch)
+
+    def add_found():
+        # the journals and authors of the papers in the batch that are new, at once
+        for class_name in ("Journal", "Author"):
+            for name, object_uuid in _new_objects(sender, found[class_name], class_name, sent[class_name]):
+                add_object({"name": name}, class_name, object_uuid)
+            found[class_name] = []
+
+    def add_object(data_object, class_name, object_uuid):
+        if class_name == "Paper" and _is_acknowledged(sender, object_uuid, class_name):
+            return
+        batches[class_name].add(data_object, class_name, object_uuid)
+        counts[class_name] += 1
+        if class_name != "Paper" and len(batches[class_name]) >= sender.batch_size(class_name):
+            send_objects(class_name)
+
+    progress = Progress("Importing papers to Weaviate ----------:")
+    for journal, authors, paper_uuid, paper_object in papers:
+        if journal is not None:
+            found["Journal"].append(journal)
+        found["Author"].extend(authors)
+
+        if len(authors) > 0 and not _is_acknowledged(sender, references_id(paper_uuid), "References"):
+            references.append((paper_uuid, [author_uuid for _, author_uuid in authors]))
+            counts["references"] += len(authors)
+
+        add_object(paper_object, "Paper", paper_uuid)
+
+        # the references of this batch point to sent journals, authors and papers only
+        if len(batches["Paper"]) >= sender.batch_size("Paper"):
+            add_found()
+            send_objects("Journal", "Author", "Paper")
+            if checkpoint is not None and checkpoint.due():
+                # everything up to the current paper has to be submitted for the checkpoint
+                send_references(0)
+                checkpoint.track(sender, "single_pass", papers, counts)
+            send_references(sender.batch_size("references"))
+            progress.update(counts["Paper"])
+
+    add_found()
+    send_objects("Journal", "Author", "Paper")
+    send_references(0)
+    sender.flush()
+    if checkpoint is not None:
+        checkpoint.track(sender, "single_pass", papers, counts)
+
+    print("Done importing journals to Weaviate ---:", counts["Journal"])
+    print("Done importing authors to Weaviate ----:", counts["Author"])
+    print("Done importating papers to Weaviate ---:", counts["Paper"])
+    print("Cross referenced paper to author ------:", counts["references"])
+    return counts
+
+
+def import_delta(client, config, papers, index, sender: BatchSender = None) -> dict:
+    """ Imports the difference between a new snapshot and the papers of the previous imports
+
+    Only new papers and papers whose object changed are sent, see PaperIndex.diff. Weaviate
+    replaces objects that are created again with the same uuid, so the journals and authors
+    are only sent if the id registry of the sender does not know them, an author sent again
+    would lose the references of the unchanged papers. The references of the authors a changed
+    paper lost are deleted. If the whole snapshot was read, the papers that are no longer in it
+    are deleted together with the references of their authors. The index is committed at the
+    end.
+
+    :param client: python client connection
+    :type client: weaviate.client.Client
+    :param config: the config file with parameters
+    :type config: dict
+    :param papers: the papers of the new snapshot as returned by prepare_papers
+    :type papers: iterable
+    :param index: the content hashes of the imported papers
+    :type index: modules.delta.PaperIndex
+    :param sender: the batch sender shared by all importers, defaults to a new one
+    :type sender: BatchSender, optional
+    :return: number of new, changed, unchanged and withdrawn papers
+    :rtype: dict
+    """
+
+    if sender is None:
+        sender = BatchSender(client, config)
+
+    import_prepared_papers(client, config, index.diff(papers), sender)
+    _delete_references(sender, index.stale_references)
+
+    removed = []
+    if _read_completely(papers):
+        removed = index.withdrawn()
+        _delete_references(sender, index.withdrawn_references())
+        size = sender.batch_size("Paper")
+        for start in range(0, len(removed), size):
+            sender.delete_objects(removed[start:start + size])
+    sender.flush()
+    index.commit(removed)
+
+    print("Skipped unchanged papers --------------:", index.counts["unchanged"])
+    print("Updated changed papers ----------------:", index.counts["changed"])
+    print("Removed withdrawn papers --------------:", index.counts["withdrawn"])
+    return dict(index.counts)
+
+
+def replay_dead_letters(client, config, path: str, sender: BatchSender = None) -> dict:
+    """ Sends the objects, references and deletions of a dead-letter file again
+
+    The objects go first, journals and authors before the papers that link them, then the
+    references and the deletions of objects and references once all objects are done. Items
+    that fail again end up in the dead-letter file of the sender.
+
+    :param client: python client connection
+    :type client: weaviate.client.Client
+    :param config: the config file with parameters
+    :type config: dict
+    :param path: the dead-letter file to replay
+    :type path: str
+    :param sender: the batch sender shared by all importers, defaults to a new one
+    :type sender: BatchSender, optional
+    :return: number of replayed items per kind
+    :rtype: dict
+    """
+
+    counts = collections.Counter()
+    batches = collections.OrderedDict((class_name, weaviate.ObjectsBatchRequest())
+                                      for class_name in ("Journal", "Author"))
+    if sender is None:
+        sender = BatchSender(client, config)
+
+    def send_objects(class_name):
+        if len(batches[class_name]) > 0:
+            sender.create_objects(batches[class_name], after_previous=class_name not in ("Journal", "Author"))
+            batches[class_name] = weaviate.ObjectsBatchRequest()
+
+    for record in read_dead_letters(path, ('object',)):
+        class_name = record["class"]
+        batch = batches.setdefault(class_name, weaviate.ObjectsBatchRequest())
+        batch.add(record["properties"], class_name, record.get("id"), record.get("vector"))
+        counts["object"] += 1
+        if len(batch) >= sender.batch_size(class_name):
+            send_objects(class_name)
+    for class_name in batches:
+        send_objects(class_name)
+
+    references = weaviate.ReferenceBatchRequest()
+    stale = weaviate.ReferenceBatchRequest()
+    deletions = []
+    for record in read_dead_letters(path, ('reference', 'delete', 'delete_reference')):
+        counts[record["kind"]] += 1
+        if record["kind"] == 'delete':
+            deletions.append(record["id"])
+            if len(deletions) >= sender.batch_size("Paper"):
+                sender.delete_objects(deletions)
+                deletions = []
+        elif record["kind"] == 'delete_reference':
+            stale.add(*parse_reference(record))
+            if len(stale) >= sender.batch_size("references"):
+                sender.delete_references(stale)
+                stale = weaviate.ReferenceBatchRequest()
+        else:
+            references.add(*parse_reference(record))
+            if len(references) >= sender.batch_size("references"):
+                sender.create_references(references)
+                references = weaviate.ReferenceBatchRequest()
+    sender.create_references(references)
+    sender.delete_references(stale)
+    sender.delete_objects(deletions)
+    sender.flush()
+
+    print("Replayed dead-letter items ------------:", dict(counts))
+    return dict(counts)
+
+
+def _delete_references(sender: BatchSender, references: list):
+    """ Deletes author to paper references in batches of the size the sender chooses for references
+
+    :param sender: the batch sender to submit the deletions to
+    :type sender: BatchSender
+    :param references: pairs of author and paper uuid
+    :type references: list
+    """
+    batch = weaviate.ReferenceBatchRequest()
+    for author_uuid, paper_uuid in references:
+        batch.add(author_uuid, "Author", "wrotePapers", paper_uuid)
+        if len(batch) >= sender.batch_size("references"):
+            sender.delete_references(batch)
+            batch = weaviate.ReferenceBatchRequest()
+    sender.delete_references(batch)
+
+
+def _read_completely(papers) -> bool:
+    """ Checks if the papers were the whole snapshot, a partly read MetadataStream is not
+    """
+    if not hasattr(papers, 'max_size'):
+        return True
+    return papers.skip_n_papers <= 0 and papers.start_offset == 0 and not 0 < papers.max_size <= papers.loaded
+
+
+def _is_acknowledged(sender: BatchSender, object_uuid: str, class_name: str) -> bool:
+    """ Checks the id registry of the sender, if any, for an object Weaviate already has, and
+    the shard of the sender, if any, for a shared object another shard sends
+    """
+    if sender.shard is not None and sender.shard.skips(object_uuid, class_name):
+        return True
+    return sender.registry is not None and sender.registry.is_acknowledged(object_uuid, class_name)
+
+
+def _new_objects(sender: BatchSender, found, class_name: str, sent: set):
+    """ Yields the journals or authors that still have to be sent and records them as sent:
+    they are not left to another shard, and neither acknowledged in the id registry of the
+    sender nor sent before in this run. Without a registry, their name is not in sent, the
+    names the importer sent so far. The registry looks the uuids up in chunks.
+
+    :param sender: the batch sender with the registry and shard, if any
+    :type sender: BatchSender
+    :param found: pairs of name and uuid in the order of the papers
+    :type found: iterable
+    :param class_name: 'Journal' or 'Author'
+    :type class_name: str
+    :param sent: the names sent so far without a registry, new names are added
+    :type sent: set
+    :return: pairs of name and uuid
+    :rtype: generator
+    """
+    # names by uuid of the objects the registry is asked about next
+    chunk = {}
+    for name, object_uuid in found:
+        if sender.shard is not None and sender.shard.skips(object_uuid, class_name):
+            continue
+        if sender.registry is None:
+            if name not in sent:
+                sent.add(name)
+                yield name, object_uuid
+            continue
+        chunk[object_uuid] = name
+        if len(chunk) >= _REGISTRY_CHUNK:
+            for claimed in sender.registry.claim_all(list(chunk), class_name):
+                yield chunk[claimed], claimed
+            chunk = {}
+    if len(chunk) > 0:
+        for claimed in sender.registry.claim_all(list(chunk), class_name):
+            yield chunk[claimed], claimed
+
+
+def _add_references(sender: BatchSender, papers: dict) -> int:
+    """ Adds the author to paper references of the given papers in batches of the size the
+    sender chooses for references
+
+    :param sender: the batch sender to submit the references to
+    :type sender: BatchSender
+    :param papers: uuids of authors per paper to add
+    :type papers: dict
+    :return: number of references added
+    :rtype: int
+    """
+
+    batch = weaviate.ReferenceBatchRequest()
+    totalcount = 0
+    for paper, authors in papers.items():
+        for author in authors:
+            batch.add(author, "Author", "wrotePapers", paper)
+            totalcount += 1
+
+        if len(batch) >= sender.batch_size("references"):
+            sender.create_references(batch)
+            batch = weaviate.ReferenceBatchRequest()
+
+    if len(batch) > 0:
+        sender.create_references(batch)
+    return totalcount
+
+
+def cross_reference(client, config, papers: dict, *, sender: BatchSender = None):
     """[summary]
 
     :param client: python client connection
     :type client: weaviate.client.Client
     :param papers: uuids of authors per paper to add
     :type papers: dict
+    :param sender: the batch sender shared by all importers, defaults to a new one
+    :type sender: BatchSender, optional
     """
 
     batch = weaviate.ReferenceBatchRequest()
     batchcount = totalcount = 0
-    maxbatch = DEFAULT_MAX_BATCH
-    if config is not None and 'weaviate' in config and 'max_batch_size' in config['weaviate']:
-        maxbatch = config['weaviate']['max_batch_size']
+    if sender is None:
+        sender = BatchSender(client, config)
 
+    progress = Progress("Cross referenced paper to author ------:")
     for paper, authors in papers.items():
         for author in authors:
             batch.add(author, "Author", "wrotePapers", paper)
             batchcount += 1
             totalcount += 1
 
-        if batchcount >= maxbatch:
-            result = client.batch.create_references(batch)
-            check_batch_result(result)
+        if batchcount >= sender.batch_size("references"):
+            sender.create_references(batch)
             batch = weaviate.ReferenceBatchRequest()
-            print("Cross referenced paper to author ------:", totalcount, end="\r")
+            progress.update(totalcount)
             batchcount = 0
 
     if batchcount > 0:
-        result = client.batch.create_references(batch)
-        check_batch_result(result)
+        sender.create_references(batch)
+    sender.flush()
     print("Cross referenced paper to author ------:", totalcount)
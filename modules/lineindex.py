@@ -0,0 +1,287 @@
+""" Memory-mapped index of the line offsets of the metadata file """
+
+import os
+import sys
+import json
+import mmap
+import array
+import bisect
+import shutil
+from modules.download import open_metadata
+from modules.decoders import get_json_decoder
+from modules.decoders import get_json_decoder_name
+from modules.decoders import DEFAULT_JSON_DECODER
+
+
+LINE_INDEX_VERSION = 1
+
+
+def map_file(path: str):
+    """ Maps a file into memory read-only
+
+    :param path: the file
+    :type path: str
+    :return: the mapped content, empty bytes for an empty file, which cannot be mapped
+    :rtype: mmap.mmap or bytes
+    """
+    if os.path.getsize(path) == 0:
+        return b''
+    with open(path, 'rb') as file:
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def file_version(filename: str) -> dict:
+    """ What identifies a version of a file, a derived file is outdated if it differs
+
+    :param filename: the file
+    :type filename: str
+    :return: the absolute path, size and modification time
+    :rtype: dict
+    """
+    stat = os.stat(filename)
+    return {"file": os.path.abspath(filename), "size": stat.st_size, "mtime": stat.st_mtime}
+
+
+class _FixedWidth:
+    """ a sequence of the fixed width byte strings in a mapped file, for bisect """
+
+    def __init__(self, data, width: int):
+        self.data = data
+        self.width = width
+
+    def __len__(self) -> int:
+        return len(self.data) // self.width if self.width > 0 else 0
+
+    def __getitem__(self, position: int) -> bytes:
+        return self.data[position * self.width:(position + 1) * self.width]
+
+
+def build_line_index(filename: str, directory: str, ids: bool = False,
+                     json_decoder: str = DEFAULT_JSON_DECODER) -> int:
+    """ Writes the line index of the metadata file
+
+    line_end.offsets holds the byte offset of the end of every line as native unsigned 64 bit
+    integers. With ids, ids.data holds the arxiv ids of all lines sorted, NUL padded to the
+    length of the longest one, and ids.rows the line of every sorted id. Sorting keeps equal
+    ids in file order, so a lookup finds the first occurrence like the readers do. The index is
+    written next to the directory and moved into place when it is complete, if several processes
+    build it at once one of the indexes is kept.
+
+    :param filename: the metadata file, a zip archive is decompressed on the fly
+    :type filename: str
+    :param directory: the directory of the index, replaced if it exists
+    :type directory: str
+    :param ids: index the arxiv ids too, this decodes every line
+    :type ids: bool, optional
+    :param json_decoder: name of the JSON decoder backend, see modules.decoders
+    :type json_decoder: str, optional
+    :return: the number of lines
+    :rtype: int
+    """
+    loads = get_json_decoder(json_decoder)
+    # the shards of a sharded import may build the same index at the same time
+    partial = '{}.part-{}'.format(directory.rstrip(os.sep), os.getpid())
+    if os.path.exists(partial):
+        shutil.rmtree(partial)
+    os.makedirs(partial)
+
+    print("Start indexing ArXiv dataset ----------:", filename)
+    line_ends = array.array('Q')
+    paper_ids = []
+    offset = 0
+    with open_metadata(filename) as file:
+        for line in file:
+            offset += len(line)
+            line_ends.append(offset)
+            if ids:
+                paper_ids.append(loads(line)["id"].encode('utf-8'))
+    with open(os.path.join(partial, 'line_end.offsets'), 'wb') as file:
+        line_ends.tofile(file)
+
+    width = 0
+    if ids:
+        width = max(map(len, paper_ids), default=0)
+        order = sorted(range(len(paper_ids)), key=paper_ids.__getitem__)
+        with open(os.path.join(partial, 'ids.data'), 'wb') as file:
+            file.writelines(paper_ids[row].ljust(width, b'\0') for row in order)
+        with open(os.path.join(partial, 'ids.rows'), 'wb') as file:
+            array.array('Q', order).tofile(file)
+
+    with open(os.path.join(partial, 'meta.json'), 'w') as file:
+        json.dump({"version": LINE_INDEX_VERSION, "byteorder": sys.byteorder, "rows": len(line_ends),
+                   "ids": ids, "id_width": width, "source": file_version(filename)}, file, indent=2)
+    if os.path.exists(directory):
+        shutil.rmtree(directory, ignore_errors=True)
+    try:
+        os.rename(partial, directory)
+    except OSError:
+        # another process moved its index into place first
+        shutil.rmtree(partial)
+    print("Done indexing ArXiv dataset -----------:", len(line_ends), "lines")
+    return len(line_ends)
+
+
+def shard_range(line_ends, shard_id: int, num_shards: int) -> tuple:
+    """ The byte range of one of num_shards parts of a file with the same number of lines
+
+    :param line_ends: the byte offsets of the line ends, see build_line_index
+    :type line_ends: sequence
+    :param shard_id: the part, from 0 to num_shards - 1
+    :type shard_id: int
+    :param num_shards: the number of parts
+    :type num_shards: int
+    :return: the byte offsets of the start of the first and the end of the last line
+    :rtype: tuple
+    """
+    rows = len(line_ends)
+
+    def offset_of(row: int) -> int:
+        return line_ends[row - 1] if row > 0 else 0
+
+    return offset_of(rows * shard_id // num_shards), offset_of(rows * (shard_id + 1) // num_shards)
+
+
+class LineIndex:
+    """ The memory-mapped line index of a metadata file, see build_line_index
+
+    Rows are the lines of the file counted from 0. With the index the readers seek to a row
+    instead of reading all lines before it, a paper can be read by its arxiv id and the file
+    can be split into shards with the same number of lines.
+    """
+
+    def __init__(self, directory: str):
+        """
+        :param directory: the directory of the index
+        :type directory: str
+        """
+        self.directory = directory
+        with open(os.path.join(directory, 'meta.json')) as file:
+            self.meta = json.load(file)
+        self.rows = self.meta["rows"]
+        self._maps = [map_file(os.path.join(directory, 'line_end.offsets'))]
+        self.line_ends = memoryview(self._maps[0]).cast('Q')
+        self._ids = self._id_rows = None
+        if self.meta["ids"]:
+            self._maps.append(map_file(os.path.join(directory, 'ids.data')))
+            self._maps.append(map_file(os.path.join(directory, 'ids.rows')))
+            self._ids = _FixedWidth(self._maps[1], self.meta["id_width"])
+            self._id_rows = memoryview(self._maps[2]).cast('Q')
+
+    @property
+    def has_ids(self) -> bool:
+        """ True if papers can be found by their arxiv id """
+        return self._ids is not None
+
+    def is_index_of(self, filename: str) -> bool:
+        """ Checks if the index belongs to the current version of the metadata file
+
+        :param filename: the metadata file
+        :type filename: str
+        :return: True if the index can be used for the file
+        :rtype: bool
+        """
+        return (self.meta.get("version") == LINE_INDEX_VERSION and self.meta.get("byteorder") == sys.byteorder
+                and self.meta.get("source") == file_version(filename))
+
+    def offset_of(self, row: int) -> int:
+        """ The byte offset of the start of a line
+
+        :param row: the line, rows behind the last line give the end of the file
+        :type row: int
+        :return: the byte offset
+        :rtype: int
+        """
+        if row <= 0 or self.rows == 0:
+            return 0
+        return self.line_ends[min(row, self.rows) - 1]
+
+    def row_at(self, offset: int) -> int:
+        """ The line starting at, or containing, a byte offset
+
+        :param offset: the byte offset, e.g. of a checkpoint
+        :type offset: int
+        :return: the row
+        :rtype: int
+        """
+        return bisect.bisect_right(self.line_ends, offset)
+
+    def line_end_after(self, offset: int) -> int:
+        """ The end of the line that starts at, or contains, a byte offset, to split the file on
+        line boundaries like a readline after a seek to the offset
+
+        :param offset: the byte offset
+        :type offset: int
+        :return: the byte offset of the end of the line, the end of the file if it lies behind
+        :rtype: int
+        """
+        row = self.row_at(offset)
+        return self.line_ends[row] if row < self.rows else self.offset_of(self.rows)
+
+    def find(self, arxiv_id: str) -> int:
+        """ The first line of a paper
+
+        :param arxiv_id: the arxiv id of the paper
+        :type arxiv_id: str
+        :return: the row, None if the file has no paper with the id
+        :rtype: int
+        """
+        if self._ids is None:
+            raise ValueError("the line index of {} has no ids".format(self.meta["source"]["file"]))
+        key = arxiv_id.encode('utf-8').ljust(self._ids.width, b'\0')
+        position = bisect.bisect_left(self._ids, key)
+        if position < len(self._ids) and self._ids[position] == key:
+            return self._id_rows[position]
+        return None
+
+    def shard(self, shard_id: int, num_shards: int) -> tuple:
+        """ The byte range of one of num_shards parts of the file with the same number of lines
+
+        :param shard_id: the part, from 0 to num_shards - 1
+        :type shard_id: int
+        :param num_shards: the number of parts
+        :type num_shards: int
+        :return: the byte offsets of the start of the first and the end of the last line
+        :rtype: tuple
+        """
+        return shard_range(self.line_ends, shard_id, num_shards)
+
+    def close(self):
+        """ Releases the mapped files """
+        for view in (self.line_ends, self._id_rows):
+            if view is not None:
+                view.release()
+        for mapped in self._maps:
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+        self._maps = []
+
+
+def get_line_index(config: dict, filename: str, ids: bool = None, required: bool = False) -> LineIndex:
+    """ Opens the line index next to the metadata file if line_index is set in the data section
+    of the config, and builds it first if it does not exist or the file changed since
+
+    :param config: the config file with parameters
+    :type config: dict
+    :param filename: the metadata file
+    :type filename: str
+    :param ids: index the arxiv ids too, defaults to the line_index_ids setting
+    :type ids: bool, optional
+    :param required: open the index even if line_index is not set, e.g. to split the file into shards
+    :type required: bool, optional
+    :return: the index, None if line_index is not set
+    :rtype: LineIndex
+    """
+    if not required and (config is None or 'data' not in config or not config['data'].get('line_index', False)):
+        return None
+    if ids is None:
+        ids = config['data'].get('line_index_ids', False)
+    directory = filename + '.lines'
+
+    if os.path.exists(os.path.join(directory, 'meta.json')):
+        index = LineIndex(directory)
+        if index.is_index_of(filename) and (index.has_ids or not ids):
+            return index
+        index.close()
+        print("Line index is outdated, rebuilding ----:", directory)
+    build_line_index(filename, directory, ids, get_json_decoder_name(config))
+    return LineIndex(directory)
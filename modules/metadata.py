@@ -2,69 +2,356 @@
 
 from os import path
 import zipfile
-import json
-import requests
+from modules.download import download
+from modules.download import open_metadata
+from modules.download import metadata_size
+from modules.download import DEFAULT_DOWNLOAD_TIMEOUT
+from modules.decoders import get_json_decoder
+from modules.decoders import get_json_decoder_name
+from modules.decoders import DEFAULT_JSON_DECODER
+from modules.imports import prepare_papers
+from modules.records import paper_record
+from modules.records import PaperRecord
+from modules.lineindex import get_line_index
+from modules.lineindex import shard_range
+from modules.lineindex import LineIndex
+from modules.columnar import get_columnar_metadata
+from modules.columnar import ColumnarMetadata
+from modules.parallel import iter_metadata_parallel
+from modules.metrics import Progress
+from modules.dedup import IdSet
+from modules.sharding import get_shard
 
 
-def _read_metadata_file(filename: str, max_size: int, skip_n_papers: int) -> list:
-    """ converts and returns the arxiv data set from json to a list
+# every line of the arxiv metadata file starts with the id of the paper
+_ID_PREFIX = b'{"id":"'
+
+
+def _line_id(line: bytes, loads) -> str:
+    """ the arxiv id of a line of the metadata file, read from the start of the line if it has
+    the usual form, otherwise from the decoded paper
     """
-    data = []
-    ids = set()
-    count = 0
+    if line.startswith(_ID_PREFIX):
+        end = line.find(b'"', len(_ID_PREFIX))
+        if end > 0 and b'\\' not in line[len(_ID_PREFIX):end]:
+            return line[len(_ID_PREFIX):end].decode('utf-8')
+    return loads(line)["id"]
+
+
+def _seen_ids(filename: str, start_offset: int, skip_n_papers: int, json_decoder: str = DEFAULT_JSON_DECODER,
+              columns=None, index=None) -> IdSet:
+    """ the ids of the lines before start_offset, except the first skip_n_papers, which a run
+    that read from the beginning of the file had loaded before it got there
+    """
+    ids = IdSet()
+    print("Reading the ids before the offset -----:", start_offset, end='\r')
+    if columns is not None:
+        for arxiv_id in columns.iter_ids(skip_n_papers, columns.row_at(start_offset)):
+            ids.insert(arxiv_id)
+        return ids
+
+    loads = get_json_decoder(json_decoder)
+    offset = count = 0
+    if index is not None and skip_n_papers > 0:
+        offset = index.offset_of(min(skip_n_papers, index.rows))
+        skip_n_papers = 0
+    with open_metadata(filename) as file:
+        file.seek(offset)
+        for line in file:
+            if offset >= start_offset:
+                break
+            offset += len(line)
+            count += 1
+            if count > skip_n_papers:
+                ids.insert(_line_id(line, loads))
+    return ids
+
+
+def _iter_metadata_lines(filename: str, max_size: int, skip_n_papers: int,
+                         json_decoder: str = DEFAULT_JSON_DECODER, start_offset: int = 0, index=None,
+                         end_offset: int = None, ids: IdSet = None):
+    """ lazily yields the papers of the arxiv data set, one json line at a time, together with
+    the byte offset of the line after the paper
+
+    Only one line is held in memory at a time, skipped lines are not decoded and the file
+    is closed as soon as max_size papers have been yielded. Reading starts at start_offset
+    and stops at end_offset, which must be the beginning of a line. A zip archive is
+    decompressed on the fly. With a line index the skipped lines are not read at all. The ids
+    of the loaded papers, to skip duplicates, are kept packed, see modules.dedup, ids can hold
+    those loaded before start_offset.
+    """
+    ids = IdSet() if ids is None else ids
+    count = loaded = 0
+    if index is not None and skip_n_papers > 0:
+        row = index.row_at(start_offset)
+        count = min(skip_n_papers, index.rows - row)
+        start_offset = index.offset_of(row + skip_n_papers)
+        skip_n_papers = 0
+    offset = start_offset
+    loads = get_json_decoder(json_decoder)
+    progress = Progress("Number of papers loaded ---------------:")
 
     print("Start loading ArXiv dataset -----------:", filename)
-    file = open(filename)
-    lines = file.readlines()
-    for line in lines:
-        if max_size > 0:
-            if len(data) >= max_size:
+    with open_metadata(filename) as file:
+        file.seek(start_offset)
+        for line in file:
+            if 0 < max_size <= loaded or end_offset is not None and offset >= end_offset:
                 break
-        count += 1
-        if count <= skip_n_papers:
-            continue
-        line_loaded = json.loads(line)
-        if line_loaded["id"] in ids:
-            continue
-        data.append(line_loaded)
-        ids.add(line_loaded["id"])
-        print("Number of papers loaded ---------------:", count, end='\r')
-    print('\nDone loading ArXiv dataset ------------: load {}, skip {}'.format(len(data),count-len(data)))
+            offset += len(line)
+            count += 1
+            if count <= skip_n_papers:
+                continue
+            line_loaded = loads(line)
+            if not ids.insert(line_loaded["id"]):
+                continue
+            loaded += 1
+            progress.update(count)
+            yield offset, line_loaded
+    print('\nDone loading ArXiv dataset ------------: load {}, skip {}'.format(loaded, count-loaded))
+
+
+def _iter_metadata_file(filename: str, max_size: int, skip_n_papers: int,
+                        json_decoder: str = DEFAULT_JSON_DECODER):
+    """ lazily yields the papers of the arxiv data set, one json line at a time
+    """
+    for _, paper in _iter_metadata_lines(filename, max_size, skip_n_papers, json_decoder):
+        yield paper
+
+
+def _read_metadata_file(filename: str, max_size: int, skip_n_papers: int,
+                        json_decoder: str = DEFAULT_JSON_DECODER) -> list:
+    """ converts and returns the arxiv data set from json to a list
+    """
+    return list(_iter_metadata_file(filename, max_size, skip_n_papers, json_decoder))
+
+
+class MetadataStream:
+    """ A re-iterable, lazily loaded view on the arxiv data set
+
+    Every iteration opens the metadata file again and yields the papers one by one, so the
+    import stages can each walk over the data set while memory stays flat. With more than one
+    process the file is decoded by a process pool, and if categories are given the papers are
+    yielded as ready to send objects, see modules.imports.prepare_papers.
+
+    While iterating, offset is the byte offset of the line after the last yielded paper and
+    loaded the number of papers yielded so far, which is what a checkpoint records.
+
+    If a columnar copy of the file is given, the papers are read from it as records instead,
+    in one process, see modules.columnar. The offsets are those of the metadata file. A line
+    index of the file, see modules.lineindex, lets the readers seek past the skipped papers.
+    Reading stops at end_offset, if given, e.g. at the end of the lines of a shard. The mapped
+    files of the copy and the index are released when an iteration ends, and mapped again if
+    the stream is read once more.
+
+    A paper is skipped if a paper with the same id came before it. If dedup_skip_n_papers is
+    set, that includes the lines before start_offset, except the first dedup_skip_n_papers of
+    the file, e.g. after a resume from a checkpoint. Their ids are read once, before the
+    first iteration.
+    """
+
+    def __init__(self, filename: str, max_size: int, skip_n_papers: int, processes: int = 1,
+                 categories: dict = None, json_decoder: str = DEFAULT_JSON_DECODER, start_offset: int = 0,
+                 columns=None, index=None, end_offset: int = None, dedup_skip_n_papers: int = None):
+        self.filename = filename
+        self.max_size = max_size
+        self.skip_n_papers = skip_n_papers
+        self.processes = processes
+        self.categories = categories
+        self.json_decoder = json_decoder
+        self.start_offset = start_offset
+        self.columns = columns
+        self.index = index
+        self.end_offset = end_offset
+        self.dedup_skip_n_papers = dedup_skip_n_papers
+        self.offset = start_offset
+        self.loaded = 0
+        self._seen = None
+        self._released = False
+
+    def __iter__(self):
+        papers = self._papers()
+        if self.categories is not None and not self._parallel():
+            return prepare_papers(papers, self.categories)
+        return papers
+
+    def _parallel(self) -> bool:
+        # the byte ranges of a zip archive member cannot be read independently
+        return self.processes > 1 and self.columns is None and not zipfile.is_zipfile(self.filename)
+
+    def _seen_ids(self) -> IdSet:
+        """ the ids that count as loaded before start_offset, a new set for every iteration """
+        if self.dedup_skip_n_papers is None or self.start_offset == 0:
+            return None
+        if self._seen is None:
+            self._seen = _seen_ids(self.filename, self.start_offset, self.dedup_skip_n_papers, self.json_decoder,
+                                   self.columns, self.index)
+        return self._seen.copy()
+
+    def _papers(self):
+        self.offset = self.start_offset
+        self.loaded = 0
+        if self._released:
+            self._map()
+        try:
+            ids = self._seen_ids()
+            if self.columns is not None:
+                lines = self.columns.iter_lines(self.max_size, self.skip_n_papers, self.start_offset,
+                                                self.end_offset, ids)
+            elif self._parallel():
+                lines = iter_metadata_parallel(self.filename, self.max_size, self.skip_n_papers, self.processes,
+                                               self.categories, self.json_decoder, start_offset=self.start_offset,
+                                               offsets=True, index=self.index, end_offset=self.end_offset, ids=ids)
+            else:
+                lines = _iter_metadata_lines(self.filename, self.max_size, self.skip_n_papers,
+                                             self.json_decoder, self.start_offset, self.index, self.end_offset, ids)
+            for offset, paper in lines:
+                self.offset = offset
+                self.loaded += 1
+                yield paper
+        finally:
+            self.close()
+
+    def _map(self):
+        """ maps the files of the columnar copy and the line index again, after close """
+        if self.columns is not None:
+            self.columns = ColumnarMetadata(self.columns.directory)
+        if self.index is not None:
+            self.index = LineIndex(self.index.directory)
+        self._released = False
+
+    def close(self):
+        """ Releases the mapped files of the columnar copy and the line index, if any """
+        for mapped in (self.columns, self.index):
+            if mapped is not None:
+                mapped.close()
+        self._released = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def get_metadata_file(config: dict) -> str:
+    """ The local path of the metadata file, an http URL is downloaded to metadata_dir first
 
-    return data[:max_size]
+    :param config: the config file with parameters
+    :type config: dict
+    :return: the path
+    :rtype: str
+    """
+    location = config['data']['metadata_file']
+    if path.exists(location) or 'http' not in location:
+        return location
+    # a zip archive is kept as it is and read from directly
+    return download(location, config['data']['metadata_dir'] + location.split('/')[-1],
+                    config['data'].get('timeout', DEFAULT_DOWNLOAD_TIMEOUT))
 
 
-def get_metadata(config: dict) -> list:
+def get_metadata(config: dict, stream: bool = None, categories: dict = None, checkpoint: dict = None,
+                 whole_file: bool = False):
     """ converts and returns the arxiv data set from json to a list
+
+    The list holds the papers as compact PaperRecord objects, a raw paper dict is only kept
+    in memory while it is converted. A stream yields the raw papers, or the records of the
+    columnar copy set by columnar in the data section, if it is up to date.
+
+    If num_shards is set in the data section, only the lines of the shard set by shard_id are
+    read, see modules.sharding. The shards split the whole file, skip_n_papers and n_papers
+    are ignored, and a paper is a duplicate if any line before it in the file has its id.
+    Without a columnar copy the line index of the file is used to find the lines, it is built
+    if needed.
+
+    :param config: the config file with parameters
+    :type config: dict
+    :param stream: return a lazily loaded MetadataStream instead of a list, defaults to the
+        'stream' setting in the data section of the config
+    :type stream: bool, optional
+    :param categories: categories with uuids, return the papers as ready to send objects if
+        given, see modules.imports.prepare_papers
+    :type categories: dict, optional
+    :param checkpoint: the state of a checkpoint to resume from, the papers are read from its
+        offset on, see modules.checkpoint, and the ids of the papers before it still count
+        for the duplicates
+    :type checkpoint: dict, optional
+    :param whole_file: read all lines even if a shard is set, e.g. for the objects all shards share
+    :type whole_file: bool, optional
+    :return: the metadata of all papers, records in a list
+    :rtype: list or MetadataStream
     """
 
     if config is None or 'data' not in config or 'metadata_file' not in config['data']:
         return None
 
+    if stream is None:
+        stream = config['data'].get('stream', False)
     max_size = -1
     if 'n_papers' in config['data']:
         max_size = config['data']['n_papers']
     skip = 0
     if 'skip_n_papers' in config['data']:
         skip = config['data']['skip_n_papers']
+    processes = config['data'].get('parse_processes', 1)
+    shard = get_shard(config)
+    if shard is not None:
+        skip, max_size = 0, -1
 
-    location = config['data']['metadata_file']
-    if path.exists(location):
-        filename = location
-    else:
-        if 'http' in location:
-            print("Downloading ArXiv dataset from --------:", location)
-            response = requests.get(location)
-            download = config['data']['metadata_dir'] + location.split('/')[-1]
-            open(download, 'wb').write(response.content)
-            if download.endswith('.zip'):
-                with zipfile.ZipFile(download, 'r') as zip_ref:
-                    if len(zip_ref.namelist()) > 0:
-                        filename = config['data']['metadata_dir'] + zip_ref.namelist()[0]
-                    zip_ref.extractall(config['data']['metadata_dir'])
-            else:
-                filename = download
+    filename = get_metadata_file(config)
 
-    result = _read_metadata_file(filename, max_size, skip)
+    start_offset = 0
+    dedup_skip = None
+    if checkpoint is not None:
+        # the offset already lies behind the skipped and the loaded papers, a paper after it
+        # is still a duplicate if the interrupted run loaded its id before
+        start_offset = checkpoint['offset']
+        dedup_skip, skip = skip, 0
+        if max_size > 0:
+            max_size -= checkpoint['papers']
+            if max_size <= 0:
+                start_offset = metadata_size(filename)
+                dedup_skip = None
+
+    sharded = shard is not None and not whole_file
+    columns = get_columnar_metadata(config, filename)
+    index = get_line_index(config, filename, required=sharded) if columns is None else None
+    end_offset = None
+    if sharded:
+        shard_start, end_offset = shard_range((columns or index).line_ends, shard.shard_id, shard.num_shards)
+        start_offset = max(start_offset, shard_start)
+        # the ids of the lines of the shards before count for the duplicates
+        dedup_skip = 0
+        print("Importing shard -----------------------:", shard.shard_id, "of", shard.num_shards,
+              "bytes", shard_start, "to", end_offset)
+    result = MetadataStream(filename, max_size, skip, processes, categories, get_json_decoder_name(config),
+                            start_offset, columns, index, end_offset, dedup_skip)
+    if not stream:
+        result = list(result) if categories is not None else [paper_record(paper) for paper in result]
 
     return result
+
+
+def get_paper(config: dict, arxiv_id: str) -> PaperRecord:
+    """ Reads one paper by its arxiv id with the line index of the metadata file, which is built
+    with the ids if it does not have them yet
+
+    :param config: the config file with parameters, line_index must be set in the data section
+    :type config: dict
+    :param arxiv_id: the arxiv id of the paper
+    :type arxiv_id: str
+    :return: the first paper with the id, None if the file has none
+    :rtype: PaperRecord
+    """
+    filename = get_metadata_file(config)
+    index = get_line_index(config, filename, ids=True)
+    if index is None:
+        raise ValueError("reading a paper by its id needs line_index in the data section of the config")
+    try:
+        row = index.find(arxiv_id)
+        if row is None:
+            return None
+        with open_metadata(filename) as file:
+            file.seek(index.offset_of(row))
+            return PaperRecord(get_json_decoder(get_json_decoder_name(config))(file.readline()))
+    finally:
+        index.close()
@@ -0,0 +1,321 @@
+""" Per-stage metrics of an import and rate-limited progress output """
+
+import json
+import time
+import threading
+import contextlib
+
+
+DEFAULT_PROGRESS_SECONDS = 1.0
+# upper bounds of the batch latency histogram in seconds, like the Prometheus client defaults
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# the import stage of the batches of a class
+_STAGES = {"Group": "taxonomy", "Archive": "taxonomy", "Category": "taxonomy", "Journal": "journals",
+           "Author": "authors", "Paper": "papers", "references": "references"}
+
+
+class Progress:
+    """ Prints a progress line at most once per interval, overwriting the previous one """
+
+    def __init__(self, label: str, interval: float = DEFAULT_PROGRESS_SECONDS):
+        """
+        :param label: the label of the line, padded like the other output
+        :type label: str
+        :param interval: minimum number of seconds between two lines
+        :type interval: float, optional
+        """
+        self.label = label
+        self.interval = interval
+        self._printed = None
+
+    def update(self, *values):
+        """ Prints the values if the interval has passed since the last line
+
+        :param values: what to print after the label
+        :type values: object
+        """
+        now = time.monotonic()
+        if self._printed is None or now - self._printed >= self.interval:
+            self._printed = now
+            print(self.label, *values, end='\r')
+
+
+class _Stage:
+    """ what was recorded for one stage """
+
+    def __init__(self):
+        self.started = None
+        self.finished = None
+        self.objects = 0
+        self.bytes = 0
+        self.errors = 0
+        self.failed = 0
+        self.cpu = 0.0
+        self.blocked = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+
+    def span(self, started: float, finished: float):
+        self.started = started if self.started is None else min(self.started, started)
+        self.finished = finished if self.finished is None else max(self.finished, finished)
+
+    @property
+    def seconds(self) -> float:
+        return 0.0 if self.started is None else self.finished - self.started
+
+    @property
+    def batches(self) -> int:
+        return sum(self.buckets)
+
+
+class Metrics:
+    """ Records wall time, objects, batch latencies, bytes sent and errors per import stage
+
+    The stages are taxonomy, load, journals, authors, papers and references, deletes in a
+    delta import. The batch sender reports every batch to the stage of its class, the wall
+    time of a stage reaches from the start of its first to the end of its last batch, or of
+    the code run under stage(). Errors are the items that failed at least once, failed the
+    items that were still not acknowledged after the retries. For the code run under stage()
+    the CPU time of the calling thread and the time it was blocked on batch requests are
+    recorded as well.
+    """
+
+    def __init__(self, json_path: str = None, prometheus_path: str = None, profiler=None):
+        """
+        :param json_path: file to write the JSON summary to
+        :type json_path: str, optional
+        :param prometheus_path: file to write the metrics to in the Prometheus text format
+        :type prometheus_path: str, optional
+        :param profiler: profiles the code run under stage()
+        :type profiler: modules.profiling.Profiler, optional
+        """
+        self.json_path = json_path
+        self.prometheus_path = prometheus_path
+        self.profiler = profiler
+        self.stages = {}
+        self._current = None
+        self._lock = threading.Lock()
+
+    @property
+    def measure_bytes(self) -> bool:
+        """ True if the bytes sent are exported, measuring them costs a JSON encoding per batch """
+        return bool(self.json_path or self.prometheus_path)
+
+    def _stage(self, name: str) -> _Stage:
+        if name not in self.stages:
+            self.stages[name] = _Stage()
+        return self.stages[name]
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        """ Adds the wall time of the code run in the context to a stage
+
+        :param name: the stage
+        :type name: str
+        """
+        previous, self._current = self._current, name
+        profile = self.profiler.stage(name) if self.profiler is not None else contextlib.nullcontext()
+        started, cpu_started = time.monotonic(), time.thread_time()
+        try:
+            with profile:
+                yield
+        finally:
+            self._current = previous
+            with self._lock:
+                stage = self._stage(name)
+                stage.span(started, time.monotonic())
+                stage.cpu += time.thread_time() - cpu_started
+
+    def count(self, name: str, objects: int):
+        """ Adds objects to a stage that were not sent in batches, e.g. the papers loaded
+
+        :param name: the stage
+        :type name: str
+        :param objects: number of objects
+        :type objects: int
+        """
+        with self._lock:
+            self._stage(name).objects += objects
+
+    def observe_wait(self, seconds: float):
+        """ Adds time the importing thread waited for batch requests to the current stage
+
+        :param seconds: the time it was blocked
+        :type seconds: float
+        """
+        if self._current is not None:
+            with self._lock:
+                self._stage(self._current).blocked += seconds
+
+    def observe_batch(self, class_name: str, objects: int, started: float, seconds: float,
+                      payload_bytes: int = 0, errors: int = 0, failed: int = 0):
+        """ Records a batch that is done
+
+        :param class_name: the class of the objects, 'references' for references
+        :type class_name: str
+        :param objects: number of items in the batch
+        :type objects: int
+        :param started: time.monotonic() when the batch was sent
+        :type started: float
+        :param seconds: round trip time including the retries
+        :type seconds: float
+        :param payload_bytes: size of the JSON payload
+        :type payload_bytes: int, optional
+        :param errors: number of items that failed at the first try
+        :type errors: int, optional
+        :param failed: number of items that still failed after the retries
+        :type failed: int, optional
+        """
+        bucket = 0
+        while bucket < len(LATENCY_BUCKETS) and seconds > LATENCY_BUCKETS[bucket]:
+            bucket += 1
+        with self._lock:
+            stage = self._stage(_STAGES.get(class_name, class_name))
+            stage.span(started, started + seconds)
+            stage.objects += objects - failed
+            stage.bytes += payload_bytes
+            stage.errors += errors
+            stage.failed += failed
+            stage.buckets[bucket] += 1
+            stage.latency_sum += seconds
+
+    def summary(self) -> dict:
+        """ The metrics of every stage
+
+        :return: per stage wall seconds, CPU seconds, seconds blocked on batch requests,
+            objects, objects per second, batches, bytes sent, errors, failed items and the
+            batch latency histogram by upper bound
+        :rtype: dict
+        """
+        with self._lock:
+            summary = {}
+            for name, stage in self.stages.items():
+                cumulative, histogram = 0, {}
+                for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), stage.buckets):
+                    cumulative += count
+                    histogram[str(bound)] = cumulative
+                summary[name] = {
+                    "seconds": round(stage.seconds, 6), "cpu_seconds": round(stage.cpu, 6),
+                    "blocked_seconds": round(stage.blocked, 6), "objects": stage.objects,
+                    "objects_per_second": round(stage.objects / stage.seconds, 1) if stage.seconds > 0 else None,
+                    "batches": stage.batches, "bytes": stage.bytes, "errors": stage.errors, "failed": stage.failed,
+                    "latency_seconds": {"sum": round(stage.latency_sum, 6), "buckets": histogram}}
+            return summary
+
+    def prometheus(self) -> str:
+        """ The metrics in the Prometheus text exposition format
+
+        :return: the metrics, one sample per line
+        :rtype: str
+        """
+        return format_prometheus(self.summary())
+
+    def report(self):
+        """ Prints the metrics of every stage and writes the files that are set """
+        summary = self.summary()
+        print_summary(summary)
+        if self.json_path:
+            with open(self.json_path, 'w') as file:
+                json.dump(summary, file, indent=2)
+        if self.prometheus_path:
+            with open(self.prometheus_path, 'w') as file:
+                file.write(format_prometheus(summary))
+
+
+def print_summary(summary: dict):
+    """ Prints the objects, wall time, throughput and errors of every stage
+
+    :param summary: the metrics, see Metrics.summary
+    :type summary: dict
+    """
+    for name, values in summary.items():
+        print("{:<38}: {:>9} objects {:>9.2f} s {:>10} objects/s {:>6} errors {:>6} failed".format(
+            "Stage " + name, values["objects"], values["seconds"], values["objects_per_second"] or '-',
+            values["errors"], values["failed"]))
+
+
+def format_prometheus(summary: dict) -> str:
+    """ The metrics in the Prometheus text exposition format
+
+    :param summary: the metrics, see Metrics.summary
+    :type summary: dict
+    :return: the metrics, one sample per line
+    :rtype: str
+    """
+    lines = []
+
+    def family(name: str, kind: str, description: str, key: str):
+        lines.append("# HELP arxiv_import_{} {}".format(name, description))
+        lines.append("# TYPE arxiv_import_{} {}".format(name, kind))
+        for stage, values in summary.items():
+            lines.append('arxiv_import_{}{{stage="{}"}} {}'.format(name, stage, values[key]))
+
+    family("stage_seconds", "gauge", "Wall time of the import stage in seconds.", "seconds")
+    family("stage_cpu_seconds", "gauge", "CPU time of the importing thread in the stage.", "cpu_seconds")
+    family("stage_blocked_seconds", "gauge", "Time the importing thread waited for batch requests.",
+           "blocked_seconds")
+    family("objects_total", "counter", "Objects imported by the stage.", "objects")
+    family("bytes_sent_total", "counter", "JSON payload bytes of the batches of the stage.", "bytes")
+    family("errors_total", "counter", "Items that failed at their first try.", "errors")
+    family("failed_total", "counter", "Items that still failed after the retries.", "failed")
+    lines.append("# HELP arxiv_import_batch_seconds Round trip time of the batches including retries.")
+    lines.append("# TYPE arxiv_import_batch_seconds histogram")
+    for stage, values in summary.items():
+        latency = values["latency_seconds"]
+        for bound, count in latency["buckets"].items():
+            lines.append('arxiv_import_batch_seconds_bucket{{stage="{}",le="{}"}} {}'.format(stage, bound, count))
+        lines.append('arxiv_import_batch_seconds_sum{{stage="{}"}} {}'.format(stage, latency["sum"]))
+        lines.append('arxiv_import_batch_seconds_count{{stage="{}"}} {}'.format(stage, values["batches"]))
+    return '\n'.join(lines) + '\n'
+
+
+def merge_summaries(summaries: list) -> dict:
+    """ Combines the metrics of imports that ran at the same time, e.g. the shards of an import
+
+    Objects, batches, bytes, errors, CPU and blocked time and the latency histograms are added
+    up. The wall time of a stage is the longest one of the imports, so the objects per second
+    are those of all imports together.
+
+    :param summaries: the metrics of every import, see Metrics.summary
+    :type summaries: list
+    :return: the combined metrics
+    :rtype: dict
+    """
+    merged = {}
+    for summary in summaries:
+        for name, values in summary.items():
+            if name not in merged:
+                merged[name] = {"seconds": 0.0, "cpu_seconds": 0.0, "blocked_seconds": 0.0, "objects": 0,
+                                "objects_per_second": None, "batches": 0, "bytes": 0, "errors": 0, "failed": 0,
+                                "latency_seconds": {"sum": 0.0, "buckets": {}}}
+            stage = merged[name]
+            stage["seconds"] = max(stage["seconds"], values["seconds"])
+            for key in ("cpu_seconds", "blocked_seconds"):
+                stage[key] = round(stage[key] + values[key], 6)
+            for key in ("objects", "batches", "bytes", "errors", "failed"):
+                stage[key] += values[key]
+            latency = stage["latency_seconds"]
+            latency["sum"] = round(latency["sum"] + values["latency_seconds"]["sum"], 6)
+            for bound, count in values["latency_seconds"]["buckets"].items():
+                latency["buckets"][bound] = latency["buckets"].get(bound, 0) + count
+    for stage in merged.values():
+        if stage["seconds"] > 0:
+            stage["objects_per_second"] = round(stage["objects"] / stage["seconds"], 1)
+    return merged
+
+
+def get_metrics(config: dict, profiler=None) -> Metrics:
+    """ Creates the metrics with the files set by metrics_json and metrics_prometheus in the
+    data section of the config
+
+    :param config: the config file with parameters
+    :type config: dict
+    :param profiler: profiles every stage
+    :type profiler: modules.profiling.Profiler, optional
+    :return: the metrics
+    :rtype: Metrics
+    """
+    if config is None or 'data' not in config:
+        return Metrics(profiler=profiler)
+    return Metrics(config['data'].get('metrics_json'), config['data'].get('metrics_prometheus'), profiler)
@@ -0,0 +1,171 @@
+""" Cached normalization of author and journal names """
+
+import re
+import sys
+import collections
+
+
+DEFAULT_NAME_CACHE_SIZE = 200000
+
+# the same rules as format_author_name and format_journal_name in modules.utilities
+_AUTHOR_DELETE = re.compile(r'[\n\r\t\'\\\"\`]')
+_AUTHOR_PARENTHESES = re.compile(r'\(.*\)')
+_AUTHOR_BRACKETS = re.compile(r'[\(\[\{].*?[\)\]\}]')
+_JOURNAL_NUMBER = re.compile('[0-9]')
+_JOURNAL_DELETE = str.maketrans('', '', '"\'\n')
+
+
+class _LRUCache:
+    """ A bounded mapping that drops the least recently used entry when it is full """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.hits = self.misses = 0
+        self._items = collections.OrderedDict()
+
+    def get(self, key):
+        """ returns the cached value or None, and marks the entry as recently used """
+        value = self._items.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._items.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        """ adds an entry, dropping the least recently used one if the cache is full """
+        self._items[key] = value
+        if len(self._items) > self.size:
+            self._items.popitem(last=False)
+
+    def __len__(self):
+        return len(self._items)
+
+
+def _split_authors(names: str) -> tuple:
+    return tuple(map(sys.intern, names.replace(' and ', ', ').split(', ')))
+
+
+class NameNormalizer:
+    """ Normalizes raw author and journal strings of the arxiv metadata
+
+    The patterns are compiled once, results are kept in a bounded LRU cache keyed on the raw
+    string and the normalized names are interned, so names that repeat across hundreds of
+    thousands of papers share one string object.
+    """
+
+    def __init__(self, cache_size: int = DEFAULT_NAME_CACHE_SIZE):
+        """
+        :param cache_size: maximum number of raw strings cached per kind of name
+        :type cache_size: int, optional
+        """
+        self._authors = _LRUCache(cache_size)
+        self._journals = _LRUCache(cache_size)
+
+    def authors(self, names: str) -> tuple:
+        """ Parses and formats the author names, like format_author_name
+
+        :param names: the raw names of the authors
+        :type names: str
+        :return: the parsed, formatted author names
+        :rtype: tuple
+        """
+        result = self._authors.get(names)
+        if result is None:
+            cleaned = _AUTHOR_DELETE.sub('', names)
+            cleaned = _AUTHOR_PARENTHESES.sub('', cleaned)
+            cleaned = _AUTHOR_BRACKETS.sub('', cleaned)
+            result = _split_authors(cleaned)
+            self._authors.put(names, result)
+        return result
+
+    def authors_batch(self, raw_names: list) -> list:
+        """ Normalizes the author strings of a whole chunk of papers at once
+
+        The strings that are not cached yet are joined by newlines. The rules remove newlines
+        from every single string first and the patterns never match across them, so the
+        patterns run once per chunk instead of once per paper.
+
+        :param raw_names: the raw author strings
+        :type raw_names: list
+        :return: the parsed, formatted author names per raw string
+        :rtype: list
+        """
+        results = {}
+        misses = []
+        for names in raw_names:
+            if names not in results:
+                results[names] = self._authors.get(names)
+                if results[names] is None:
+                    misses.append(names)
+
+        if len(misses) > 0:
+            joined = '\n'.join(_AUTHOR_DELETE.sub('', names) for names in misses)
+            joined = _AUTHOR_PARENTHESES.sub('', joined)
+            joined = _AUTHOR_BRACKETS.sub('', joined)
+            for names, cleaned in zip(misses, joined.split('\n')):
+                results[names] = _split_authors(cleaned)
+                self._authors.put(names, results[names])
+
+        return [results[names] for names in raw_names]
+
+    def journal(self, name: str) -> str:
+        """ Parses and formats the journal name, like format_journal_name
+
+        :param name: the raw journal reference
+        :type name: str
+        :return: the parsed, formatted name
+        :rtype: str
+        """
+        result = self._journals.get(name)
+        if result is None:
+            match = _JOURNAL_NUMBER.search(name)
+            result = sys.intern((name if match is None else name[:match.start()]).translate(_JOURNAL_DELETE))
+            self._journals.put(name, result)
+        return result
+
+    def cache_info(self) -> dict:
+        """ Statistics of the author and journal caches
+
+        :return: hits, misses and size per kind of name
+        :rtype: dict
+        """
+        return {kind: {"hits": cache.hits, "misses": cache.misses, "size": len(cache)}
+                for kind, cache in (("authors", self._authors), ("journals", self._journals))}
+
+
+_DEFAULT_NORMALIZER = NameNormalizer()
+
+
+def normalize_authors(names: str) -> tuple:
+    """ Parses and formats the author names with the shared, cached normalizer
+
+    :param names: the raw names of the authors
+    :type names: str
+    :return: the parsed, formatted author names
+    :rtype: tuple
+    """
+    return _DEFAULT_NORMALIZER.authors(names)
+
+
+def normalize_journal(name: str) -> str:
+    """ Parses and formats the journal name with the shared, cached normalizer
+
+    :param name: the raw journal reference
+    :type name: str
+    :return: the parsed, formatted name
+    :rtype: str
+    """
+    return _DEFAULT_NORMALIZER.journal(name)
+
+
+def normalize_authors_batch(raw_names: list) -> list:
+    """ Parses and formats a chunk of author strings at once with the shared, cached normalizer
+
+    :param raw_names: the raw author strings
+    :type raw_names: list
+    :return: the parsed, formatted author names per raw string
+    :rtype: list
+    """
+    return _DEFAULT_NORMALIZER.authors_batch(raw_names)
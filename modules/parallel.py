@@ -0,0 +1,156 @@
+""" Multi-process parsing of the arxiv metadata file """
+
+import os
+import itertools
+import collections
+from concurrent import futures
+from modules.imports import prepare_papers
+from modules.normalization import normalize_authors_batch
+from modules.decoders import get_json_decoder
+from modules.decoders import DEFAULT_JSON_DECODER
+from modules.metrics import Progress
+from modules.dedup import IdSet
+
+
+DEFAULT_CHUNK_BYTES = 8 * 1024 * 1024
+
+_CATEGORIES = None
+_LOADS = None
+
+
+def _skip_lines(filename: str, n_lines: int, offset: int = 0, index=None) -> int:
+    """ returns the byte offset of the line after the first n_lines lines from offset on
+    """
+    if n_lines <= 0:
+        return offset
+    if index is not None:
+        return index.offset_of(index.row_at(offset) + n_lines)
+    with open(filename, 'rb') as file:
+        file.seek(offset)
+        for line in file:
+            offset += len(line)
+            n_lines -= 1
+            if n_lines == 0:
+                break
+    return offset
+
+
+def _plan_chunks(filename: str, start: int, chunk_bytes: int, index=None, stop: int = None):
+    """ yields (start, end) byte ranges of about chunk_bytes that begin and end on a line boundary,
+    up to stop, which must be a line boundary too
+    """
+    size = os.path.getsize(filename) if stop is None else stop
+    if index is not None:
+        while start < size:
+            end = min(index.line_end_after(min(start + chunk_bytes, size)), size)
+            yield start, end
+            start = end
+        return
+    with open(filename, 'rb') as file:
+        while start < size:
+            file.seek(min(start + chunk_bytes, size))
+            file.readline()
+            end = min(file.tell(), size)
+            yield start, end
+            start = end
+
+
+def _init_worker(categories, json_decoder):
+    global _CATEGORIES, _LOADS  # pylint: disable=global-statement
+    _CATEGORIES = categories
+    _LOADS = get_json_decoder(json_decoder)
+
+
+def _read_chunk(filename: str, start: int, end: int) -> list:
+    """ decodes the lines in a byte range of the metadata file
+
+    :return: per line a tuple of the arxiv id, the byte offset of the next line and the paper, prepared as ready to send objects
+        if the worker was started with categories
+    :rtype: list
+    """
+    with open(filename, 'rb') as file:
+        file.seek(start)
+        lines = file.read(end - start).splitlines(keepends=True)
+
+    offsets = list(itertools.accumulate((len(line) for line in lines), initial=start))[1:]
+    papers = [_LOADS(line) for line in lines]
+    ids = [paper["id"] for paper in papers]
+    if _CATEGORIES is not None:
+        # fills the name cache for the whole chunk, prepare_papers then only looks names up
+        normalize_authors_batch([paper["authors"] for paper in papers if paper["authors"] is not None])
+        papers = prepare_papers(papers, _CATEGORIES)
+    return list(zip(ids, offsets, papers))
+
+
+def iter_metadata_parallel(filename: str, max_size: int, skip_n_papers: int, processes: int,
+                           categories: dict = None, json_decoder: str = DEFAULT_JSON_DECODER,
+                           chunk_bytes: int = DEFAULT_CHUNK_BYTES, start_offset: int = 0, offsets: bool = False,
+                           index=None, end_offset: int = None, ids: IdSet = None):
+    """ yields the papers of the arxiv data set, decoded by a pool of processes
+
+    The file is split into byte ranges that are decoded, and prepared with prepare_papers if
+    categories are given, by the worker processes. The chunks are merged in file order, so
+    skip_n_papers, max_size and the deduplication by id, where the first occurrence wins,
+    behave exactly like in _iter_metadata_file. At most two chunks per process are pending.
+
+    :param filename: the arxiv metadata file
+    :type filename: str
+    :param max_size: maximum number of papers, no limit if not positive
+    :type max_size: int
+    :param skip_n_papers: number of lines to skip at the beginning of the file
+    :type skip_n_papers: int
+    :param processes: number of worker processes
+    :type processes: int
+    :param categories: categories with uuids, prepare the papers if given
+    :type categories: dict, optional
+    :param json_decoder: name of the JSON decoder backend, see modules.decoders
+    :type json_decoder: str, optional
+    :param chunk_bytes: size of the byte ranges, defaults to 8MB
+    :type chunk_bytes: int, optional
+    :param start_offset: byte offset of the line to start reading at, defaults to 0
+    :type start_offset: int, optional
+    :param offsets: yield tuples of the byte offset of the line after the paper and the paper
+    :type offsets: bool, optional
+    :param index: the line index of the file, to skip lines and plan the chunks without reading
+    :type index: modules.lineindex.LineIndex, optional
+    :param end_offset: byte offset of the line to stop reading at, defaults to the end of the file
+    :type end_offset: int, optional
+    :param ids: the ids already loaded, which are skipped as duplicates, it is extended
+    :type ids: IdSet, optional
+    """
+    ids = IdSet() if ids is None else ids
+    count = loaded = 0
+    progress = Progress("Number of papers loaded ---------------:")
+
+    print("Start loading ArXiv dataset -----------:", filename, "with", processes, "processes")
+    chunks = _plan_chunks(filename, _skip_lines(filename, skip_n_papers, start_offset, index), chunk_bytes, index,
+                          end_offset)
+    pending = collections.deque()
+    executor = futures.ProcessPoolExecutor(processes, initializer=_init_worker, initargs=(categories, json_decoder))
+
+    def chunk_results():
+        for start, end in chunks:
+            pending.append(executor.submit(_read_chunk, filename, start, end))
+            if len(pending) >= 2 * processes:
+                yield pending.popleft().result()
+        while len(pending) > 0:
+            yield pending.popleft().result()
+
+    try:
+        for chunk in chunk_results():
+            for arxiv_id, offset, paper in chunk:
+                if 0 < max_size <= loaded:
+                    return
+                count += 1
+                if not ids.insert(arxiv_id):
+                    continue
+                loaded += 1
+                yield (offset, paper) if offsets else paper
+            progress.update(count)
+    finally:
+        # the chunks that did not start yet are dropped, cancel_futures needs Python 3.9
+        for future in pending:
+            future.cancel()
+        executor.shutdown()
+        print('\nDone loading ArXiv dataset ------------: load {}, skip {}'.format(
+            loaded, count + skip_n_papers - loaded))
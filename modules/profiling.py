@@ -0,0 +1,111 @@
+""" Profiling of the import stages with cProfile """
+
+import io
+import os
+import pstats
+import cProfile
+import contextlib
+
+
+DEFAULT_PROFILE_TOP = 20
+
+
+class Profiler:
+    """ Runs every import stage under cProfile and writes one profile per stage
+
+    Only the thread that runs the stage is profiled: the batch workers spend their time in
+    HTTP requests, which the calling thread sees as the time it waits for them, and the
+    parse_processes workers are separate interpreters. A stage that runs more than once is
+    added to the same profile.
+    """
+
+    def __init__(self, directory: str, top: int = DEFAULT_PROFILE_TOP):
+        """
+        :param directory: directory for the <stage>.prof files and summary.txt
+        :type directory: str
+        :param top: number of functions listed per stage in the summary
+        :type top: int, optional
+        """
+        self.directory = directory
+        self.top = top
+        self.profiles = {}
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        """ Profiles the code run in the context as part of a stage
+
+        :param name: the stage
+        :type name: str
+        """
+        profile = self.profiles.setdefault(name, cProfile.Profile())
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+
+    def path(self, name: str) -> str:
+        """ The file the profile of a stage is written to, it can be read with pstats or
+        viewers like snakeviz
+
+        :param name: the stage
+        :type name: str
+        :return: the path of the file
+        :rtype: str
+        """
+        return os.path.join(self.directory, name + '.prof')
+
+    def top_functions(self, name: str) -> str:
+        """ The functions of a stage with the most own time, with their callers' cumulative time
+
+        :param name: the stage
+        :type name: str
+        :return: the pstats listing of the top functions
+        :rtype: str
+        """
+        output = io.StringIO()
+        stats = pstats.Stats(self.profiles[name], stream=output)
+        stats.sort_stats(pstats.SortKey.TIME).print_stats(self.top)
+        return output.getvalue()
+
+    def report(self, summary: dict = None):
+        """ Writes the profiles and summary.txt, and prints for every stage the wall time,
+        the CPU time of the importing thread and the time it was blocked on batch requests
+
+        :param summary: Metrics.summary() of the import, for the times
+        :type summary: dict, optional
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        summary = summary or {}
+        with open(os.path.join(self.directory, 'summary.txt'), 'w') as file:
+            for name in self.profiles:
+                self.profiles[name].dump_stats(self.path(name))
+                times = _times(summary.get(name, {}))
+                print("{:<38}: {}".format("Profile " + name, times))
+                file.write("Stage {}: {}\n".format(name, times))
+                file.write(self.top_functions(name))
+        print("Profiles and summary written to -------:", self.directory)
+
+
+def _times(values: dict) -> str:
+    """ the wall, CPU and blocked seconds of a stage, and what is left for other waits """
+    if "seconds" not in values:
+        return "no metrics"
+    other = values["seconds"] - values["cpu_seconds"] - values["blocked_seconds"]
+    return "{:.2f} s wall, {:.2f} s CPU, {:.2f} s blocked on batches, {:.2f} s other".format(
+        values["seconds"], values["cpu_seconds"], values["blocked_seconds"], max(other, 0.0))
+
+
+def get_profiler(directory: str, top: int = DEFAULT_PROFILE_TOP) -> Profiler:
+    """ Creates the profiler of an import started with --profile
+
+    :param directory: directory for the profiles, None to not profile
+    :type directory: str
+    :param top: number of functions listed per stage in the summary
+    :type top: int, optional
+    :return: the profiler, None if directory is None
+    :rtype: Profiler
+    """
+    if directory is None:
+        return None
+    return Profiler(directory, top)
@@ -0,0 +1,175 @@
+""" Compact records of the papers of the arxiv data set """
+
+import functools
+from modules.utilities import parse_version_date
+from modules.utilities import generate_uuid
+from modules.normalization import normalize_journal
+from modules.normalization import normalize_authors
+
+
+# the uuids of the most recent journal and author names, the importers derive them again for
+# every paper instead of keeping a dict of all names
+DEFAULT_UUID_CACHE_SIZE = 65536
+
+
+class PaperRecord:
+    """ The fields of a paper the importers use, without the per-key overhead of the raw dict
+
+    Only what ends up in Weaviate is kept: the license, update date, parsed author list and the
+    version dicts are dropped, the versions are reduced to the latest version, its creation
+    date and the version history string, and newlines in the title and abstract are replaced.
+    The journal and author names are normalized once, equal names share one string or tuple
+    through the cache of the normalizer. Fields missing in the metadata are None. The uuids of
+    the paper and its journal are only set on records read from a columnar copy, see
+    modules.columnar, otherwise they are generated when needed.
+    """
+    __slots__ = ('id', 'title', 'doi', 'journal_ref', 'journal', 'authors', 'submitter', 'abstract', 'comments',
+                 'report_no', 'categories', 'latest_version', 'latest_version_created', 'version_history',
+                 'paper_uuid', 'journal_uuid')
+
+    def __init__(self, paper: dict):
+        """
+        :param paper: the metadata of the paper as decoded from the metadata file
+        :type paper: dict
+        """
+        self.id = paper["id"]  # pylint: disable=invalid-name
+        self.title = paper["title"].replace('\n', ' ') if paper["title"] is not None else None
+        self.doi = paper["doi"]
+        self.journal_ref = paper["journal-ref"]
+        self.journal = normalize_journal(self.journal_ref) if self.journal_ref is not None else None
+        self.authors = normalize_authors(paper["authors"]) if paper["authors"] is not None else None
+        self.submitter = paper["submitter"]
+        self.abstract = paper["abstract"].replace('\n', ' ') if paper["abstract"] is not None else None
+        self.comments = paper["comments"]
+        self.report_no = paper["report-no"]
+        self.categories = paper["categories"]
+        self.latest_version = self.latest_version_created = self.version_history = None
+        if paper["versions"] is not None:
+            self._set_versions(paper["versions"])
+        self.paper_uuid = self.journal_uuid = None
+
+    @classmethod
+    def from_values(cls, values) -> 'PaperRecord':
+        """ Creates a record from the values of its fields in the order of __slots__
+
+        :param values: the values
+        :type values: iterable
+        :return: the record
+        :rtype: PaperRecord
+        """
+        record = cls.__new__(cls)
+        (record.id, record.title, record.doi, record.journal_ref, record.journal, record.authors, record.submitter,
+         record.abstract, record.comments, record.report_no, record.categories, record.latest_version,
+         record.latest_version_created, record.version_history, record.paper_uuid, record.journal_uuid) = values
+        return record
+
+    def uuid(self) -> str:
+        """ The deterministic uuid of the Paper object
+
+        :return: the uuid
+        :rtype: str
+        """
+        if self.paper_uuid is not None:
+            return self.paper_uuid
+        uuid_base = ""
+        for value in (self.title, self.doi, self.id, self.latest_version):
+            if value is not None:
+                uuid_base += value
+        return generate_uuid('Paper', uuid_base)
+
+    def _set_versions(self, versions: list):
+        # older arxiv datadump files use versions in a string in one list item
+        if isinstance(versions[0], str):
+            self.version_history = str(versions).strip('[]')
+            self.latest_version = versions[-1]
+
+        # lastest arxiv datadump file uses different version datatypes
+        elif isinstance(versions[0], dict):
+            latest_version_number = 0
+            version_history = []
+            for version in versions:
+                version_number = int(version["version"].split('v')[1])
+                if version_number >= latest_version_number:
+                    self.latest_version = version["version"]
+                    created = parse_version_date(version.get("created"))
+                    if created is not None:
+                        self.latest_version_created = created
+                version_history.append(version["version"])
+            self.version_history = ','.join(map(str, version_history))
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, PaperRecord):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self) -> str:
+        return "PaperRecord(id={!r}, title={!r})".format(self.id, self.title)
+
+
+def paper_record(paper) -> PaperRecord:
+    """ The record of a paper, the importers accept both raw papers and records
+
+    :param paper: the metadata of the paper as decoded from the metadata file, or its record
+    :type paper: dict or PaperRecord
+    :return: the record
+    :rtype: PaperRecord
+    """
+    return paper if isinstance(paper, PaperRecord) else PaperRecord(paper)
+
+
+def journal_name(paper) -> str:
+    """ The normalized journal name of a raw paper or a record
+
+    :param paper: the metadata of the paper as decoded from the metadata file, or its record
+    :type paper: dict or PaperRecord
+    :return: the name, None if the paper has no journal reference
+    :rtype: str
+    """
+    if isinstance(paper, PaperRecord):
+        return paper.journal
+    return normalize_journal(paper['journal-ref']) if paper.get('journal-ref') is not None else None
+
+
+def journal_uuid(paper, name: str) -> str:
+    """ The uuid of the journal of a raw paper or a record
+
+    :param paper: the metadata of the paper as decoded from the metadata file, or its record
+    :type paper: dict or PaperRecord
+    :param name: the normalized journal name of the paper
+    :type name: str
+    :return: the uuid
+    :rtype: str
+    """
+    if isinstance(paper, PaperRecord) and paper.journal_uuid is not None:
+        return paper.journal_uuid
+    return _journal_uuid(name)
+
+
+@functools.lru_cache(maxsize=DEFAULT_UUID_CACHE_SIZE)
+def _journal_uuid(name: str) -> str:
+    return generate_uuid('Journal', name)
+
+
+@functools.lru_cache(maxsize=DEFAULT_UUID_CACHE_SIZE)
+def author_uuid(name: str) -> str:
+    """ The uuid of an author, cached for the most recent names
+
+    :param name: the normalized author name
+    :type name: str
+    :return: the uuid
+    :rtype: str
+    """
+    return generate_uuid('Author', name)
+
+
+def author_names(paper) -> tuple:
+    """ The normalized author names of a raw paper or a record
+
+    :param paper: the metadata of the paper as decoded from the metadata file, or its record
+    :type paper: dict or PaperRecord
+    :return: the names, None if the paper has no authors
+    :rtype: tuple
+    """
+    if isinstance(paper, PaperRecord):
+        return paper.authors
+    return normalize_authors(paper["authors"]) if paper["authors"] is not None else None
@@ -0,0 +1,258 @@
+""" Persistent registry of the objects Weaviate has acknowledged """
+
+import sqlite3
+import collections
+from modules.utilities import generate_uuid
+from modules.sharding import SHARED_CLASSES
+
+
+DEFAULT_REGISTRY_CACHE_KB = 16384
+DEFAULT_REGISTRY_LOOKUP_CACHE = 65536
+# ids per SQLite lookup of claim_all, below the 999 variables older SQLite versions allow
+_LOOKUP_CHUNK = 500
+
+_CLASSES = ('Journal', 'Author', 'Paper', 'References')
+
+
+def references_id(paper_uuid: str) -> str:
+    """ The registry id that marks the author references of a paper as created
+
+    :param paper_uuid: uuid of the paper
+    :type paper_uuid: str
+    :return: the id to look up in the registry
+    :rtype: str
+    """
+    return generate_uuid('References', paper_uuid)
+
+
+class IdRegistry:
+    """ An SQLite backed set of the deterministic uuids Weaviate has acknowledged
+
+    The ids are stored as 16 byte keys of a WITHOUT ROWID table, so lookups are one b-tree
+    search and the memory use is capped by the SQLite page cache, however many ids there are.
+    The registry belongs to one Weaviate instance, it is cleared when it is opened for another
+    url or when the schema of the instance is recreated.
+
+    The importers also ask the registry which journals and authors still have to be sent, see
+    claim, instead of keeping all names in memory. The acknowledged ids of these classes,
+    which many papers repeat, are kept in a bounded LRU cache in front of the SQLite lookups,
+    and the ids sent but not acknowledged yet in a set, which holds at most the batches in
+    flight and the objects that failed.
+
+    A delta import sends changed papers and their references again under the same uuids, its
+    registry only skips the classes in SHARED_CLASSES.
+    """
+
+    def __init__(self, path: str, weaviate_url: str = None, cache_kb: int = DEFAULT_REGISTRY_CACHE_KB,
+                 lookup_cache: int = DEFAULT_REGISTRY_LOOKUP_CACHE, classes: tuple = None):
+        """
+        :param path: the SQLite file
+        :type path: str
+        :param weaviate_url: the Weaviate instance the ids belong to
+        :type weaviate_url: str, optional
+        :param cache_kb: size of the SQLite page cache in KiB
+        :type cache_kb: int, optional
+        :param lookup_cache: number of acknowledged journal and author ids cached in memory
+        :type lookup_cache: int, optional
+        :param classes: the classes whose acknowledged objects is_acknowledged reports, defaults
+            to all, the ids of all classes are recorded
+        :type classes: tuple, optional
+        """
+        self.path = path
+        self.classes = _CLASSES if classes is None else classes
+        self.skipped = collections.Counter()
+        # number of SQLite queries that looked up ids, the cache answers the others
+        self.lookups = 0
+        self._recent = collections.OrderedDict()
+        self._lookup_cache = lookup_cache
+        self._submitted = set()
+        self._connection = sqlite3.connect(path)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute("PRAGMA cache_size=-{}".format(int(cache_kb)))
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS acknowledged (id BLOB PRIMARY KEY, class INTEGER) WITHOUT ROWID")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+        row = self._connection.execute("SELECT value FROM meta WHERE key = 'weaviate'").fetchone()
+        if weaviate_url is not None and (row is None or row[0] != weaviate_url):
+            self.clear()
+            self._connection.execute("INSERT OR REPLACE INTO meta VALUES ('weaviate', ?)", (weaviate_url,))
+        self._connection.commit()
+
+    def __contains__(self, object_uuid: str) -> bool:
+        if object_uuid in self._recent:
+            self._recent.move_to_end(object_uuid)
+            return True
+        self.lookups += 1
+        return self._connection.execute(
+            "SELECT 1 FROM acknowledged WHERE id = ?", (_key(object_uuid),)).fetchone() is not None
+
+    def is_acknowledged(self, object_uuid: str, class_name: str) -> bool:
+        """ Checks if an object was acknowledged by Weaviate, and counts it as skipped if so
+
+        :param object_uuid: uuid of the object
+        :type object_uuid: str
+        :param class_name: class of the object, used for the skipped counts
+        :type class_name: str
+        :return: True if Weaviate already has the object
+        :rtype: bool
+        """
+        if class_name not in self.classes:
+            return False
+        if object_uuid in self._recent:
+            # a journal or author that was counted when it was looked up or acknowledged
+            self._recent.move_to_end(object_uuid)
+            return True
+        if object_uuid in self:
+            if class_name in SHARED_CLASSES:
+                self._remember(object_uuid)
+            self.skipped[class_name] += 1
+            return True
+        return False
+
+    def claim(self, object_uuid: str, class_name: str) -> bool:
+        """ Checks if a journal or author still has to be sent, it is neither acknowledged nor
+        sent before in this run, and records it as sent if so
+
+        :param object_uuid: uuid of the object
+        :type object_uuid: str
+        :param class_name: class of the object, used for the skipped counts
+        :type class_name: str
+        :return: True if the caller has to send the object
+        :rtype: bool
+        """
+        return len(self.claim_all([object_uuid], class_name)) > 0
+
+    def claim_all(self, ids: list, class_name: str) -> list:
+        """ Like claim for many journals or authors, the ids the cache does not know are looked
+        up with one SQLite query per chunk
+
+        :param ids: uuids of the objects
+        :type ids: list
+        :param class_name: class of the objects, used for the skipped counts
+        :type class_name: str
+        :return: the uuids the caller has to send, in the order of ids and each once
+        :rtype: list
+        """
+        candidates = []
+        for object_uuid in ids:
+            if object_uuid in self._recent:
+                self._recent.move_to_end(object_uuid)
+            elif object_uuid not in self._submitted:
+                self._submitted.add(object_uuid)
+                candidates.append(object_uuid)
+
+        keys = [_key(object_uuid) for object_uuid in candidates]
+        found = set()
+        for start in range(0, len(keys), _LOOKUP_CHUNK):
+            chunk = keys[start:start + _LOOKUP_CHUNK]
+            self.lookups += 1
+            found.update(row[0] for row in self._connection.execute(
+                "SELECT id FROM acknowledged WHERE id IN ({})".format(','.join('?' * len(chunk))), chunk))
+
+        claimed = []
+        for object_uuid, key in zip(candidates, keys):
+            if key in found:
+                self._submitted.discard(object_uuid)
+                self._remember(object_uuid)
+                self.skipped[class_name] += 1
+            else:
+                claimed.append(object_uuid)
+        return claimed
+
+    def add(self, ids: list):
+        """ Records ids as acknowledged
+
+        :param ids: tuples of uuid and class name
+        :type ids: list
+        """
+        self._connection.executemany(
+            "INSERT OR IGNORE INTO acknowledged VALUES (?, ?)",
+            [(_key(object_uuid), _CLASSES.index(class_name)) for object_uuid, class_name in ids])
+        self._connection.commit()
+        for object_uuid, class_name in ids:
+            if class_name in SHARED_CLASSES:
+                self._submitted.discard(object_uuid)
+                self._remember(object_uuid)
+
+    def acknowledge_objects(self, results: list):
+        """ Records the objects of an objects batch result that were created without errors
+
+        :param results: the result of client.batch.create_objects
+        :type results: list
+        """
+        if results is None:
+            return
+        self.add([(result['id'], result['class']) for result in results
+                  if 'id' in result and result.get('class') in _CLASSES and not _has_errors(result)])
+
+    def acknowledge_references(self, results: list):
+        """ Records the papers of a references batch result whose references were all created
+
+        The importers never split the references of one paper across batches.
+
+        :param results: the result of client.batch.create_references
+        :type results: list
+        """
+        if results is None:
+            return
+        papers = {}
+        for result in results:
+            if 'to' in result:
+                paper_uuid = result['to'].split('/')[-1]
+                papers[paper_uuid] = papers.get(paper_uuid, True) and not _has_errors(result)
+        self.add([(references_id(paper_uuid), 'References') for paper_uuid, ok in papers.items() if ok])
+
+    def count(self) -> dict:
+        """ Number of acknowledged ids per class
+
+        :return: counts per class name
+        :rtype: dict
+        """
+        rows = self._connection.execute("SELECT class, COUNT(*) FROM acknowledged GROUP BY class")
+        return {_CLASSES[class_index]: count for class_index, count in rows}
+
+    def clear(self):
+        """ Forgets all ids, e.g. after the schema was recreated """
+        self._connection.execute("DELETE FROM acknowledged")
+        self._connection.commit()
+        self._recent.clear()
+        self._submitted.clear()
+
+    def _remember(self, object_uuid: str):
+        self._recent[object_uuid] = None
+        self._recent.move_to_end(object_uuid)
+        if len(self._recent) > self._lookup_cache:
+            self._recent.popitem(last=False)
+
+    def close(self):
+        """ Closes the SQLite file """
+        self._connection.close()
+
+
+def _key(object_uuid: str) -> bytes:
+    """ the 16 bytes of a uuid, like uuid.UUID(object_uuid).bytes for the canonical form the
+    importers generate, without its validation
+    """
+    return bytes.fromhex(object_uuid.replace('-', ''))
+
+
+def _has_errors(result: dict) -> bool:
+    return 'result' in result and result['result'] is not None and 'errors' in result['result']
+
+
+def get_id_registry(config: dict, classes: tuple = None) -> IdRegistry:
+    """ Opens the registry set by id_registry in the weaviate section of the config
+
+    :param config: the config file with parameters
+    :type config: dict
+    :param classes: the classes the importers skip, defaults to all, see IdRegistry
+    :type classes: tuple, optional
+    :return: the registry, None if no id_registry is set
+    :rtype: IdRegistry
+    """
+    if config is None or 'weaviate' not in config or not config['weaviate'].get('id_registry'):
+        return None
+    return IdRegistry(config['weaviate']['id_registry'], config['weaviate'].get('url', config['weaviate'].get('wcs')),
+                      classes=classes)
@@ -0,0 +1,204 @@
+""" Split an import into shards that run independently, e.g. on several machines """
+
+import os
+import json
+import time
+from modules.metrics import merge_summaries
+from modules.metrics import print_summary
+from modules.metrics import format_prometheus
+
+
+DEFAULT_SHARD_METRICS = 'metrics.json'
+DEFAULT_SCHEMA_WAIT_SECONDS = 600
+
+# the classes whose objects the papers of every shard share, each is sent by one shard only
+SHARED_CLASSES = ('Journal', 'Author')
+# the files every shard keeps for itself, by section of the config
+_SHARD_FILES = {"data": ('checkpoint', 'metrics_json', 'metrics_prometheus'),
+                "weaviate": ('id_registry', 'dead_letter_file')}
+
+
+def shard_path(path: str, shard_id: int, num_shards: int) -> str:
+    """ The file of one shard, the shard is added in front of the extension
+
+    :param path: the file of an import that is not sharded, e.g. ./data/checkpoint.json
+    :type path: str
+    :param shard_id: the shard
+    :type shard_id: int
+    :param num_shards: the number of shards
+    :type num_shards: int
+    :return: the file of the shard, e.g. ./data/checkpoint.shard-0-of-4.json
+    :rtype: str
+    """
+    root, extension = os.path.splitext(path)
+    return "{}.shard-{}-of-{}{}".format(root, shard_id, num_shards, extension)
+
+
+class Shard:
+    """ One of num_shards imports that together import the metadata file once
+
+    Every shard imports the papers of its part of the lines of the file, see
+    modules.lineindex.shard_range. The journals and authors are shared by the papers of all
+    shards, and Weaviate replaces an object that is sent again, together with the references
+    other shards added to it. So every shard reads the names of the whole file, to know the
+    uuids its papers refer to, but only sends the shared objects it owns, chosen by their uuid.
+    A reference needs the author it is added to, so the shard that owns an author also adds
+    the references of all its papers, once the author was created, see
+    modules.imports.import_shard_references, and the papers of a shard come without their
+    references. Only shard 0 loads the schema and sends the taxonomy.
+    """
+
+    def __init__(self, shard_id: int, num_shards: int):
+        """
+        :param shard_id: the shard, from 0 to num_shards - 1
+        :type shard_id: int
+        :param num_shards: the number of shards
+        :type num_shards: int
+        """
+        if num_shards < 1 or not 0 <= shard_id < num_shards:
+            raise ValueError("shard_id must be between 0 and num_shards - 1, got {} of {}".format(
+                shard_id, num_shards))
+        self.shard_id = shard_id
+        self.num_shards = num_shards
+        # set once the shared objects of the shard were sent, they are not sent again after
+        self.shared_sent = False
+
+    @property
+    def loads_schema(self) -> bool:
+        """ True for the shard that loads the schema and sends the taxonomy """
+        return self.shard_id == 0
+
+    def owns(self, object_uuid: str) -> bool:
+        """ Checks if the shard sends a shared object
+
+        :param object_uuid: the uuid of the object
+        :type object_uuid: str
+        :return: True if the object belongs to the shard
+        :rtype: bool
+        """
+        return int(object_uuid.replace('-', ''), 16) % self.num_shards == self.shard_id
+
+    def skips(self, object_uuid: str, class_name: str) -> bool:
+        """ Checks if the importers leave an object to another shard, or already sent it
+
+        :param object_uuid: the uuid of the object
+        :type object_uuid: str
+        :param class_name: the class of the object
+        :type class_name: str
+        :return: True if the shard does not send the object
+        :rtype: bool
+        """
+        if class_name == 'References':
+            # the references of a paper are added by the owners of its authors
+            return True
+        return class_name in SHARED_CLASSES and (self.shared_sent or not self.owns(object_uuid))
+
+    def path(self, path: str) -> str:
+        """ The file of the shard, see shard_path """
+        return shard_path(path, self.shard_id, self.num_shards)
+
+    def apply(self, config: dict):
+        """ Points the checkpoint, id registry, dead-letter and metrics files of the config to
+        the files of the shard, the metrics are always written for the merge
+
+        :param config: the config file with parameters
+        :type config: dict
+        """
+        if not config['data'].get('metrics_json'):
+            config['data']['metrics_json'] = DEFAULT_SHARD_METRICS
+        for section, keys in _SHARD_FILES.items():
+            for key in keys:
+                if config[section].get(key):
+                    config[section][key] = self.path(config[section][key])
+
+
+def get_shard(config: dict) -> Shard:
+    """ The shard set by shard_id and num_shards in the data section of the config
+
+    :param config: the config file with parameters
+    :type config: dict
+    :return: the shard, None if the import is not sharded
+    :rtype: Shard
+    """
+    if config is None or 'data' not in config or config['data'].get('num_shards', 1) <= 1:
+        return None
+    return Shard(config['data'].get('shard_id', 0), config['data']['num_shards'])
+
+
+def wait_for_schema(client, seconds: float = DEFAULT_SCHEMA_WAIT_SECONDS, interval: float = 2.0) -> bool:
+    """ Waits until the shard that loads the schema created it
+
+    :param client: python client connection
+    :type client: weaviate.client.Client
+    :param seconds: how long to wait at most
+    :type seconds: float, optional
+    :param interval: seconds between two checks
+    :type interval: float, optional
+    :return: True if the schema exists
+    :rtype: bool
+    """
+    deadline = time.monotonic() + seconds
+    while not client.schema.contains():
+        if time.monotonic() >= deadline:
+            return False
+        print("Waiting for the schema of shard 0 -----:", round(deadline - time.monotonic()), "seconds left",
+              end='\r')
+        time.sleep(interval)
+    return True
+
+
+def merge_shard_metrics(config: dict, paths: list = None) -> dict:
+    """ Prints the combined metrics of the shards of an import, and writes them to the
+    metrics_json and metrics_prometheus files of the config, if set
+
+    The import is only complete if no shard left failed items, e.g. references whose author
+    was missing, they are reported with the dead-letter files of the shards that can be
+    found here, to be sent again with --replay.
+
+    :param config: the config file with parameters, with num_shards in the data section
+    :type config: dict
+    :param paths: the JSON metrics of the shards, defaults to the metrics_json files of all
+        shards, e.g. copied from the machines they ran on
+    :type paths: list, optional
+    :return: the combined metrics
+    :rtype: dict
+    """
+    num_shards = config['data'].get('num_shards', 1)
+    metrics_json = config['data'].get('metrics_json') or DEFAULT_SHARD_METRICS
+    if not paths:
+        paths = [shard_path(metrics_json, shard_id, num_shards) for shard_id in range(num_shards)]
+
+    summaries = []
+    for path in paths:
+        if not os.path.exists(path):
+            print("Missing metrics of shard --------------:", path)
+            continue
+        with open(path) as file:
+            summary = json.load(file)
+        summaries.append(summary)
+        print("{:<38}: {:>9} objects {:>9.2f} s {:>6} errors {:>6} failed".format(
+            "Shard " + os.path.basename(path), sum(values["objects"] for values in summary.values()),
+            sum(values["seconds"] for values in summary.values()),
+            sum(values["errors"] for values in summary.values()),
+            sum(values["failed"] for values in summary.values())))
+
+    merged = merge_summaries(summaries)
+    print("Merged metrics of shards --------------:", len(summaries), "of", len(paths))
+    print_summary(merged)
+    failed = sum(values["failed"] for values in merged.values())
+    if failed > 0:
+        print("Incomplete import, failed items -------:", failed,
+              "- replay the dead-letter file of every shard with --shard-id ID --replay")
+    if 'weaviate' in config and config['weaviate'].get('dead_letter_file'):
+        for shard_id in range(num_shards):
+            path = shard_path(config['weaviate']['dead_letter_file'], shard_id, num_shards)
+            if os.path.exists(path) and os.path.getsize(path) > 0:
+                with open(path) as file:
+                    print("Dead letters of shard -----------------:", shard_id, sum(1 for _ in file), path)
+    if config['data'].get('metrics_json'):
+        with open(config['data']['metrics_json'], 'w') as file:
+            json.dump(merged, file, indent=2)
+    if config['data'].get('metrics_prometheus'):
+        with open(config['data']['metrics_prometheus'], 'w') as file:
+            file.write(format_prometheus(merged))
+    return merged
@@ -0,0 +1,140 @@
+""" Batch sizes that adapt to the observed Weaviate latency """
+
+from modules.utilities import DEFAULT_MAX_BATCH
+
+
+DEFAULT_MIN_BATCH_SIZE = 10
+DEFAULT_BATCH_SIZE_LIMIT = 1000
+DEFAULT_BATCH_TARGET_SECONDS = 2.0
+DEFAULT_MAX_BATCH_BYTES = 8 * 1024 * 1024
+DEFAULT_MAX_ERROR_RATE = 0.05
+
+# a batch grows at most by half and shrinks at most by half per observation
+_MAX_GROWTH = 1.5
+_BACKOFF = 0.5
+# a new size is logged if it differs this much from the last logged one
+_LOG_CHANGE = 0.2
+
+
+class BatchSizer:
+    """ Chooses the number of objects per batch for every class
+
+    Without adapt, every class uses the initial size, the max_batch_size of the config. With
+    adapt, the size of a class moves towards the number of objects Weaviate handles in
+    target_seconds, judged by the round trip time per object of the last batch that was at
+    least half full. It is capped so a batch stays below max_bytes of payload, is halved if a
+    batch timed out or more than max_error_rate of its objects failed, and always stays within
+    minimum and maximum. Objects batches are tracked by their class, reference batches as
+    'references'.
+    """
+
+    def __init__(self, initial: int = DEFAULT_MAX_BATCH, adapt: bool = False,
+                 minimum: int = DEFAULT_MIN_BATCH_SIZE, maximum: int = DEFAULT_BATCH_SIZE_LIMIT,
+                 target_seconds: float = DEFAULT_BATCH_TARGET_SECONDS, max_bytes: int = DEFAULT_MAX_BATCH_BYTES,
+                 max_error_rate: float = DEFAULT_MAX_ERROR_RATE):
+        """
+        :param initial: the size of every class to start with
+        :type initial: int, optional
+        :param adapt: adapt the sizes to the observed batches
+        :type adapt: bool, optional
+        :param minimum: lower bound of the sizes
+        :type minimum: int, optional
+        :param maximum: upper bound of the sizes
+        :type maximum: int, optional
+        :param target_seconds: round trip time to aim for per batch
+        :type target_seconds: float, optional
+        :param max_bytes: upper bound of the JSON payload per batch
+        :type max_bytes: int, optional
+        :param max_error_rate: share of failed objects above which a batch counts as overload
+        :type max_error_rate: float, optional
+        """
+        self.initial = initial
+        self.adapt = adapt
+        self.minimum = min(minimum, initial)
+        self.maximum = max(maximum, initial)
+        self.target_seconds = target_seconds
+        self.max_bytes = max_bytes
+        self.max_error_rate = max_error_rate
+        self._sizes = {}
+        self._logged = {}
+
+    def get(self, class_name: str) -> int:
+        """ The number of objects for the next batch of a class
+
+        :param class_name: the class, 'references' for reference batches
+        :type class_name: str
+        :return: the batch size
+        :rtype: int
+        """
+        return int(self._sizes.get(class_name, self.initial))
+
+    def observe(self, class_name: str, count: int, seconds: float, payload_bytes: int = 0,
+                failed: int = 0, timeout: bool = False):
+        """ Adapts the size of a class to the round trip of one of its batches
+
+        :param class_name: the class, 'references' for reference batches
+        :type class_name: str
+        :param count: number of objects in the batch
+        :type count: int
+        :param seconds: round trip time of the batch
+        :type seconds: float
+        :param payload_bytes: size of the JSON payload
+        :type payload_bytes: int, optional
+        :param failed: number of objects that failed
+        :type failed: int, optional
+        :param timeout: the batch timed out or did not get an answer at all
+        :type timeout: bool, optional
+        """
+        if not self.adapt or count <= 0:
+            return
+
+        size = self._sizes.get(class_name, float(self.initial))
+        if timeout or failed > count * self.max_error_rate:
+            size *= _BACKOFF
+        elif seconds > 0 and count >= size / 2:
+            # the number of objects that would have taken target_seconds, approached halfway,
+            # partly filled batches, like the rest at the end of a stage, are dominated by the
+            # fixed costs of a request and say little about the time per object
+            ideal = self.target_seconds * count / seconds
+            size = min(size + (ideal - size) / 2, size * _MAX_GROWTH)
+        if payload_bytes > 0:
+            size = min(size, self.max_bytes * count / payload_bytes)
+        self._sizes[class_name] = size = min(max(size, self.minimum), self.maximum)
+
+        logged = self._logged.get(class_name, self.initial)
+        if abs(size - logged) >= logged * _LOG_CHANGE:
+            self._logged[class_name] = int(size)
+            print("\nAdapted batch size --------------------:", class_name, int(size),
+                  "({} objects took {:.2f}s, {} kB, {} failed)".format(count, seconds, payload_bytes // 1024, failed))
+
+    def sizes(self) -> dict:
+        """ The current size of every class that was observed
+
+        :return: sizes per class
+        :rtype: dict
+        """
+        return {class_name: int(size) for class_name, size in self._sizes.items()}
+
+
+def get_batch_sizer(config: dict) -> BatchSizer:
+    """ Creates the batch sizer set by the weaviate section of the config
+
+    max_batch_size is the initial size, adaptive_batch_size enables the adaption within
+    min_batch_size and batch_size_limit, towards batch_target_seconds per batch and below
+    max_batch_bytes of payload.
+
+    :param config: the config file with parameters
+    :type config: dict
+    :return: the batch sizer
+    :rtype: BatchSizer
+    """
+    if config is None or 'weaviate' not in config:
+        return BatchSizer()
+    weaviate_config = config['weaviate']
+    return BatchSizer(weaviate_config.get('max_batch_size', DEFAULT_MAX_BATCH),
+                      weaviate_config.get('adaptive_batch_size', False),
+                      weaviate_config.get('min_batch_size', DEFAULT_MIN_BATCH_SIZE),
+                      weaviate_config.get('batch_size_limit', DEFAULT_BATCH_SIZE_LIMIT),
+                      weaviate_config.get('batch_target_seconds', DEFAULT_BATCH_TARGET_SECONDS),
+                      weaviate_config.get('max_batch_bytes', DEFAULT_MAX_BATCH_BYTES),
+                      weaviate_config.get('max_batch_error_rate', DEFAULT_MAX_ERROR_RATE))
@@ -1,37 +1,67 @@
 """ Load and import taxanomy """
 
+import os
 import re
-import copy
+import json
+import hashlib
 import weaviate
-from bs4 import BeautifulSoup
-import requests
-import pandas as pd
 
 from modules.utilities import generate_uuid
-from modules.utilities import check_batch_result
+from modules.batching import BatchSender
+from modules.download import download
+from modules.download import DEFAULT_DOWNLOAD_TIMEOUT
+
+
+TAXANOMY_URL = 'https://arxiv.org/category_taxonomy'
 
 
 def load_taxanomy(config) -> dict:
     """ load ArXiv taxonomy from https://arxiv.org/category_taxonomy
 
+    The parsed taxonomy is cached as JSON next to the HTML page, together with the hash of the
+    page. As long as the page does not change, later runs load the JSON and do not need to
+    parse the HTML again.
+
     :return: groups, archives and categories
     :rtype: dict
     """
-    #pylint: disable="too-many-locals"
-    #pylint: disable="too-many-statements"
 
     path = 'taxanomy.html'
-    if config is not None and 'data' in config and 'taxanomy' in config['data']:
-        path = config['data']['taxanomy']
-
-    try:
-        response = requests.get('https://arxiv.org/category_taxonomy').text
-        with open(path, "w") as file:
-            file.write(response)
-            file.close()
-    except requests.exceptions.RequestException:
-        with open(path, "r") as file:
-            response = file.read()
+    url = TAXANOMY_URL
+    timeout = DEFAULT_DOWNLOAD_TIMEOUT
+    if config is not None and 'data' in config:
+        path = config['data'].get('taxanomy', path)
+        url = config['data'].get('taxanomy_url', url)
+        timeout = config['data'].get('timeout', timeout)
+    cache_path = os.path.splitext(path)[0] + '.json'
+
+    # the cached page is only fetched again if it changed, and used as it is when offline
+    download(url, path, timeout)
+    with open(path, "rb") as file:
+        response = file.read()
+    page_hash = hashlib.sha256(response).hexdigest()
+
+    if os.path.exists(cache_path):
+        with open(cache_path) as file:
+            cached = json.load(file)
+        if cached.get("page") == page_hash:
+            print("Loaded taxanomy from cache ------------:", cache_path)
+            return {"groups": cached["groups"], "archives": cached["archives"], "categories": cached["categories"]}
+
+    taxanomy = _parse_taxanomy(response.decode('utf-8'))
+    temporary = cache_path + '.tmp'
+    with open(temporary, 'w') as file:
+        json.dump(dict(taxanomy, page=page_hash), file, separators=(',', ':'))
+    os.replace(temporary, cache_path)
+    return taxanomy
+
+
+def _parse_taxanomy(response: str) -> dict:
+    """ parses the groups, archives and categories from the HTML page of the taxonomy
+    """
+    #pylint: disable="too-many-locals"
+    # BeautifulSoup is only needed if the page changed since it was cached
+    from bs4 import BeautifulSoup  # pylint: disable=import-outside-toplevel
 
     soup = BeautifulSoup(response, 'lxml')
     root = soup.find('div', {'id': 'category_taxonomy_list'})
@@ -41,12 +71,9 @@ def load_taxanomy(config) -> dict:
     level_2_code = ""
     level_2_name = ""
 
-    level_1_names = []
-    level_2_codes = []
-    level_2_names = []
-    level_3_codes = []
-    level_3_names = []
-    level_3_notes = []
+    groups = {}  # {name}
+    archives = {}  # {name, id, inGroup}
+    categories = {}  # {name, id, description, inArchive}
 
     for tag in tags:
         if tag.name == "h2":
@@ -63,43 +90,34 @@ def load_taxanomy(config) -> dict:
             level_3_name = re.sub(r"(.*) \((.*)\)", r"\2", raw)
         elif tag.name == "p":
             notes = tag.text
-            level_1_names.append(level_1_name)
-            level_2_names.append(level_2_name)
-            level_2_codes.append(level_2_code)
-            level_3_names.append(level_3_name)
-            level_3_codes.append(level_3_code)
-            level_3_notes.append(notes)
-
-    groups = []  # {name}
-    archives = []  # {name, id, inGroup}
-    categories = []  # {name, id, description, inArchive}
-
-    group_names = list(set(level_1_names))
-    for name in group_names:
-        groups.append({"name": name})
-
-    df_archives = pd.DataFrame({
-        'inGroup': level_1_names,
-        'name': level_2_names,
-        'id': level_2_codes
-
-    })
-    df_archives.drop_duplicates(inplace=True, ignore_index=True)
-    archives = df_archives.to_dict(orient="records")
-
-    df_categories = pd.DataFrame({
-        'inArchive': level_2_names,
-        'name': level_3_names,
-        'id': level_3_codes,
-        'description': level_3_notes
-    })
-    df_categories.drop_duplicates(inplace=True, ignore_index=True)
-    categories = df_categories.to_dict(orient="records")
-
-    return {"groups": groups, "archives": archives, "categories": categories}
-
-
-def add_categories(client, categories, archives_with_uuids_dict) -> dict:
+            # dicts keyed on all fields drop the duplicates and keep the first occurrence
+            groups.setdefault(level_1_name, {"name": level_1_name})
+            archives.setdefault((level_1_name, level_2_name, level_2_code),
+                                {"inGroup": level_1_name, "name": level_2_name, "id": level_2_code})
+            categories.setdefault((level_2_name, level_3_name, level_3_code, notes),
+                                  {"inArchive": level_2_name, "name": level_3_name, "id": level_3_code,
+                                   "description": notes})
+
+    return {"groups": list(groups.values()), "archives": list(archives.values()),
+            "categories": list(categories.values())}
+
+
+def _send_taxonomy(client, batch, sender: BatchSender = None):
+    """ sends a batch of the taxonomy and waits for it, in a sharded import only the shard that
+    loads the schema sends the taxonomy, the others only need the uuids. Without a shared
+    sender a sender of its own is used and closed again.
+    """
+    if sender is None:
+        with BatchSender(client) as own_sender:
+            _send_taxonomy(client, batch, own_sender)
+        return
+    if sender.shard is not None and not sender.shard.loads_schema:
+        return
+    sender.create_objects(batch)
+    sender.flush()
+
+
+def add_categories(client, categories, archives_with_uuids_dict, sender: BatchSender = None) -> dict:
     """ Add the ArXiv categories groups to Weaviate
 
     :param client: python client connection
@@ -108,26 +126,26 @@ def add_categories(client, categories, archives_with_uuids_dict) -> dict:
     :type categories: list
     :param archives_with_uuids_dict: archives with uuids where the categories should link to
     :type archives_with_uuids_dict: dict
+    :param sender: the batch sender shared by all importers, defaults to a new one
+    :type sender: BatchSender, optional
     :return: categories with uuids
     :rtype: dict
     """
 
     batch = weaviate.ObjectsBatchRequest()
-    category_ids = []
+    category_ids = set()
     categories_with_uuid = {}
     count = 0
     print("Start adding Categories ---------------:", count, end='\r')
     for category in categories:
-        category_copy = copy.deepcopy(category)
-        category_uuid = category_copy["name"]
-        uuid = generate_uuid('Category', category_uuid)
+        uuid = generate_uuid('Category', category["name"])
         archive_beacon = "weaviate://localhost/" + \
             archives_with_uuids_dict['archive' + category['inArchive']]
-        category_copy['inArchive'] = [{
+        # the batch keeps a copy of the object, the category itself stays as it is
+        batch.add(dict(category, inArchive=[{
             "beacon": archive_beacon
-        }]
-        batch.add(category_copy, "Category", uuid)
-        categories_with_uuid[category_copy["id"]] = uuid
+        }]), "Category", uuid)
+        categories_with_uuid[category["id"]] = uuid
 
         # also create archive for the category archive if not exist yet (e.g.
         # "cs" for the category id "cs.AI"), because some items are labeled
@@ -136,7 +154,7 @@ def add_categories(client, categories, archives_with_uuids_dict) -> dict:
         # check if archive exists
         if (category['id'].split('.')[0] not in category_ids) and (
                 category['id'].split('.')[0] != category['id']):
-            category_ids.append(category['id'].split('.')[0])
+            category_ids.add(category['id'].split('.')[0])
 
             extra_category = {}
             extra_category["name"] = category['inArchive']
@@ -149,14 +167,13 @@ def add_categories(client, categories, archives_with_uuids_dict) -> dict:
             categories_with_uuid[extra_category["id"]] = uuid
             count += 1
 
-    result = client.batch.create_objects(batch)
-    check_batch_result(result)
+    _send_taxonomy(client, batch, sender)
 
     print("Done adding Categories ----------------:", count)
     return categories_with_uuid
 
 
-def add_archives(client, archives, groups) -> dict:
+def add_archives(client, archives, groups, sender: BatchSender = None) -> dict:
     """ Add the ArXiv taxonomy archives to Weaviate
 
     :param client: python client connection
@@ -165,6 +182,8 @@ def add_archives(client, archives, groups) -> dict:
     :type archives: list
     :param groups: groups with uuids where the categories should link to
     :type groups: dict
+    :param sender: the batch sender shared by all importers, defaults to a new one
+    :type sender: BatchSender, optional
     :return: archives with uuids
     :rtype: dict
     """
@@ -176,25 +195,28 @@ def add_archives(client, archives, groups) -> dict:
     for archive in archives:
         uuid = generate_uuid('Archive', archive["name"])
         group_beacon = "weaviate://localhost/" + groups['group' + archive['inGroup']]
-        archive['inGroup'] = [{ "beacon": group_beacon }]
-        batch.add(archive, "Archive", uuid)
+        # the batch keeps a copy of the object, the archive itself stays as it is
+        batch.add(dict(archive, inGroup=[{
+            "beacon": group_beacon
+        }]), "Archive", uuid)
         archives_with_uuid['archive' + archive["name"]] = uuid
         count += 1
 
-    result = client.batch.create_objects(batch)
-    check_batch_result(result)
+    _send_taxonomy(client, batch, sender)
 
     print("Done adding Archives ------------------:", count)
     return archives_with_uuid
 
 
-def add_groups(client: weaviate.client.Client, groups: list) -> dict:
+def add_groups(client: weaviate.client.Client, groups: list, sender: BatchSender = None) -> dict:
     """ Add the ArXiv taxonomy groups to Weaviate
 
     :param client: python client connection
     :type client: weaviate.client.Client
     :param groups: the groups in the taxanomy
     :type groups: list
+    :param sender: the batch sender shared by all importers, defaults to a new one
+    :type sender: BatchSender, optional
     :return: groups with uuids
     :rtype: dict
     """
@@ -209,7 +231,6 @@ def add_groups(client: weaviate.client.Client, groups: list) -> dict:
         groups_with_uuid['group' + group['name']] = uuid
         count += 1
 
-    result = client.batch.create_objects(batch)
-    check_batch_result(result)
+    _send_taxonomy(client, batch, sender)
     print("Done adding Groups --------------------:", count)
     return groups_with_uuid
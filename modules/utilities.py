@@ -2,15 +2,20 @@
 
 import os
 import datetime
+import functools
 import uuid
 import re
-import weaviate
-from weaviate.tools import WCS
 
 
 DEFAULT_WEAVIATE = 'http://localhost:8080'
 DEFAULT_MAX_BATCH = 1000
 DEFAULT_VERBOSE = False
+DEFAULT_DATE_CACHE_SIZE = 65536
+
+# arxiv version dates always look like "Mon, 2 Apr 2007 19:18:42 GMT"
+_VERSION_DATE = re.compile(r'[A-Z][a-z]{2}, (\d{1,2}) ([A-Z][a-z]{2}) (\d{4}) (\d{2}):(\d{2}):(\d{2}) GMT')
+_MONTHS = {month: number for number, month in enumerate(
+    ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'], 1)}
 
 
 def log(i: str) -> str:
@@ -52,9 +57,10 @@ def check_batch_result(results: dict):
                         print(message['message'])
 
 
-def load_schema(client, config):
+def load_schema(client, config) -> bool:
     """
-    loads the schema into Weaviate
+    loads the schema into Weaviate, an existing schema and its data are only deleted if
+    overwrite_schema is set in the weaviate section of the config (the default)
 
     Parameters
     ----------
@@ -62,6 +68,11 @@ def load_schema(client, config):
         The weaviate client
     config: dict
         A dict that contains the parameters
+
+    Returns
+    -------
+    bool
+        True if the schema was (re)created, False if the existing one was kept
     """
 
     path = "./schema/schema.json"
@@ -69,11 +80,14 @@ def load_schema(client, config):
         path = config['weaviate']['schema']
 
     if client.schema.contains():
+        if not config['weaviate'].get('overwrite_schema', True):
+            return False
         client.schema.delete_all()
     client.schema.create(path)
+    return True
 
 
-def get_weaviate_client(instance: dict) -> weaviate.client:
+def get_weaviate_client(instance: dict) -> 'weaviate.Client':
     """
     Gets the Weaviate client
 
@@ -90,6 +104,8 @@ def get_weaviate_client(instance: dict) -> weaviate.client:
 
     if instance is None:
         return None
+    # weaviate pulls in requests and urllib3, only load them once a client is needed
+    import weaviate  # pylint: disable=import-outside-toplevel
 
     auth = username = password = client = None
     if 'username' in instance and 'password' in instance:
@@ -106,6 +122,7 @@ def get_weaviate_client(instance: dict) -> weaviate.client:
 
     elif 'wcs' in instance:
         if auth is not None:
+            from weaviate.tools import WCS  # pylint: disable=import-outside-toplevel
             my_wcs = WCS(auth)
             try:
                 result = my_wcs.get_cluster_config(instance['wcs'])
@@ -167,3 +184,33 @@ def extract_year(paper_id: str) -> int:
     except BaseException:
         year = 0
     return year
+
+
+@functools.lru_cache(maxsize=DEFAULT_DATE_CACHE_SIZE)
+def parse_version_date(created: str) -> str:
+    """ Converts the creation date of a paper version to an ISO 8601 string
+
+    The fixed arxiv format "Mon, 2 Apr 2007 19:18:42 GMT" is parsed directly, anything else
+    falls back to the generic dateutil parser. Results are cached for repeated timestamps.
+
+    :param created: the created field of a version
+    :type created: str
+    :return: the date in ISO 8601 format, None if it is not a string or cannot be parsed
+    :rtype: str
+    """
+    if not isinstance(created, str):
+        return None
+    match = _VERSION_DATE.fullmatch(created)
+    if match is not None and match.group(2) in _MONTHS:
+        try:
+            return datetime.datetime(
+                int(match.group(3)), _MONTHS[match.group(2)], int(match.group(1)),
+                int(match.group(4)), int(match.group(5)), int(match.group(6)),
+                tzinfo=datetime.timezone.utc).isoformat()
+        except ValueError:
+            pass
+    from dateutil import parser  # pylint: disable=import-outside-toplevel
+    try:
+        return parser.parse(created).isoformat()
+    except Exception:  # pylint: disable=broad-except
+        return None
@@ -0,0 +1,231 @@
+import unittest
+import io
+import os
+import time
+import tempfile
+import random
+import threading
+import contextlib
+import requests
+import weaviate
+from weaviate.exceptions import UnexpectedStatusCodeException
+from modules.batching import BatchSender
+from modules.deadletter import read_dead_letters
+
+
+class RecordingBatch:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.created = []
+        self.in_flight = self.max_in_flight = 0
+
+    def create_objects(self, batch):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(random.random() * 0.01)
+        objects = batch.get_request_body()["objects"]
+        with self.lock:
+            self.in_flight -= 1
+            self.created.extend(item["id"] for item in objects)
+        return [{"result": {"errors": {"error": [{"message": item["properties"]["name"]}]}}} for item in objects]
+
+    def create_references(self, batch):
+        with self.lock:
+            return [{"created": len(self.created)} for _ in batch.get_request_body()]
+
+
+class RecordingClient:
+
+    def __init__(self):
+        self.batch = RecordingBatch()
+
+
+def _objects_batch(index: int):
+    batch = weaviate.ObjectsBatchRequest()
+    batch.add({"name": str(index)}, "Author", "00000000-0000-0000-0000-%012d" % index)
+    return batch
+
+
+class TestBatchSender(unittest.TestCase):
+
+    def test_errors_are_reported_in_order(self):
+        client = RecordingClient()
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            config = {"weaviate": {"batch_workers": 4, "batch_queue_size": 4, "batch_retries": 0}}
+            with BatchSender(client, config) as sender:
+                for index in range(20):
+                    sender.create_objects(_objects_batch(index))
+
+        self.assertEqual(output.getvalue().split(), [str(index) for index in range(20)])
+        self.assertEqual(len(client.batch.created), 20)
+        self.assertLessEqual(client.batch.max_in_flight, 4)
+
+    def test_references_wait_for_objects(self):
+        client = RecordingClient()
+        results = []
+        client.batch.create_references = lambda batch: results.append(len(client.batch.created)) or [{}]
+        with contextlib.redirect_stdout(io.StringIO()):
+            with BatchSender(client, {"weaviate": {"batch_workers": 4, "batch_retries": 0}}) as sender:
+                for index in range(10):
+                    sender.create_objects(_objects_batch(index))
+                references = weaviate.ReferenceBatchRequest()
+                references.add(_objects_batch(0).get_request_body()["objects"][0]["id"], "Author",
+                               "wrotePapers", _objects_batch(1).get_request_body()["objects"][0]["id"])
+                sender.create_references(references)
+
+        self.assertEqual(results, [10])
+
+    def test_without_workers_sends_synchronously(self):
+        client = RecordingClient()
+        with contextlib.redirect_stdout(io.StringIO()):
+            sender = BatchSender(client, {"weaviate": {"batch_workers": 0, "batch_retries": 0}})
+            sender.create_objects(_objects_batch(1))
+            self.assertEqual(len(client.batch.created), 1)
+            sender.close()
+
+    def test_when_done_runs_after_acknowledged_batches(self):
+        client = RecordingClient()
+        done = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            config = {"weaviate": {"batch_workers": 4, "batch_queue_size": 4, "batch_retries": 0}}
+            with BatchSender(client, config) as sender:
+                for index in range(10):
+                    sender.create_objects(_objects_batch(index))
+                    sender.when_done(lambda count=index + 1: done.append((count, len(client.batch.created))))
+
+        self.assertEqual(len(done), 10)
+        for count, created in done:
+            self.assertGreaterEqual(created, count)
+
+    def test_failed_items_are_retried(self):
+        client = RecordingClient()
+        attempts = []
+
+        def create_objects(batch):
+            objects = batch.get_request_body()["objects"]
+            attempts.append(len(objects))
+            if len(attempts) == 1:
+                raise requests.exceptions.ConnectionError("connection refused")
+            # the first object only goes through at the third attempt
+            return [{"id": item["id"], "result": {"errors": {"error": [{"message": "overloaded"}]}}}
+                    if item["properties"]["name"] == "0" and len(attempts) < 4 else {"id": item["id"]}
+                    for item in objects]
+        client.batch.create_objects = create_objects
+
+        batch = weaviate.ObjectsBatchRequest()
+        for index in range(3):
+            batch.add({"name": str(index)}, "Author", "00000000-0000-0000-0000-%012d" % index)
+        with BatchSender(client, {"weaviate": {"batch_retries": 3, "batch_retry_seconds": 0}}) as sender:
+            sender.create_objects(batch)
+
+        self.assertEqual(attempts, [3, 3, 1, 1])
+
+    def test_only_transient_errors_are_retried(self):
+        client = RecordingClient()
+        attempts = []
+        messages = {"0": "context deadline exceeded", "1": "invalid object: no such prop", "2": None}
+
+        def create_objects(batch):
+            objects = batch.get_request_body()["objects"]
+            attempts.append(sorted(item["properties"]["name"] for item in objects))
+            results = []
+            for item in objects:
+                message = messages[item["properties"]["name"]]
+                results.append({"id": item["id"], "result": {"errors": {"error": [{"message": message}]}}}
+                               if message else {"id": item["id"]})
+            return results
+        client.batch.create_objects = create_objects
+
+        batch = weaviate.ObjectsBatchRequest()
+        for index in range(3):
+            batch.add({"name": str(index)}, "Author", "00000000-0000-0000-0000-%012d" % index)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'dead-letters.ndjson')
+            config = {"weaviate": {"batch_retries": 2, "batch_retry_seconds": 0, "dead_letter_file": path}}
+            with contextlib.redirect_stdout(io.StringIO()):
+                with BatchSender(client, config) as sender:
+                    sender.create_objects(batch)
+            records = list(read_dead_letters(path))
+
+        self.assertEqual(attempts, [["0", "1", "2"], ["0"], ["0"]])
+        self.assertEqual(sorted(record["properties"]["name"] for record in records), ["0", "1"])
+
+    def test_items_without_results_are_retried(self):
+        client = RecordingClient()
+        attempts = []
+
+        def create_objects(batch):
+            objects = batch.get_request_body()["objects"]
+            attempts.append(len(objects))
+            # no answer at first, then a result for the first object only
+            return None if len(attempts) == 1 else [{"id": objects[0]["id"]}]
+        client.batch.create_objects = create_objects
+
+        batch = weaviate.ObjectsBatchRequest()
+        for index in range(3):
+            batch.add({"name": str(index)}, "Author", "00000000-0000-0000-0000-%012d" % index)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'dead-letters.ndjson')
+            config = {"weaviate": {"batch_retries": 2, "batch_retry_seconds": 0, "dead_letter_file": path}}
+            with contextlib.redirect_stdout(io.StringIO()):
+                with BatchSender(client, config) as sender:
+                    sender.create_objects(batch)
+            records = list(read_dead_letters(path))
+
+        self.assertEqual(attempts, [3, 3, 2])
+        self.assertEqual([record["properties"]["name"] for record in records], ["2"])
+        self.assertIn("no result", records[0]["error"])
+
+        attempts.clear()
+        client.batch.create_objects = lambda batch: attempts.append(len(batch)) or []
+        with BatchSender(client, {"weaviate": {"batch_retries": 1, "batch_retry_seconds": 0}}) as sender:
+            with self.assertRaises(RuntimeError):
+                sender.create_objects(_objects_batch(1))
+                sender.flush()
+        self.assertEqual(attempts, [1, 1])
+
+    def test_rejected_requests_are_not_retried(self):
+        client = RecordingClient()
+        attempts = []
+
+        def create_objects(batch):
+            attempts.append(len(batch))
+            response = requests.Response()
+            response.status_code = 422
+            raise UnexpectedStatusCodeException("invalid batch", response)
+        client.batch.create_objects = create_objects
+
+        with BatchSender(client, {"weaviate": {"batch_retries": 3, "batch_retry_seconds": 0}}) as sender:
+            with self.assertRaises(UnexpectedStatusCodeException):
+                sender.create_objects(_objects_batch(1))
+                sender.flush()
+
+        self.assertEqual(attempts, [1])
+
+    def test_items_that_keep_failing_are_dead_lettered(self):
+        client = RecordingClient()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'dead-letters.ndjson')
+            config = {"weaviate": {"batch_retries": 1, "batch_retry_seconds": 0, "dead_letter_file": path}}
+            with contextlib.redirect_stdout(io.StringIO()):
+                with BatchSender(client, config) as sender:
+                    sender.create_objects(_objects_batch(1))
+                    client.batch.create_references = lambda batch: (_ for _ in ()).throw(
+                        requests.exceptions.ReadTimeout("timed out"))
+                    references = weaviate.ReferenceBatchRequest()
+                    references.add("00000000-0000-0000-0000-000000000001", "Author", "wrotePapers",
+                                   "00000000-0000-0000-0000-000000000002")
+                    sender.create_references(references)
+
+            records = list(read_dead_letters(path))
+
+        # the error of the object is not transient, it is dead-lettered without another try
+        self.assertEqual(len(client.batch.created), 1)
+        self.assertEqual([record["kind"] for record in records], ["object", "reference"])
+        self.assertEqual(records[0]["id"], "00000000-0000-0000-0000-000000000001")
+        self.assertEqual(records[0]["properties"], {"name": "1"})
+        self.assertEqual(records[0]["error"], "1")
+        self.assertIn("timed out", records[1]["error"])
@@ -0,0 +1,85 @@
+import unittest
+import os
+import io
+import json
+import tempfile
+import contextlib
+from modules import metadata
+from modules.checkpoint import Checkpoint
+from modules.columnar import convert_metadata
+
+SAMPLE_FILE = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'sample-arxiv-metadata-oai.json')
+
+
+class TestCheckpoint(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'checkpoint.json')
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_counts_add_up_across_resumes(self):
+        checkpoint = Checkpoint(self.path, SAMPLE_FILE)
+        self.assertIsNone(checkpoint.load())
+        checkpoint.update('papers', 100, 10, {"Paper": 10, "references": 25})
+
+        resumed = Checkpoint(self.path, SAMPLE_FILE)
+        self.assertEqual(resumed.load()["offset"], 100)
+        resumed.update('papers', 200, 5, {"Paper": 5})
+        resumed.update('done')
+
+        with open(self.path) as file:
+            state = json.load(file)
+        self.assertEqual(state["stage"], 'done')
+        self.assertEqual(state["offset"], 200)
+        self.assertEqual(state["papers"], 15)
+        self.assertEqual(state["counts"], {"Paper": 15, "references": 25})
+
+    def test_checkpoint_of_another_file_is_ignored(self):
+        Checkpoint(self.path, SAMPLE_FILE).update('papers', 100, 10)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertIsNone(Checkpoint(self.path, 'other.json').load())
+
+    def test_resume_reads_from_offset(self):
+        config = {"data": {"metadata_file": SAMPLE_FILE, "n_papers": 50, "stream": True}}
+        stream = metadata.get_metadata(config)
+        papers = []
+        for paper in stream:
+            papers.append(paper["id"])
+            if len(papers) == 20:
+                state = {"offset": stream.offset, "papers": stream.loaded}
+
+        resumed = [paper["id"] for paper in metadata.get_metadata(config, checkpoint=state)]
+        self.assertEqual(resumed, papers[20:])
+
+    def test_resume_skips_duplicates_of_papers_before_offset(self):
+        with open(SAMPLE_FILE) as file:
+            lines = file.readlines()
+        # a copy of a loaded and of a skipped paper after the offset of the checkpoint
+        lines[30:30] = [lines[5], lines[1]]
+        filename = os.path.join(self.directory.name, 'metadata.json')
+        with open(filename, 'w') as file:
+            file.writelines(lines)
+        columnar = os.path.join(self.directory.name, 'columns')
+        with contextlib.redirect_stdout(io.StringIO()):
+            convert_metadata(filename, columnar)
+
+        for data in ({}, {"parse_processes": 2}, {"columnar": columnar}):
+            config = {"data": dict(data, metadata_file=filename, skip_n_papers=3, stream=True)}
+            with contextlib.redirect_stdout(io.StringIO()):
+                stream = metadata.get_metadata(config)
+                papers = []
+                for paper in stream:
+                    papers.append(metadata.paper_record(paper).id)
+                    if len(papers) == 20:
+                        state = {"offset": stream.offset, "papers": stream.loaded}
+                resumed = [metadata.paper_record(paper).id for paper in metadata.get_metadata(config, checkpoint=state)]
+
+            self.assertEqual(papers.count(json.loads(lines[1])["id"]), 1, data)
+            self.assertEqual(resumed, papers[20:], data)
+
+    def test_registry_is_kept_next_to_checkpoint(self):
+        self.assertEqual(Checkpoint('./data/checkpoint.json').registry_path, './data/checkpoint.ids.sqlite')
@@ -0,0 +1,98 @@
+import unittest
+import io
+import os
+import json
+import shutil
+import tempfile
+import contextlib
+from modules import metadata
+from modules.columnar import convert_metadata
+from modules.columnar import ColumnarMetadata
+from modules.imports import prepare_papers
+from modules.records import paper_record
+
+SAMPLE_FILE = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'sample-arxiv-metadata-oai.json')
+
+
+class TestColumnar(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp()
+        with open(SAMPLE_FILE) as file:
+            self.lines = file.readlines()
+        # a duplicate and a non-ASCII title, which is sliced from the bytes of its chunk
+        unicode = dict(json.loads(self.lines[1]), title="Gröbner bases – λ")
+        self.filename = os.path.join(self.directory, 'metadata.json')
+        with open(self.filename, 'w') as file:
+            file.writelines(self.lines[:20] + [self.lines[3], json.dumps(unicode) + '\n'] + self.lines[20:])
+        self.columnar = os.path.join(self.directory, 'columns')
+        with contextlib.redirect_stdout(io.StringIO()):
+            convert_metadata(self.filename, self.columnar, chunk_rows=7)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.directory)
+
+    def _get_metadata(self, columnar: bool, **data):
+        config = {"data": dict(data, metadata_file=self.filename)}
+        if columnar:
+            config["data"]["columnar"] = self.columnar
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            return metadata.get_metadata(config), output.getvalue()
+
+    def test_columnar_matches_json(self):
+        for data in ({}, {"skip_n_papers": 15, "n_papers": 30}):
+            papers, _ = self._get_metadata(False, **data)
+            records, output = self._get_metadata(True, **data)
+
+            self.assertIn('(columnar)', output)
+            self.assertEqual(len(records), len(papers))
+            self.assertEqual(list(prepare_papers(records, {"hep-ph": "x"})),
+                             list(prepare_papers(papers, {"hep-ph": "x"})))
+
+    def test_chunks_keep_the_line_offsets(self):
+        columns = ColumnarMetadata(self.columnar)
+        offsets = [offset for chunk, _ in columns.iter_chunks(chunk_rows=5) for offset in chunk]
+        columns.close()
+
+        self.assertEqual(len(offsets), len(self.lines) + 2)
+        self.assertEqual(offsets[-1], os.path.getsize(self.filename))
+        self.assertEqual(offsets[0], len(self.lines[0].encode('utf-8')))
+
+    def test_resume_from_offset(self):
+        resumed = []
+        for columnar in ({}, {"columnar": self.columnar}):
+            config = {"data": dict(columnar, metadata_file=self.filename, stream=True)}
+            with contextlib.redirect_stdout(io.StringIO()):
+                stream = metadata.get_metadata(config)
+                for count, _ in enumerate(stream, 1):
+                    if count == 10:
+                        state = {"offset": stream.offset, "papers": stream.loaded}
+                resumed.append([paper_record(paper).id
+                                for paper in metadata.get_metadata(config, checkpoint=state)])
+
+        self.assertEqual(resumed[1], resumed[0])
+        # the two lines after line 20 repeat papers before the offset, they are skipped after the resume too
+        self.assertEqual(len(resumed[1]), len(self.lines) - 10)
+
+    def test_stream_releases_the_mapped_files(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            stream = metadata.get_metadata({"data": {"metadata_file": self.filename, "columnar": self.columnar,
+                                                     "stream": True}})
+            first = [paper_record(paper).id for paper in stream]
+            self.assertEqual(stream.columns._maps, [])  # pylint: disable=protected-access
+            second = [paper_record(paper).id for paper in stream]
+            with ColumnarMetadata(self.columnar) as columns:
+                self.assertEqual(columns.rows, len(self.lines) + 2)
+            self.assertEqual(columns._maps, [])  # pylint: disable=protected-access
+
+        self.assertEqual(second, first)
+        self.assertEqual(len(first), len(self.lines))
+
+    def test_outdated_copy_is_not_read(self):
+        with open(self.filename, 'a') as file:
+            file.write(self.lines[-1])
+        papers, output = self._get_metadata(True)
+
+        self.assertIn('Columnar copy is outdated', output)
+        self.assertNotIn('(columnar)', output)
+        self.assertEqual(len(papers), len(self.lines))
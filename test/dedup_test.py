@@ -0,0 +1,36 @@
+import unittest
+import random
+from modules.dedup import IdSet
+
+
+class TestIdSet(unittest.TestCase):
+
+    def test_first_occurrence_wins_like_a_set(self):
+        generator = random.Random(7)
+        ids = ["{:02d}{:02d}.{:05d}".format(generator.randint(15, 23), generator.randint(1, 12),
+                                            generator.randint(0, 99999)) for _ in range(3000)]
+        ids += ["07{:02d}.{:04d}".format(generator.randint(4, 12), generator.randint(0, 9999)) for _ in range(1000)]
+        ids += ["{}/{:02d}{:02d}{:03d}".format(generator.choice(['hep-th', 'math', 'math.AG', 'cond-mat']),
+                                               generator.randint(91, 99), generator.randint(1, 12),
+                                               generator.randint(0, 999)) for _ in range(1000)]
+        ids += ["paper-{}".format(generator.randint(0, 100)) for _ in range(200)]
+        ids += generator.sample(ids, 1000)
+        generator.shuffle(ids)
+
+        seen, compact = set(), IdSet()
+        for arxiv_id in ids:
+            self.assertEqual(compact.insert(arxiv_id), arxiv_id not in seen)
+            seen.add(arxiv_id)
+        self.assertEqual(len(compact), len(seen))
+        self.assertTrue(all(arxiv_id in compact for arxiv_id in seen))
+        self.assertNotIn('2401.00000x', compact)
+        self.assertNotIn('9912.99999', compact)
+
+    def test_split_keeps_ids_apart(self):
+        compact = IdSet()
+        for arxiv_id in ('0704.0001', '0704.00001', '0704.000001', '0704.0010', 'hep-th/9901001', 'math/9901001',
+                         'hep-th/9901002', '0704.000\u0661', '001', '01'):
+            self.assertTrue(compact.insert(arxiv_id), arxiv_id)
+        self.assertFalse(compact.insert('math/9901001'))
+        self.assertNotIn('0704.00010', compact)
+        self.assertNotIn('astro-ph/9901001', compact)
@@ -0,0 +1,75 @@
+import unittest
+import os
+import io
+import tempfile
+import contextlib
+from modules import metadata
+from modules.delta import PaperIndex, content_hash
+
+SAMPLE_FILE = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'sample-arxiv-metadata-oai.json')
+
+
+class TestPaperIndex(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'index.sqlite')
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.papers = metadata.get_metadata({"data": {"metadata_file": SAMPLE_FILE}}, categories={})
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def _import(self, papers) -> tuple:
+        index = PaperIndex(self.path, 'http://localhost:8080')
+        sent = list(index.diff(papers))
+        withdrawn = index.withdrawn()
+        index.commit(withdrawn)
+        index.close()
+        return sent, withdrawn, dict(index.counts)
+
+    def test_content_hash_ignores_key_order(self):
+        self.assertEqual(content_hash({"a": 1, "b": [1, 2]}), content_hash({"b": [1, 2], "a": 1}))
+        self.assertNotEqual(content_hash({"a": 1}), content_hash({"a": 2}))
+
+    def test_only_differences_are_sent(self):
+        sent, _, counts = self._import(self.papers[:60])
+        self.assertEqual(len(sent), 60)
+        self.assertEqual(counts, {"new": 60, "withdrawn": 0})
+
+        journal, authors, paper_uuid, paper_object = self.papers[20]
+        changed = (journal, authors, paper_uuid, dict(paper_object, abstract="changed"))
+        snapshot = self.papers[10:20] + [changed] + self.papers[21:]
+        sent, withdrawn, counts = self._import(snapshot)
+
+        self.assertEqual(counts["unchanged"], 49)
+        self.assertEqual(counts["changed"], 1)
+        self.assertEqual(counts["new"], len(self.papers) - 60)
+        self.assertEqual(sorted(withdrawn), sorted(paper[2] for paper in self.papers[:10]))
+        self.assertIn((journal, [], paper_uuid, changed[3]), sent)
+
+        sent, withdrawn, counts = self._import(snapshot)
+        self.assertEqual((sent, withdrawn), ([], []))
+
+    def test_uncommitted_changes_are_rolled_back(self):
+        index = PaperIndex(self.path)
+        list(index.diff(self.papers))
+        index.close()
+
+        sent, _, _ = self._import(self.papers)
+        self.assertEqual(len(sent), len(self.papers))
+
+    def test_references_of_lost_authors_and_withdrawn_papers(self):
+        self._import(self.papers[:20])
+        journal, authors, paper_uuid, paper_object = self.papers[5]
+        self.assertGreater(len(authors), 1)
+        changed = (journal, authors[1:] + [("New Author", "00000000-0000-0000-0000-000000000001")], paper_uuid,
+                   paper_object)
+
+        index = PaperIndex(self.path, 'http://localhost:8080')
+        sent = list(index.diff(self.papers[1:5] + [changed] + self.papers[6:20]))
+        self.assertEqual(sent, [(journal, changed[1][-1:], paper_uuid, paper_object)])
+        self.assertEqual(index.stale_references, [(authors[0][1], paper_uuid)])
+        self.assertEqual(index.withdrawn_references(), [(author_uuid, self.papers[0][2])
+                                                        for _, author_uuid in self.papers[0][1]])
+        index.close()
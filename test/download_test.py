@@ -0,0 +1,190 @@
+import unittest
+import os
+import io
+import zipfile
+import tempfile
+import threading
+import contextlib
+import http.server
+from unittest import mock
+import requests
+from modules import metadata
+from modules import download as download_module
+from modules.download import download
+
+METADATA_FILE = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'data', 'metadata', '1000.json')
+
+
+class RangeHandler(http.server.BaseHTTPRequestHandler):
+    """ serves the data of the server, with Range requests, and breaks off the first response
+    after cut_after bytes if set """
+
+    def do_GET(self):
+        self.server.requests.append(dict(self.headers))
+        if self.headers.get('If-None-Match') == self.server.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        start = 0
+        if 'Range' in self.headers and self.headers.get('If-Range', self.server.etag) == self.server.etag:
+            start = int(self.headers['Range'].split('=')[1].rstrip('-'))
+        self.server.ranges.append(start)
+        if start >= len(self.server.data):
+            self.send_response(416)
+            self.end_headers()
+            return
+
+        body = self.server.data[start:]
+        self.send_response(206 if start > 0 else 200)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', self.server.etag)
+        if start > 0:
+            self.send_header('Content-Range', 'bytes {}-{}/{}'.format(start, len(self.server.data) - 1,
+                                                                      len(self.server.data)))
+        self.end_headers()
+        if self.server.cut_after is not None:
+            body, self.server.cut_after = body[:self.server.cut_after], None
+            self.wfile.write(body)
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+
+class TestDownload(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+            zip_file.write(METADATA_FILE, '1000.json')
+
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), RangeHandler)
+        self.server.data = archive.getvalue()
+        self.server.ranges = []
+        self.server.cut_after = None
+        self.server.etag = '"v1"'
+        self.server.requests = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = 'http://127.0.0.1:{}/1000.json.zip'.format(self.server.server_address[1])
+        self.path = os.path.join(self.directory.name, '1000.json.zip')
+
+    def tearDown(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+        self.directory.cleanup()
+
+    def test_zip_is_read_without_extracting(self):
+        config = {"data": {"metadata_file": self.url, "metadata_dir": self.directory.name + '/'}}
+        with contextlib.redirect_stdout(io.StringIO()):
+            papers = metadata.get_metadata(config)
+            expected = metadata.get_metadata({"data": {"metadata_file": METADATA_FILE}})
+
+        self.assertEqual(papers, expected)
+        self.assertEqual(sorted(os.listdir(self.directory.name)), ['1000.json.zip', '1000.json.zip.download.json'])
+
+    def test_partial_download_is_resumed(self):
+        with open(self.path + '.part', 'wb') as file:
+            file.write(self.server.data[:10000])
+        with contextlib.redirect_stdout(io.StringIO()):
+            download(self.url, self.path)
+
+        self.assertEqual(self.server.ranges, [10000])
+        with open(self.path, 'rb') as file:
+            self.assertEqual(file.read(), self.server.data)
+
+    def test_broken_download_continues(self):
+        self.server.cut_after = 50000
+        with contextlib.redirect_stdout(io.StringIO()):
+            download(self.url, self.path, chunk_bytes=4096, retry_seconds=0.01)
+
+        self.assertEqual(len(self.server.ranges), 2)
+        self.assertTrue(0 < self.server.ranges[1] <= 50000)
+        with open(self.path, 'rb') as file:
+            self.assertEqual(file.read(), self.server.data)
+
+    def test_unchanged_file_is_not_downloaded_again(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            download(self.url, self.path)
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            download(self.url, self.path)
+
+        self.assertEqual(self.server.requests[1]['If-None-Match'], '"v1"')
+        self.assertEqual(self.server.ranges, [0])
+        self.assertIn('Using cached download', output.getvalue())
+
+    def test_changed_file_is_downloaded_again(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            download(self.url, self.path)
+        self.server.data, self.server.etag = self.server.data[::-1], '"v2"'
+        with contextlib.redirect_stdout(io.StringIO()):
+            download(self.url, self.path)
+
+        self.assertEqual(self.server.ranges, [0, 0])
+        with open(self.path, 'rb') as file:
+            self.assertEqual(file.read(), self.server.data)
+
+    def test_partial_download_of_another_version_restarts(self):
+        with open(self.path + '.part', 'wb') as file:
+            file.write(b'x' * 10000)
+        with open(self.path + '.part.download.json', 'w') as file:
+            file.write('{"etag": "\\"v0\\""}')
+        with contextlib.redirect_stdout(io.StringIO()):
+            download(self.url, self.path)
+
+        self.assertEqual(self.server.ranges, [0])
+        with open(self.path, 'rb') as file:
+            self.assertEqual(file.read(), self.server.data)
+
+    def test_cached_file_is_used_offline(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            download(self.url, self.path)
+        self.server.shutdown()
+        self.server.server_close()
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            download(self.url, self.path, timeout=1, retries=0)
+
+        self.assertIn('offline', output.getvalue())
+        with open(self.path, 'rb') as file:
+            self.assertEqual(file.read(), self.server.data)
+
+    def test_cached_file_is_used_offline_without_retrying(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            download(self.url, self.path)
+        self.server.shutdown()
+        self.server.server_close()
+        with mock.patch.object(download_module.requests, 'get', wraps=requests.get) as get, \
+                mock.patch.object(download_module.time, 'sleep') as sleep, \
+                contextlib.redirect_stdout(io.StringIO()) as output:
+            download(self.url, self.path, timeout=1, retries=3)
+
+        self.assertEqual(get.call_count, 1)
+        sleep.assert_not_called()
+        self.assertIn('offline', output.getvalue())
+
+    def test_retries_back_off(self):
+        self.server.shutdown()
+        self.server.server_close()
+        with mock.patch.object(download_module.time, 'sleep') as sleep, \
+                contextlib.redirect_stdout(io.StringIO()):
+            with self.assertRaises(requests.exceptions.ConnectionError):
+                download(self.url, self.path, timeout=1, retries=3, retry_seconds=1.0)
+
+        delays = [call.args[0] for call in sleep.call_args_list]
+        self.assertEqual(len(delays), 3)
+        for delay, limit in zip(delays, [1.0, 2.0, 4.0]):
+            self.assertTrue(limit / 2 <= delay <= limit)
+
+    def test_modified_cached_file_is_downloaded_again(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            download(self.url, self.path)
+        with open(self.path, 'r+b') as file:
+            file.write(b'corrupt')
+        with contextlib.redirect_stdout(io.StringIO()):
+            download(self.url, self.path)
+
+        self.assertNotIn('If-None-Match', self.server.requests[1])
+        with open(self.path, 'rb') as file:
+            self.assertEqual(file.read(), self.server.data)
@@ -0,0 +1,162 @@
+import unittest
+import os
+import io
+import json
+import tempfile
+import warnings
+import contextlib
+from benchmarks.fake_weaviate import FakeWeaviate
+from modules import metadata
+from modules.utilities import get_weaviate_client, load_schema
+from modules.taxanomy import load_taxanomy, add_groups, add_archives, add_categories
+from modules.imports import import_single_pass, import_journals, import_authors, import_papers, import_delta
+from modules.batching import BatchSender
+from modules.registry import IdRegistry
+from modules.delta import PaperIndex
+from modules.sharding import SHARED_CLASSES
+
+ROOT = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..')
+
+
+class TestEndToEnd(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        with open(os.path.join(ROOT, 'data', 'taxanomy', 'taxanomy.html'), 'rb') as file:
+            files = {'/category_taxonomy': file.read()}
+        self.server = FakeWeaviate(object_error_rate=0.05, files=files).start()
+        self.config = {
+            "weaviate": {"url": self.server.url, "schema": os.path.join(ROOT, 'schema', 'schema.json'),
+                         "max_batch_size": 50, "batch_retries": 5, "batch_retry_seconds": 0.01},
+            "data": {"metadata_file": os.path.join(ROOT, 'data', 'metadata', '100.json'),
+                     "taxanomy": os.path.join(self.directory.name, 'taxanomy.html'),
+                     "taxanomy_url": self.server.url + '/category_taxonomy'}}
+
+    def tearDown(self) -> None:
+        self.server.stop()
+        self.directory.cleanup()
+
+    def test_import_arrives_completely_despite_failing_objects(self):
+        client = get_weaviate_client(self.config['weaviate'])
+        with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            self.assertTrue(load_schema(client, self.config))
+            with BatchSender(client, self.config) as sender:
+                taxanomy = load_taxanomy(self.config)
+                groups = add_groups(client, taxanomy["groups"], sender)
+                archives = add_archives(client, taxanomy["archives"], groups, sender)
+                categories = add_categories(client, taxanomy["categories"], archives, sender)
+                counts = import_single_pass(client, self.config, metadata.get_metadata(self.config), categories,
+                                            sender)
+
+        self.assertEqual(sorted(self.server.classes), ['Archive', 'Author', 'Category', 'Group', 'Journal', 'Paper'])
+        for class_name in ('Journal', 'Author', 'Paper'):
+            self.assertEqual(self.server.counts[class_name], counts[class_name])
+        self.assertEqual(self.server.counts['references'], counts['references'])
+        self.assertEqual(sum(1 for class_name in self.server.objects.values() if class_name == 'Paper'), 100)
+
+    def test_registry_sends_journals_and_authors_once(self):
+        self.server.object_error_rate = 0.0
+        client = get_weaviate_client(self.config['weaviate'])
+        registry = IdRegistry(os.path.join(self.directory.name, 'registry.sqlite'), self.server.url)
+        with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            self.assertTrue(load_schema(client, self.config))
+            for single_pass in (True, False, True):
+                with BatchSender(client, self.config, registry) as sender:
+                    taxanomy = load_taxanomy(self.config)
+                    groups = add_groups(client, taxanomy["groups"], sender)
+                    archives = add_archives(client, taxanomy["archives"], groups, sender)
+                    categories = add_categories(client, taxanomy["categories"], archives, sender)
+                    data = metadata.get_metadata(self.config)
+                    if single_pass:
+                        import_single_pass(client, self.config, data, categories, sender)
+                    else:
+                        import_journals(client, self.config, data, sender=sender)
+                        import_authors(client, self.config, data, sender=sender)
+                        import_papers(client, self.config, data, categories, stream_references=True, sender=sender)
+        registry.close()
+
+        for class_name in ('Journal', 'Author', 'Paper'):
+            self.assertEqual(self.server.counts[class_name],
+                             sum(1 for value in self.server.objects.values() if value == class_name))
+        self.assertEqual(self.server.counts['references'], len(self.server.references))
+
+    def _import_stream(self, server: FakeWeaviate, registry: IdRegistry = None, state: dict = None, **data):
+        config = {"weaviate": dict(self.config['weaviate'], url=server.url),
+                  "data": dict(self.config['data'], stream=True, **data)}
+        client = get_weaviate_client(config['weaviate'])
+        if state is None:
+            self.assertTrue(load_schema(client, config))
+        with BatchSender(client, config, registry) as sender:
+            taxanomy = load_taxanomy(config)
+            groups = add_groups(client, taxanomy["groups"], sender)
+            archives = add_archives(client, taxanomy["archives"], groups, sender)
+            categories = add_categories(client, taxanomy["categories"], archives, sender)
+            stream = metadata.get_metadata(config, checkpoint=state)
+            import_single_pass(client, config, stream, categories, sender)
+        return {"offset": stream.offset, "papers": stream.loaded}
+
+    def test_resume_keeps_the_references_of_the_interrupted_run(self):
+        self.server.object_error_rate = 0.0
+        with open(os.path.join(ROOT, 'data', 'taxanomy', 'taxanomy.html'), 'rb') as file:
+            complete = FakeWeaviate(files={'/category_taxonomy': file.read()}).start()
+        self.addCleanup(complete.stop)
+        registry = IdRegistry(os.path.join(self.directory.name, 'registry.sqlite'), self.server.url)
+        with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            self._import_stream(complete)
+            state = self._import_stream(self.server, registry, n_papers=50)
+            self._import_stream(self.server, registry, state)
+        registry.close()
+
+        self.assertEqual(self.server.objects, complete.objects)
+        self.assertEqual(self.server.references, complete.references)
+
+    def _import_snapshot(self, server: FakeWeaviate, lines: list, name: str, load: bool) -> dict:
+        filename = os.path.join(self.directory.name, name + '.json')
+        with open(filename, 'w') as file:
+            file.writelines(lines)
+        config = {"weaviate": dict(self.config['weaviate'], url=server.url),
+                  "data": dict(self.config['data'], metadata_file=filename)}
+        client = get_weaviate_client(config['weaviate'])
+        if load:
+            self.assertTrue(load_schema(client, config))
+        index_path = os.path.join(self.directory.name, 'index-{}.sqlite'.format(server.server_address[1]))
+        index = PaperIndex(index_path, server.url)
+        registry = IdRegistry(index.registry_path, server.url, classes=SHARED_CLASSES)
+        with BatchSender(client, config, registry) as sender:
+            taxanomy = load_taxanomy(config)
+            groups = add_groups(client, taxanomy["groups"], sender)
+            archives = add_archives(client, taxanomy["archives"], groups, sender)
+            categories = add_categories(client, taxanomy["categories"], archives, sender)
+            counts = import_delta(client, config, metadata.get_metadata(config, True, categories), index, sender)
+        registry.close()
+        index.close()
+        return counts
+
+    def test_delta_keeps_the_references_of_unchanged_papers(self):
+        self.server.object_error_rate = 0.0
+        with open(os.path.join(ROOT, 'data', 'taxanomy', 'taxanomy.html'), 'rb') as file:
+            complete = FakeWeaviate(files={'/category_taxonomy': file.read()}).start()
+        self.addCleanup(complete.stop)
+        with open(self.config['data']['metadata_file']) as file:
+            lines = file.readlines()
+        # a changed paper that lost its last author, and a new paper by the authors of an unchanged one
+        changed = json.loads(lines[20])
+        changed.update(abstract="changed", authors=changed["authors"].rsplit(',', 1)[0])
+        added = dict(json.loads(lines[50]), id="0704.9999", title="A new paper", doi=None)
+        snapshot = lines[10:20] + [json.dumps(changed) + '\n'] + lines[21:80] + [json.dumps(added) + '\n']
+
+        with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            self._import_snapshot(self.server, lines[:80], 'first', True)
+            counts = self._import_snapshot(self.server, snapshot, 'delta', False)
+            self._import_snapshot(complete, snapshot, 'complete', True)
+
+        self.assertEqual((counts["new"], counts["changed"], counts["unchanged"], counts["withdrawn"]), (1, 1, 69, 10))
+        self.assertEqual(self.server.counts['Author'], sum(1 for value in self.server.objects.values()
+                                                           if value == 'Author'))
+        self.assertEqual({key for key, value in self.server.objects.items() if value == 'Paper'},
+                         {key for key, value in complete.objects.items() if value == 'Paper'})
+        self.assertEqual(self.server.references, complete.references)
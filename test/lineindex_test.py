@@ -0,0 +1,93 @@
+import unittest
+import io
+import os
+import json
+import shutil
+import tempfile
+import contextlib
+from modules import metadata
+from modules import parallel as parallel_metadata
+from modules.lineindex import get_line_index
+
+SAMPLE_FILE = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'sample-arxiv-metadata-oai.json')
+
+
+class TestLineIndex(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp()
+        with open(SAMPLE_FILE) as file:
+            self.lines = file.readlines()
+        self.ids = [json.loads(line)["id"] for line in self.lines]
+        self.filename = os.path.join(self.directory, 'metadata.json')
+        with open(self.filename, 'w') as file:
+            file.writelines(self.lines)
+        self.config = {"data": {"metadata_file": self.filename, "line_index": True}}
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.directory)
+
+    def _index(self, ids: bool = None):
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            index = get_line_index(self.config, self.filename, ids)
+        self.addCleanup(index.close)
+        return index, output.getvalue()
+
+    def test_offsets_and_rows(self):
+        index, output = self._index()
+
+        self.assertIn('Done indexing ArXiv dataset', output)
+        self.assertEqual(index.rows, len(self.lines))
+        self.assertEqual(index.offset_of(3), len(''.join(self.lines[:3]).encode('utf-8')))
+        self.assertEqual(index.offset_of(len(self.lines) + 5), os.path.getsize(self.filename))
+        self.assertEqual(index.row_at(index.offset_of(42)), 42)
+        self.assertFalse(index.has_ids)
+        self.assertEqual(self._index()[1], '')
+
+    def test_skip_with_index_matches_scan(self):
+        data = {"skip_n_papers": 37, "n_papers": 20}
+        with contextlib.redirect_stdout(io.StringIO()):
+            scanned = metadata.get_metadata({"data": dict(data, metadata_file=self.filename)})
+            indexed = metadata.get_metadata({"data": dict(self.config["data"], **data)})
+            parallel = metadata.get_metadata({"data": dict(self.config["data"], parse_processes=2, **data)})
+
+        self.assertEqual([paper.id for paper in indexed], self.ids[37:57])
+        self.assertEqual(indexed, scanned)
+        self.assertEqual(parallel, scanned)
+
+    def test_find_and_get_paper(self):
+        index, _ = self._index(ids=True)
+
+        self.assertEqual(index.find(self.ids[17]), 17)
+        self.assertIsNone(index.find('9999.99999'))
+        with contextlib.redirect_stdout(io.StringIO()):
+            paper = metadata.get_paper(self.config, self.ids[60])
+        self.assertEqual(paper.id, self.ids[60])
+        self.assertIsNone(metadata.get_paper(self.config, 'no-such-id'))
+
+    def test_shards_split_the_lines_evenly(self):
+        index, _ = self._index()
+        shards = [index.shard(shard_id, 3) for shard_id in range(3)]
+
+        self.assertEqual(shards[0][0], 0)
+        self.assertEqual(shards[-1][1], os.path.getsize(self.filename))
+        for (_, end), (start, _) in zip(shards, shards[1:]):
+            self.assertEqual(end, start)
+        rows = [index.row_at(end) - index.row_at(start) for start, end in shards]
+        self.assertEqual(sum(rows), len(self.lines))
+        self.assertLessEqual(max(rows) - min(rows), 1)
+
+    def test_chunks_planned_with_index_match_scan(self):
+        index, _ = self._index()
+
+        self.assertEqual(list(parallel_metadata._plan_chunks(self.filename, 0, 4096, index)),
+                         list(parallel_metadata._plan_chunks(self.filename, 0, 4096)))
+
+    def test_changed_file_is_indexed_again(self):
+        self._index()[0].close()
+        with open(self.filename, 'a') as file:
+            file.write(self.lines[0])
+        index, output = self._index()
+
+        self.assertIn('Line index is outdated', output)
+        self.assertEqual(index.rows, len(self.lines) + 1)
@@ -0,0 +1,71 @@
+import unittest
+import os
+import json
+import tempfile
+from modules import metadata
+from modules import parallel as parallel_metadata
+from modules.imports import prepare_papers
+from modules.decoders import available_json_decoders
+
+SAMPLE_FILE = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'sample-arxiv-metadata-oai.json')
+
+
+class TestMetadataStream(unittest.TestCase):
+
+    def setUp(self) -> None:
+        with open(SAMPLE_FILE) as file:
+            self.lines = file.readlines()
+        self.ids = [json.loads(line)["id"] for line in self.lines]
+
+    def test_stream_matches_list(self):
+        config = {"data": {"metadata_file": SAMPLE_FILE, "skip_n_papers": 10, "n_papers": 20}}
+        data = metadata.get_metadata(config)
+        stream = metadata.get_metadata(config, stream=True)
+
+        self.assertIsInstance(stream, metadata.MetadataStream)
+        self.assertEqual([paper["id"] for paper in stream], [paper.id for paper in data])
+        self.assertEqual([paper.id for paper in data], self.ids[10:30])
+
+    def test_stream_is_reiterable(self):
+        stream = metadata.get_metadata({"data": {"metadata_file": SAMPLE_FILE, "stream": True}})
+
+        self.assertEqual(len(list(stream)), len(self.ids))
+        self.assertEqual(len(list(stream)), len(self.ids))
+
+    def test_first_occurrence_wins(self):
+        duplicate = json.loads(self.lines[0])
+        duplicate["title"] = "duplicate"
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as file:
+            file.writelines(self.lines[:3])
+            file.write(json.dumps(duplicate) + '\n')
+            file.writelines(self.lines[3:5])
+        try:
+            data = metadata.get_metadata({"data": {"metadata_file": file.name}})
+        finally:
+            os.remove(file.name)
+
+        self.assertEqual([paper.id for paper in data], self.ids[:5])
+        self.assertNotEqual(data[0].title, "duplicate")
+
+    def test_parallel_matches_serial(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as file:
+            file.writelines(self.lines + self.lines[20:40] + self.lines[::-1])
+        try:
+            serial = list(metadata.MetadataStream(file.name, 150, 7))
+            parallel = list(parallel_metadata.iter_metadata_parallel(file.name, 150, 7, 2, chunk_bytes=4096))
+            prepared = list(parallel_metadata.iter_metadata_parallel(file.name, 150, 7, 2, {}, chunk_bytes=4096))
+        finally:
+            os.remove(file.name)
+
+        self.assertEqual(sorted(paper["id"] for paper in serial), sorted(self.ids))
+        self.assertEqual(parallel, serial)
+        self.assertEqual(prepared, list(prepare_papers(serial, {})))
+
+    def test_json_decoders_agree(self):
+        results = []
+        for name in available_json_decoders():
+            config = {"data": {"metadata_file": SAMPLE_FILE, "json_decoder": name}}
+            results.append(metadata.get_metadata(config))
+
+        for result in results[1:]:
+            self.assertEqual(result, results[0])
@@ -0,0 +1,91 @@
+import unittest
+import io
+import os
+import json
+import tempfile
+import contextlib
+import weaviate
+from modules.batching import BatchSender
+from modules.metrics import Metrics, Progress
+
+
+class NullBatch:
+
+    def create_objects(self, batch):
+        return [{"result": {}} for _ in batch.get_request_body()["objects"]]
+
+
+class NullClient:
+
+    def __init__(self):
+        self.batch = NullBatch()
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_batches_are_recorded_per_stage(self):
+        metrics = Metrics()
+        metrics.observe_batch("Author", 100, 10.0, 0.2, 5000, errors=3)
+        metrics.observe_batch("Author", 50, 10.1, 0.03, 2500, errors=1, failed=1)
+        metrics.observe_batch("Category", 20, 9.0, 0.01)
+
+        summary = metrics.summary()
+        self.assertEqual(sorted(summary), ["authors", "taxonomy"])
+        authors = summary["authors"]
+        self.assertEqual((authors["objects"], authors["bytes"], authors["errors"], authors["failed"]),
+                         (149, 7500, 4, 1))
+        self.assertAlmostEqual(authors["seconds"], 0.2)
+        self.assertEqual(authors["batches"], 2)
+        self.assertEqual(authors["latency_seconds"]["buckets"]["0.025"], 0)
+        self.assertEqual(authors["latency_seconds"]["buckets"]["0.05"], 1)
+        self.assertEqual(authors["latency_seconds"]["buckets"]["+Inf"], 2)
+
+    def test_stage_and_count(self):
+        metrics = Metrics()
+        with metrics.stage("load"):
+            metrics.count("load", 10)
+        self.assertEqual(metrics.summary()["load"]["objects"], 10)
+        self.assertGreaterEqual(metrics.summary()["load"]["seconds"], 0)
+
+    def test_prometheus_format(self):
+        metrics = Metrics()
+        metrics.observe_batch("references", 10, 0.0, 0.5, 100)
+        lines = metrics.prometheus().splitlines()
+
+        self.assertIn('arxiv_import_objects_total{stage="references"} 10', lines)
+        self.assertIn('arxiv_import_batch_seconds_bucket{stage="references",le="0.5"} 1', lines)
+        self.assertIn('arxiv_import_batch_seconds_bucket{stage="references",le="0.25"} 0', lines)
+        self.assertIn('arxiv_import_batch_seconds_count{stage="references"} 1', lines)
+        self.assertIn('# TYPE arxiv_import_batch_seconds histogram', lines)
+
+    def test_report_writes_files(self):
+        with tempfile.TemporaryDirectory() as directory:
+            metrics = Metrics(os.path.join(directory, 'metrics.json'), os.path.join(directory, 'metrics.prom'))
+            metrics.observe_batch("Paper", 10, 0.0, 0.1, 100)
+            with contextlib.redirect_stdout(io.StringIO()) as output:
+                metrics.report()
+
+            self.assertIn('Stage papers', output.getvalue())
+            with open(os.path.join(directory, 'metrics.json')) as file:
+                self.assertEqual(json.load(file)["papers"]["objects"], 10)
+            with open(os.path.join(directory, 'metrics.prom')) as file:
+                self.assertIn('arxiv_import_bytes_sent_total{stage="papers"} 100', file.read())
+
+    def test_sender_reports_batches(self):
+        metrics = Metrics('metrics.json')
+        with BatchSender(NullClient(), {"weaviate": {"batch_workers": 2}}, metrics=metrics) as sender:
+            for index in range(3):
+                batch = weaviate.ObjectsBatchRequest()
+                batch.add({"name": str(index)}, "Journal", "00000000-0000-0000-0000-%012d" % index)
+                sender.create_objects(batch)
+
+        journals = metrics.summary()["journals"]
+        self.assertEqual((journals["objects"], journals["batches"]), (3, 3))
+        self.assertGreater(journals["bytes"], 0)
+
+    def test_progress_is_rate_limited(self):
+        progress = Progress("Number of papers loaded ---------------:", interval=60)
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            for count in range(1000):
+                progress.update(count)
+        self.assertEqual(output.getvalue().count('Number of papers loaded'), 1)
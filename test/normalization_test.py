@@ -0,0 +1,45 @@
+import unittest
+import os
+import json
+from modules.utilities import format_author_name
+from modules.utilities import format_journal_name
+from modules.normalization import NameNormalizer
+
+SAMPLE_FILE = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'sample-arxiv-metadata-oai.json')
+
+
+class TestNameNormalizer(unittest.TestCase):
+
+    def setUp(self) -> None:
+        with open(SAMPLE_FILE) as file:
+            papers = [json.loads(line) for line in file]
+        self.authors = [paper["authors"] for paper in papers if paper["authors"] is not None]
+        self.authors += ["A. B (Univ) and C. D [1], E {x} F", "O'Neil\n and \"Q\" R (a) (b)", ""]
+        self.journals = [paper["journal-ref"] for paper in papers if paper["journal-ref"] is not None]
+        self.journals += ["Phys.Rev.D76:013009,2007", "'J. \"Math\"\n' no number", "2007"]
+
+    def test_same_names_as_format_functions(self):
+        normalizer = NameNormalizer(cache_size=10)
+        for _ in range(2):
+            for names in self.authors:
+                self.assertEqual(list(normalizer.authors(names)), format_author_name(names))
+            for name in self.journals:
+                self.assertEqual(normalizer.journal(name), format_journal_name(name))
+
+    def test_batch_matches_single(self):
+        normalizer = NameNormalizer()
+        normalizer.authors(self.authors[0])
+        batch = normalizer.authors_batch(self.authors + self.authors[:5])
+
+        self.assertEqual([list(names) for names in batch],
+                         [format_author_name(names) for names in self.authors + self.authors[:5]])
+
+    def test_cache_is_bounded_and_interns(self):
+        normalizer = NameNormalizer(cache_size=5)
+        for names in self.authors:
+            normalizer.authors(names)
+        first = normalizer.authors("Some Author, Other Author")[0]
+        second = normalizer.authors_batch(["X, Some Author"])[0][1]
+
+        self.assertEqual(normalizer.cache_info()["authors"]["size"], 5)
+        self.assertIs(first, second)
@@ -0,0 +1,68 @@
+import unittest
+import io
+import os
+import time
+import pstats
+import tempfile
+import contextlib
+import weaviate
+from modules.batching import BatchSender
+from modules.metrics import Metrics
+from modules.profiling import Profiler
+
+
+class SlowBatch:
+
+    def create_objects(self, batch):
+        time.sleep(0.05)
+        return [{"result": {}} for _ in batch.get_request_body()["objects"]]
+
+
+class SlowClient:
+
+    def __init__(self):
+        self.batch = SlowBatch()
+
+
+def busy_function():
+    return sum(index * index for index in range(200000))
+
+
+class TestProfiling(unittest.TestCase):
+
+    def test_profile_per_stage_and_summary(self):
+        with tempfile.TemporaryDirectory() as directory:
+            profiler = Profiler(directory, top=5)
+            metrics = Metrics(profiler=profiler)
+            with metrics.stage("load"):
+                busy_function()
+            with metrics.stage("papers"):
+                busy_function()
+            with contextlib.redirect_stdout(io.StringIO()) as output:
+                profiler.report(metrics.summary())
+
+            self.assertIn('Profile load', output.getvalue())
+            self.assertEqual(sorted(os.listdir(directory)), ['load.prof', 'papers.prof', 'summary.txt'])
+            stats = pstats.Stats(profiler.path("papers"))
+            self.assertTrue(any(function[2] == 'busy_function' for function in stats.stats))
+            with open(os.path.join(directory, 'summary.txt')) as file:
+                summary = file.read()
+            self.assertIn('Stage papers:', summary)
+            self.assertIn('busy_function', summary)
+
+    def test_blocked_and_cpu_time(self):
+        for workers in (0, 2):
+            metrics = Metrics()
+            with BatchSender(SlowClient(), {"weaviate": {"batch_workers": workers}}, metrics=metrics) as sender:
+                with metrics.stage("journals"):
+                    busy_function()
+                    for index in range(4):
+                        batch = weaviate.ObjectsBatchRequest()
+                        batch.add({"name": str(index)}, "Journal", "00000000-0000-0000-0000-%012d" % index)
+                        sender.create_objects(batch)
+                    sender.flush()
+
+            journals = metrics.summary()["journals"]
+            self.assertGreater(journals["cpu_seconds"], 0)
+            self.assertGreaterEqual(journals["blocked_seconds"], 0.05 if workers else 0.2)
+            self.assertLessEqual(journals["blocked_seconds"] + journals["cpu_seconds"], journals["seconds"] + 0.01)
@@ -0,0 +1,73 @@
+import unittest
+import io
+import os
+import json
+import pickle
+import contextlib
+from modules import metadata
+from modules.imports import build_paper_object
+from modules.imports import import_journals
+from modules.imports import import_authors
+from modules.imports import import_papers
+from modules.records import PaperRecord
+from modules.records import journal_name
+from modules.records import author_names
+
+SAMPLE_FILE = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'sample-arxiv-metadata-oai.json')
+
+
+class NullBatch:
+
+    def create_objects(self, batch):
+        return [{"result": {}} for _ in batch.get_request_body()["objects"]]
+
+
+class NullClient:
+
+    def __init__(self):
+        self.batch = NullBatch()
+
+
+class TestPaperRecord(unittest.TestCase):
+
+    def setUp(self) -> None:
+        with open(SAMPLE_FILE) as file:
+            self.papers = [json.loads(line) for line in file]
+
+    def test_versions_without_created_date(self):
+        versions = [{"version": "v1", "created": "Mon, 2 Apr 2007 19:18:42 GMT"}, {"version": "v2"},
+                    {"version": "v3", "created": None}]
+        record = PaperRecord(dict(self.papers[0], versions=versions))
+
+        self.assertEqual((record.latest_version, record.latest_version_created), ("v3", "2007-04-02T19:18:42+00:00"))
+        self.assertEqual(record.version_history, "v1,v2,v3")
+
+    def test_record_builds_the_same_object(self):
+        for paper in self.papers:
+            record = PaperRecord(paper)
+            self.assertEqual(build_paper_object(record, {"hep-ph": "x"}, None, ["y"]),
+                             build_paper_object(paper, {"hep-ph": "x"}, None, ["y"]))
+            self.assertEqual(journal_name(record), journal_name(paper))
+            self.assertEqual(author_names(record), author_names(paper))
+
+    def test_record_is_compact(self):
+        record = PaperRecord(self.papers[0])
+        self.assertFalse(hasattr(record, '__dict__'))
+        self.assertEqual(pickle.loads(pickle.dumps(record)), record)
+
+    def test_get_metadata_returns_records(self):
+        config = {"data": {"metadata_file": SAMPLE_FILE}}
+        with contextlib.redirect_stdout(io.StringIO()):
+            records = metadata.get_metadata(config)
+            journals = import_journals(NullClient(), config, records)
+            authors = import_authors(NullClient(), config, records)
+
+            self.assertTrue(all(isinstance(record, PaperRecord) for record in records))
+            self.assertGreater(authors, 0)
+            self.assertEqual(journals, import_journals(NullClient(), config, self.papers))
+            self.assertEqual(authors, import_authors(NullClient(), config, self.papers))
+
+    def test_old_positional_arguments_are_rejected(self):
+        # the journals and authors dicts import_papers took before must not be read as its options
+        with self.assertRaises(TypeError):
+            import_papers(NullClient(), {"weaviate": {}}, self.papers, {}, {}, {})
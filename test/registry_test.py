@@ -0,0 +1,81 @@
+import unittest
+import os
+import tempfile
+from modules.registry import IdRegistry, references_id
+from modules.utilities import generate_uuid
+
+
+class TestIdRegistry(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'registry.sqlite')
+        self.paper = generate_uuid('Paper', '0704.0001')
+        self.author = generate_uuid('Author', 'A. Author')
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_acknowledge_objects(self):
+        registry = IdRegistry(self.path, 'http://localhost:8080')
+        registry.acknowledge_objects([
+            {"class": "Paper", "id": self.paper, "result": {}},
+            {"class": "Author", "id": self.author, "result": {"errors": {"error": [{"message": "failed"}]}}},
+        ])
+
+        self.assertTrue(registry.is_acknowledged(self.paper, 'Paper'))
+        self.assertFalse(registry.is_acknowledged(self.author, 'Author'))
+        self.assertEqual(registry.skipped['Paper'], 1)
+        self.assertEqual(registry.count(), {'Paper': 1})
+        registry.close()
+
+    def test_acknowledge_references(self):
+        other = generate_uuid('Paper', '0704.0002')
+        registry = IdRegistry(self.path)
+        registry.acknowledge_references([
+            {"from": "weaviate://localhost/Author/{}/wrotePapers".format(self.author),
+             "to": "weaviate://localhost/{}".format(self.paper), "result": {}},
+            {"from": "weaviate://localhost/Author/{}/wrotePapers".format(self.author),
+             "to": "weaviate://localhost/{}".format(other), "result": {}},
+            {"from": "weaviate://localhost/Author/{}/wrotePapers".format(generate_uuid('Author', 'B')),
+             "to": "weaviate://localhost/{}".format(other), "result": {"errors": {"error": []}}},
+        ])
+
+        self.assertIn(references_id(self.paper), registry)
+        self.assertNotIn(references_id(other), registry)
+        registry.close()
+
+    def test_persists_per_weaviate_instance(self):
+        registry = IdRegistry(self.path, 'http://localhost:8080')
+        registry.add([(self.paper, 'Paper')])
+        registry.close()
+
+        registry = IdRegistry(self.path, 'http://localhost:8080')
+        self.assertIn(self.paper, registry)
+        registry.close()
+
+        registry = IdRegistry(self.path, 'http://other:8080')
+        self.assertNotIn(self.paper, registry)
+        registry.close()
+
+    def test_claim_sends_every_author_once(self):
+        registry = IdRegistry(self.path, 'http://localhost:8080', lookup_cache=2)
+        registry.add([(self.author, 'Author')])
+        authors = [generate_uuid('Author', str(number)) for number in range(5)]
+
+        self.assertFalse(registry.claim(self.author, 'Author'))
+        self.assertEqual([registry.claim(author, 'Author') for author in authors], [True] * 5)
+        # sent but not acknowledged yet
+        self.assertEqual([registry.claim(author, 'Author') for author in authors], [False] * 5)
+        registry.acknowledge_objects([{"class": "Author", "id": author, "result": {}} for author in authors])
+        lookups = registry.lookups
+        self.assertFalse(registry.claim(authors[-1], 'Author'))
+        self.assertEqual(registry.lookups, lookups)
+        self.assertFalse(registry.claim(authors[0], 'Author'))
+        self.assertEqual(registry.lookups, lookups + 1)
+        self.assertEqual(registry.skipped['Author'], 1)
+        registry.close()
+
+        registry = IdRegistry(self.path, 'http://localhost:8080')
+        self.assertFalse(any(registry.claim(author, 'Author') for author in authors))
+        registry.close()
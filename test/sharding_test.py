@@ -0,0 +1,183 @@
+import unittest
+import io
+import os
+import json
+import shutil
+import tempfile
+import warnings
+import contextlib
+from benchmarks.fake_weaviate import FakeWeaviate
+from modules import metadata
+from modules.utilities import get_weaviate_client, load_schema
+from modules.taxanomy import load_taxanomy, add_groups, add_archives, add_categories
+from modules.imports import import_journals, import_authors, import_papers, import_shard_references
+from modules.batching import BatchSender
+from modules.columnar import convert_metadata
+from modules.metrics import Metrics
+from modules.records import paper_record
+from modules.sharding import Shard, get_shard, shard_path, merge_shard_metrics
+
+ROOT = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..')
+SAMPLE_FILE = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'sample-arxiv-metadata-oai.json')
+
+
+class TestSharding(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp()
+        with open(SAMPLE_FILE) as file:
+            self.lines = file.readlines()
+        self.filename = os.path.join(self.directory, 'metadata.json')
+        with open(self.filename, 'w') as file:
+            file.writelines(self.lines)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.directory)
+
+    def _shard_ids(self, num_shards: int, **data) -> list:
+        ids = []
+        for shard_id in range(num_shards):
+            config = {"data": dict(data, metadata_file=self.filename, shard_id=shard_id, num_shards=num_shards,
+                                   skip_n_papers=3, n_papers=5)}
+            with contextlib.redirect_stdout(io.StringIO()):
+                ids.append([paper_record(paper).id for paper in metadata.get_metadata(config, True)])
+        return ids
+
+    def test_shards_split_the_whole_file(self):
+        all_ids = [json.loads(line)["id"] for line in self.lines]
+        columnar = os.path.join(self.directory, 'columns')
+        with contextlib.redirect_stdout(io.StringIO()):
+            convert_metadata(self.filename, columnar)
+
+        for data in ({}, {"parse_processes": 2}, {"columnar": columnar}):
+            shards = self._shard_ids(3, **data)
+
+            self.assertEqual([paper_id for ids in shards for paper_id in ids], all_ids)
+            self.assertLessEqual(max(map(len, shards)) - min(map(len, shards)), 1)
+
+    def test_duplicates_in_earlier_shards_are_skipped(self):
+        with open(self.filename, 'w') as file:
+            file.writelines(self.lines[:40] + [self.lines[3], self.lines[35]] + self.lines[40:])
+        unique = list(dict.fromkeys(json.loads(line)["id"] for line in self.lines))
+
+        shards = self._shard_ids(3)
+        self.assertEqual([paper_id for ids in shards for paper_id in ids], unique)
+
+    def test_shared_objects_have_one_owner(self):
+        shards = [Shard(shard_id, 4) for shard_id in range(4)]
+        uuids = ["{:08x}-0000-0000-0000-{:012x}".format(number * 7919, number) for number in range(200)]
+
+        for object_uuid in uuids:
+            self.assertEqual(sum(shard.owns(object_uuid) for shard in shards), 1)
+            self.assertEqual(sum(not shard.skips(object_uuid, 'Author') for shard in shards), 1)
+            self.assertFalse(any(shard.skips(object_uuid, 'Paper') for shard in shards))
+            self.assertTrue(all(shard.skips(object_uuid, 'References') for shard in shards))
+        self.assertTrue(all(sum(map(shard.owns, uuids)) > 0 for shard in shards))
+        with self.assertRaises(ValueError):
+            Shard(4, 4)
+
+    def test_files_per_shard(self):
+        config = {"data": {"checkpoint": './data/checkpoint.json', "metrics_json": '', "num_shards": 4,
+                           "shard_id": 2},
+                  "weaviate": {"dead_letter_file": './data/dead-letters.ndjson', "id_registry": ''}}
+        get_shard(config).apply(config)
+
+        self.assertEqual(config["data"]["checkpoint"], './data/checkpoint.shard-2-of-4.json')
+        self.assertEqual(config["data"]["metrics_json"], 'metrics.shard-2-of-4.json')
+        self.assertEqual(config["weaviate"]["dead_letter_file"], './data/dead-letters.shard-2-of-4.ndjson')
+        self.assertEqual(config["weaviate"]["id_registry"], '')
+        self.assertIsNone(get_shard({"data": {"num_shards": 1}}))
+
+    def test_merge_metrics(self):
+        metrics_json = os.path.join(self.directory, 'metrics.json')
+        for shard_id, seconds in enumerate((2.0, 4.0)):
+            metrics = Metrics(shard_path(metrics_json, shard_id, 2))
+            metrics.observe_batch("Paper", 100, 10.0, seconds, payload_bytes=1000, errors=1)
+            with contextlib.redirect_stdout(io.StringIO()):
+                metrics.report()
+        config = {"data": {"num_shards": 2, "metrics_json": metrics_json}}
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            merged = merge_shard_metrics(config)
+
+        self.assertIn('Merged metrics of shards --------------: 2 of 2', output.getvalue())
+        self.assertNotIn('Incomplete import', output.getvalue())
+        papers = merged["papers"]
+        self.assertEqual((papers["objects"], papers["batches"], papers["bytes"], papers["errors"]), (200, 2, 2000, 2))
+        self.assertEqual(papers["seconds"], 4.0)
+        self.assertEqual(papers["objects_per_second"], 50.0)
+        self.assertEqual(papers["latency_seconds"]["buckets"]["+Inf"], 2)
+        with open(metrics_json) as file:
+            self.assertEqual(json.load(file), merged)
+
+    def test_merge_reports_failed_items(self):
+        metrics_json = os.path.join(self.directory, 'metrics.json')
+        dead_letter_file = os.path.join(self.directory, 'dead-letters.ndjson')
+        for shard_id, failed in enumerate((0, 2)):
+            metrics = Metrics(shard_path(metrics_json, shard_id, 2))
+            metrics.observe_batch("references", 100, 10.0, 1.0, errors=failed, failed=failed)
+            with contextlib.redirect_stdout(io.StringIO()):
+                metrics.report()
+        with open(shard_path(dead_letter_file, 1, 2), 'w') as file:
+            file.write('{"kind": "reference"}\n{"kind": "reference"}\n')
+        config = {"data": {"num_shards": 2, "metrics_json": metrics_json},
+                  "weaviate": {"dead_letter_file": dead_letter_file}}
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            merge_shard_metrics(config)
+
+        self.assertIn('Incomplete import, failed items -------: 2', output.getvalue())
+        self.assertIn('Dead letters of shard -----------------: 1 2', output.getvalue())
+
+
+class TestShardedImport(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        with open(os.path.join(ROOT, 'data', 'taxanomy', 'taxanomy.html'), 'rb') as file:
+            self.files = {'/category_taxonomy': file.read()}
+        self.filename = os.path.join(self.directory.name, '100.json')
+        shutil.copy(os.path.join(ROOT, 'data', 'metadata', '100.json'), self.filename)
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def _import(self, num_shards: int) -> FakeWeaviate:
+        server = FakeWeaviate(files=self.files).start()
+        self.addCleanup(server.stop)
+        for shard_id in range(num_shards):
+            config = {
+                "weaviate": {"url": server.url, "schema": os.path.join(ROOT, 'schema', 'schema.json'),
+                             "max_batch_size": 20},
+                "data": {"metadata_file": self.filename, "stream": True, "shard_id": shard_id,
+                         "num_shards": num_shards, "taxanomy": os.path.join(self.directory.name, 'taxanomy.html'),
+                         "taxanomy_url": server.url + '/category_taxonomy'}}
+            shard = get_shard(config)
+            client = get_weaviate_client(config['weaviate'])
+            if shard is None or shard.loads_schema:
+                load_schema(client, config)
+            with BatchSender(client, config, shard=shard) as sender:
+                taxanomy = load_taxanomy(config)
+                groups = add_groups(client, taxanomy["groups"], sender)
+                archives = add_archives(client, taxanomy["archives"], groups, sender)
+                categories = add_categories(client, taxanomy["categories"], archives, sender)
+                shared = metadata.get_metadata(config, True, whole_file=True)
+                import_journals(client, config, shared, sender=sender)
+                import_authors(client, config, shared, sender=sender)
+                if shard is not None:
+                    import_shard_references(client, config, shared, sender)
+                import_papers(client, config, metadata.get_metadata(config), categories, stream_references=True,
+                              sender=sender)
+        return server
+
+    def test_every_object_is_sent_once(self):
+        with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            unsharded = self._import(1)
+            sharded = self._import(3)
+
+        self.assertEqual(sharded.objects, unsharded.objects)
+        self.assertEqual(sharded.references, unsharded.references)
+        for class_name in ('Journal', 'Author', 'Paper'):
+            self.assertEqual(sharded.counts[class_name],
+                             sum(1 for value in sharded.objects.values() if value == class_name))
+        for class_name in ('Group', 'Archive', 'Category'):
+            self.assertEqual(sharded.counts[class_name], unsharded.counts[class_name])
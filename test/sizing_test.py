@@ -0,0 +1,57 @@
+import unittest
+import io
+import contextlib
+from modules.sizing import BatchSizer, get_batch_sizer
+
+
+class TestBatchSizer(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.output = io.StringIO()
+        self.redirect = contextlib.redirect_stdout(self.output)
+        self.redirect.__enter__()
+
+    def tearDown(self) -> None:
+        self.redirect.__exit__(None, None, None)
+
+    def test_fixed_without_adapt(self):
+        sizer = get_batch_sizer({"weaviate": {"max_batch_size": 100}})
+        sizer.observe("Paper", 100, 10.0, failed=100)
+
+        self.assertEqual(sizer.get("Paper"), 100)
+        self.assertEqual(sizer.get("references"), 100)
+
+    def test_moves_towards_target_latency(self):
+        sizer = BatchSizer(100, True, 10, 1000, target_seconds=1.0)
+        for _ in range(20):
+            sizer.observe("Author", sizer.get("Author"), sizer.get("Author") / 400)
+        self.assertAlmostEqual(sizer.get("Author"), 400, delta=5)
+
+        for _ in range(20):
+            sizer.observe("Author", sizer.get("Author"), sizer.get("Author") / 50)
+        self.assertAlmostEqual(sizer.get("Author"), 50, delta=5)
+        self.assertIn("Adapted batch size", self.output.getvalue())
+
+    def test_classes_adapt_separately_within_bounds(self):
+        sizer = BatchSizer(100, True, 10, 300, target_seconds=1.0)
+        for _ in range(20):
+            sizer.observe("Author", sizer.get("Author"), 0.01)
+            sizer.observe("Paper", sizer.get("Paper"), 100.0)
+
+        self.assertEqual(sizer.get("Author"), 300)
+        self.assertEqual(sizer.get("Paper"), 10)
+
+    def test_partly_filled_batches_are_ignored(self):
+        sizer = BatchSizer(100, True, 10, 1000, target_seconds=1.0)
+        sizer.observe("Journal", 3, 0.5)
+
+        self.assertEqual(sizer.get("Journal"), 100)
+
+    def test_backs_off_on_failures_and_payload(self):
+        sizer = BatchSizer(100, True, 10, 1000, target_seconds=1.0, max_bytes=50000)
+        sizer.observe("Paper", 100, 1.0, timeout=True)
+        self.assertEqual(sizer.get("Paper"), 50)
+        sizer.observe("Paper", 50, 1.0, failed=10)
+        self.assertEqual(sizer.get("Paper"), 25)
+        sizer.observe("Paper", 25, 0.01, payload_bytes=25000)
+        self.assertEqual(sizer.get("Paper"), 37)
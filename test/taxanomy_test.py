@@ -0,0 +1,98 @@
+import unittest
+import os
+import io
+import shutil
+import tempfile
+import contextlib
+from unittest import mock
+import weaviate
+from modules import taxanomy
+from modules.batching import BatchSender
+
+TAXANOMY_FILE = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'data', 'taxanomy', 'taxanomy.html')
+
+
+class RecordingBatch:
+
+    def __init__(self):
+        self.objects = []
+
+    def create_objects(self, batch):
+        objects = batch.get_request_body()["objects"]
+        self.objects.extend(objects)
+        return [{"result": {}} for _ in objects]
+
+
+class RecordingClient:
+
+    def __init__(self):
+        self.batch = RecordingBatch()
+
+
+class TestTaxanomy(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'taxanomy.html')
+        shutil.copy(TAXANOMY_FILE, self.path)
+        self.config = {"data": {"taxanomy": self.path}}
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def _load(self) -> dict:
+        with mock.patch.object(taxanomy, 'download'), contextlib.redirect_stdout(io.StringIO()):
+            return taxanomy.load_taxanomy(self.config)
+
+    def test_duplicates_are_dropped(self):
+        loaded = self._load()
+
+        self.assertGreater(len(loaded['categories']), 0)
+        for key in ('groups', 'archives', 'categories'):
+            items = [tuple(sorted(item.items())) for item in loaded[key]]
+            self.assertEqual(len(items), len(set(items)))
+        self.assertIn({"inGroup": "Computer Science", "name": "Computer Science", "id": "Computer Science"},
+                      loaded['archives'])
+
+    def test_parsed_taxanomy_is_cached(self):
+        loaded = self._load()
+        with mock.patch.object(taxanomy, '_parse_taxanomy') as parse:
+            self.assertEqual(self._load(), loaded)
+        parse.assert_not_called()
+
+        with open(self.path, 'a') as file:
+            file.write('\n')
+        with mock.patch.object(taxanomy, '_parse_taxanomy', return_value=loaded) as parse:
+            self._load()
+        parse.assert_called_once()
+
+    def test_categories_are_not_changed(self):
+        categories = [{"inArchive": "Computer Science", "name": "Artificial Intelligence", "id": "cs.AI",
+                       "description": "AI"},
+                      {"inArchive": "Computer Science", "name": "Computation and Language", "id": "cs.CL",
+                       "description": "CL"}]
+        client = RecordingClient()
+        with contextlib.redirect_stdout(io.StringIO()):
+            with BatchSender(client, {"weaviate": {"batch_workers": 0}}) as sender:
+                uuids = taxanomy.add_categories(client, categories, {"archiveComputer Science": "archive-uuid"},
+                                                sender)
+
+        self.assertEqual(categories[0]["inArchive"], "Computer Science")
+        self.assertEqual(sorted(uuids), ["cs", "cs.AI", "cs.CL"])
+        self.assertEqual(len(client.batch.objects), 3)
+        self.assertEqual(client.batch.objects[0]["properties"]["inArchive"],
+                         [{"beacon": "weaviate://localhost/archive-uuid"}])
+
+
+    def test_archives_are_not_changed_and_own_sender_is_closed(self):
+        archives = [{"inGroup": "Computer Science", "name": "Computer Science", "id": "Computer Science"}]
+        client = RecordingClient()
+        with contextlib.redirect_stdout(io.StringIO()), \
+                mock.patch.object(BatchSender, 'close', autospec=True, side_effect=BatchSender.close) as close:
+            uuids = taxanomy.add_archives(client, archives, {"groupComputer Science": "group-uuid"})
+
+        close.assert_called_once()
+        self.assertEqual(archives[0]["inGroup"], "Computer Science")
+        self.assertEqual(list(uuids), ["archiveComputer Science"])
+        self.assertEqual(client.batch.objects[0]["properties"]["inGroup"],
+                         [{"beacon": "weaviate://localhost/group-uuid"}])
@@ -0,0 +1,21 @@
+import unittest
+from modules.utilities import parse_version_date
+
+
+class TestParseVersionDate(unittest.TestCase):
+
+    def test_arxiv_format(self):
+        self.assertEqual(parse_version_date("Mon, 2 Apr 2007 19:18:42 GMT"), "2007-04-02T19:18:42+00:00")
+        self.assertEqual(parse_version_date("Sat, 31 Mar 2007 00:00:01 GMT"), "2007-03-31T00:00:01+00:00")
+
+    def test_fallback_to_dateutil(self):
+        self.assertEqual(parse_version_date("2 Apr 2007"), "2007-04-02T00:00:00")
+        self.assertEqual(parse_version_date("Mon, 2 Apr 2007 19:18:42 UTC"), "2007-04-02T19:18:42+00:00")
+
+    def test_invalid_dates(self):
+        self.assertIsNone(parse_version_date("Fri, 30 Feb 2007 19:18:42 GMT"))
+        self.assertIsNone(parse_version_date("not a date"))
+
+    def test_missing_or_odd_created(self):
+        self.assertIsNone(parse_version_date(None))
+        self.assertIsNone(parse_version_date(1175541522))